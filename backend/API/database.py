@@ -3,10 +3,14 @@
 Configuración de la conexión a PostgreSQL (Neon.tech)
 Este archivo es ESSENCIAL para conectar tu API con la BD
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -26,10 +30,87 @@ if not DATABASE_URL:
         "3. Pégala en tu archivo .env"
     )
 
+# Pool de conexiones (ajustable desde .env)
+# Neon suspende el cómputo tras ~5 min sin actividad y cierra las conexiones:
+# pre_ping descarta las muertas antes de usarlas y recycle las renueva antes.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # segundos esperando una conexión libre
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "280"))         # segundos de vida de cada conexión
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", "2"))             # conexiones abiertas al arrancar
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))    # el arranque en frío de Neon tarda
+
+# Límites (ms) del histograma de tiempo para obtener una conexión del pool
+LIMITES_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class MetricasPool:
+    """Histograma y contadores de obtención de conexiones (compartido entre recreaciones del pool)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.cubetas = [0] * (len(LIMITES_ESPERA_MS) + 1)
+            self.obtenciones = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+            self.agotados = 0
+
+    def registrar(self, ms, agotado=False):
+        with self._lock:
+            if agotado:
+                self.agotados += 1
+                return
+            idx = next((i for i, limite in enumerate(LIMITES_ESPERA_MS) if ms <= limite), len(LIMITES_ESPERA_MS))
+            self.cubetas[idx] += 1
+            self.obtenciones += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def resumen(self):
+        with self._lock:
+            etiquetas = [f"<={limite}ms" for limite in LIMITES_ESPERA_MS] + [f">{LIMITES_ESPERA_MS[-1]}ms"]
+            return {
+                "obtenciones": self.obtenciones,
+                "promedio_ms": round(self.total_ms / self.obtenciones, 3) if self.obtenciones else 0,
+                "max_ms": round(self.max_ms, 3),
+                "agotados": self.agotados,
+                "histograma": dict(zip(etiquetas, self.cubetas))
+            }
+
+
+metricas_pool = MetricasPool()
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mide cuánto tarda cada checkout (espera + apertura de conexión nueva)"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except Exception:
+            metricas_pool.registrar(0, agotado=True)
+            raise
+        metricas_pool.registrar((time.perf_counter() - inicio) * 1000)
+        return conexion
+
+
 # Configurar SQLAlchemy para PostgreSQL (optimizado para Neon)
 engine = create_engine(
     DATABASE_URL,
-    echo=False  # Solo esto por ahora
+    poolclass=PoolMedido,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=POOL_PRE_PING,
+    connect_args={"connect_timeout": CONNECT_TIMEOUT},
+    echo=False
 )
 
 # Crear fábrica de sesiones
@@ -50,6 +131,18 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def conexion(db=None):
+    """
+    Para funciones de backend/core que también se usan fuera de un request:
+    reutiliza la sesión del request si se recibe, o toma una conexión del pool.
+    """
+    if db is not None:
+        yield db
+    else:
+        with engine.connect() as conn:
+            yield conn
+
 # Función para verificar conexión
 def test_connection():
     """Prueba rápida de conexión a la BD"""
@@ -62,4 +155,47 @@ def test_connection():
     except Exception as e:
         print(f"❌ Error de conexión: {e}")
         print(f"📌 URL usada: {DATABASE_URL[:50]}...")  # Muestra parte de la URL
-        return False
\ No newline at end of file
+        return False
+
+def calentar_pool(n=POOL_WARMUP):
+    """
+    Abre n conexiones a la vez (y despierta a Neon si estaba suspendido) para
+    que las primeras peticiones no paguen el handshake TCP/TLS.
+    """
+    n = min(n, POOL_SIZE)
+    if n <= 0:
+        return 0
+
+    inicio = time.perf_counter()
+    conexiones = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conexiones.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in conexiones:
+            conn.close()
+
+    print(f"🔥 Pool calentado: {len(conexiones)} conexiones en {time.perf_counter() - inicio:.2f}s")
+    return len(conexiones)
+
+def estado_pool():
+    """Ocupación actual del pool y métricas de espera"""
+    pool = engine.pool
+    return {
+        "configuracion": {
+            "pool_size": POOL_SIZE,
+            "max_overflow": POOL_MAX_OVERFLOW,
+            "timeout_seg": POOL_TIMEOUT,
+            "recycle_seg": POOL_RECYCLE,
+            "pre_ping": POOL_PRE_PING
+        },
+        "conexiones": {
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "capacidad": pool.size() + POOL_MAX_OVERFLOW
+        },
+        "espera": metricas_pool.resumen()
+    }
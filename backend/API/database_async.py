@@ -0,0 +1,76 @@
+# backend/API/database_async.py
+"""
+Conexión asíncrona a PostgreSQL (Neon) con SQLAlchemy 2.0 + asyncpg.
+
+Los routers con mucho tráfico de BD (pedidos, vehículos, gestión de rutas,
+reportes y auth) usan get_async_db: mientras una consulta espera a Neon el
+worker sigue atendiendo otros requests, en lugar de ocupar un hilo del
+threadpool por cada consulta.
+
+Las funciones de backend/core que reciben una sesión síncrona (contadores,
+rollups, calculos) se reutilizan tal cual con `await db.run_sync(funcion, ...)`.
+"""
+import os
+import uuid
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .database import (
+    DATABASE_URL, POOL_MAX_OVERFLOW, POOL_TIMEOUT, POOL_RECYCLE, POOL_PRE_PING, CONNECT_TIMEOUT
+)
+
+# Sin hilos de por medio, un solo worker puede tener muchas más consultas en vuelo
+ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "20"))
+
+# Sentencias preparadas que guarda cada conexión. Las de backend/core/consultas.py
+# tienen texto fijo, así que se preparan una vez por conexión y luego solo se ejecutan.
+# También con el pooler de Neon: su PgBouncer (max_prepared_statements) sigue las
+# sentencias preparadas a nivel de protocolo, que son las que usa asyncpg.
+# 0 las desactiva (para un PgBouncer en modo transacción sin ese soporte).
+CACHE_SENTENCIAS = int(os.getenv("DB_CACHE_SENTENCIAS", "500"))
+
+
+def url_asyncpg(url):
+    """
+    Convierte la URL de psycopg2 a asyncpg. asyncpg no entiende sslmode ni
+    channel_binding (los agrega Neon), así que el SSL pasa a connect_args.
+    """
+    url = make_url(url)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+
+    connect_args = {"timeout": CONNECT_TIMEOUT}
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = "require" if sslmode in ("require", "prefer", "allow") else sslmode
+    query["prepared_statement_cache_size"] = str(CACHE_SENTENCIAS)
+    if CACHE_SENTENCIAS <= 0:
+        # Sin caché: tampoco la de asyncpg, y nombres únicos para que dos
+        # clientes no choquen en la misma conexión del pooler
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4().hex}__"
+
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+_url, _connect_args = url_asyncpg(DATABASE_URL)
+
+async_engine = create_async_engine(
+    _url,
+    pool_size=ASYNC_POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=POOL_PRE_PING,
+    connect_args=_connect_args,
+    echo=False
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def get_async_db():
+    """Dependencia de FastAPI: una AsyncSession por request"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -22,6 +22,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Siguiente-Cursor"],  # cursor de la siguiente página en los listados
 )
 
 # INICIALIZACIÓN DE BASE DE DATOS POSTGRESQL
@@ -32,6 +33,14 @@ try:
     print("🔄 Inicializando base de datos PostgreSQL Neon...")
     Base.metadata.create_all(bind=engine)
     
+    # Migraciones versionadas pendientes (índices, cambios de esquema)
+    from .migraciones import aplicar_migraciones
+    aplicar_migraciones()
+    
+    # Abrir las primeras conexiones antes de recibir tráfico
+    from .database import calentar_pool
+    calentar_pool()
+    
     # Verificar conexión y tablas
     with engine.connect() as conn:
         # Ver versión PostgreSQL - CORREGIDO: usar text()
@@ -48,6 +57,33 @@ try:
         """))
         tablas = [row[0] for row in result.fetchall()]
         print(f"📊 Tablas disponibles: {', '.join(tablas)}")
+    
+    # Recalcular contadores del dashboard (corrige cualquier desviación previa)
+    from .database import SessionLocal
+    from backend.core.contadores import reconstruir_contadores
+    from backend.core.rollups import hay_rollups, reconstruir_rollups
+    with SessionLocal() as db:
+        reconstruir_contadores(db)
+        # Los acumulados de KPIs se mantienen solos; solo se llenan la primera vez
+        if not hay_rollups(db):
+            reconstruir_rollups(db)
+        # Rutas compartidas de épocas viejas y cuerpos de ruta que quedaron sin usar
+        from backend.core.rutas_compartidas import purgar_rutas_vencidas
+        from backend.core.cuerpos_ruta import purgar_cuerpos_huerfanos
+        purgar_rutas_vencidas(db)
+        purgar_cuerpos_huerfanos(db)
+    
+    # Cargar la caché de vehículos aquí y no en el primer request asíncrono
+    from backend.core.perfiles_vehiculo import todos_los_perfiles
+    todos_los_perfiles()
+    
+    # Snapshots Parquet para analítica (solo si pyarrow está instalado)
+    from backend.core.snapshots import iniciar_exportador_periodico
+    iniciar_exportador_periodico()
+    
+    # Particiones mensuales: crear las próximas y archivar las viejas
+    from backend.core.particiones import iniciar_mantenimiento_periodico
+    iniciar_mantenimiento_periodico()
         
 except Exception as e:
     print(f"⚠️  Advertencia en inicialización BD: {e}")
@@ -62,6 +98,12 @@ app.include_router(vehiculos_router.router, prefix="/api/vehiculos", tags=["Gest
 app.include_router(reportes_router.router, prefix="/api/reportes", tags=["Reportes"])
 app.include_router(gestion_rutas_router.router, prefix="/api/gestion-rutas", tags=["Gestión de Rutas"])
 
+@app.on_event("shutdown")
+async def cerrar_conexiones():
+    """Cierra las conexiones del pool asíncrono al detener el servidor"""
+    from .database_async import async_engine
+    await async_engine.dispose()
+
 # Endpoints básicos
 @app.get("/")
 def root():
@@ -140,4 +182,42 @@ def list_tables():
             "tablas": tablas
         }
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+@app.get("/api/database/migraciones")
+def migraciones_status():
+    """Versión del esquema y migraciones pendientes"""
+    try:
+        from .migraciones import estado_migraciones
+        return estado_migraciones()
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/api/database/particiones")
+def particiones_status():
+    """Particiones mensuales de pedidos y rutas_asignadas (activas y archivadas)"""
+    try:
+        from backend.core.particiones import estado_particiones
+        return estado_particiones()
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/api/database/pool")
+def pool_status(reiniciar: bool = False):
+    """
+    Ocupación del pool de conexiones e histograma del tiempo para obtener una
+    conexión (reiniciar=true pone las métricas en cero después de leerlas)
+    """
+    from .database import estado_pool, metricas_pool
+    from .database_async import async_engine, ASYNC_POOL_SIZE
+    estado = estado_pool()
+    pool_async = async_engine.pool
+    estado["async"] = {
+        "pool_size": ASYNC_POOL_SIZE,
+        "en_uso": pool_async.checkedout(),
+        "libres": pool_async.checkedin(),
+        "overflow": max(pool_async.overflow(), 0)
+    }
+    if reiniciar:
+        metricas_pool.reiniciar()
+    return estado
\ No newline at end of file
@@ -0,0 +1,184 @@
+# backend/API/migraciones.py
+"""
+Migraciones versionadas del esquema.
+
+Cada archivo backend/migraciones/NNN_descripcion.sql es una versión. Las
+versiones aplicadas se registran en 'esquema_versiones' y solo se ejecutan
+las pendientes, en orden. create_all sigue creando las tablas de models.py
+en una BD vacía; los cambios posteriores (índices, columnas, datos) van aquí.
+
+Un archivo cuya primera línea es '-- sin-transaccion' se ejecuta sentencia
+por sentencia en autocommit (necesario para CREATE INDEX CONCURRENTLY);
+los demás corren completos dentro de una transacción. Si un CREATE INDEX
+CONCURRENTLY falla a medias deja el índice INVALID: la siguiente ejecución
+lo borra y lo vuelve a construir, y la versión no se registra mientras
+alguno de sus índices siga inválido.
+"""
+import hashlib
+import re
+from pathlib import Path
+
+from sqlalchemy import text
+
+from .database import engine
+
+DIRECTORIO = Path(__file__).resolve().parent.parent / "migraciones"
+PATRON_ARCHIVO = re.compile(r"^(\d{3})_(\w+)\.sql$")
+MARCA_SIN_TRANSACCION = "-- sin-transaccion"
+CLAVE_BLOQUEO = 7410001   # pg_advisory_lock: un solo proceso migra a la vez
+PATRON_CONCURRENTE = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\b.*?\bON\s+(?:ONLY\s+)?([\w.]+)", re.I | re.S)
+PATRON_INDICE = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)\s+ON\b", re.I)
+
+
+class Migracion:
+    __slots__ = ("version", "nombre", "sql", "checksum", "sin_transaccion")
+
+    def __init__(self, archivo):
+        coincidencia = PATRON_ARCHIVO.match(archivo.name)
+        self.version = int(coincidencia.group(1))
+        self.nombre = coincidencia.group(2)
+        self.sql = archivo.read_text(encoding="utf-8")
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+        self.sin_transaccion = self.sql.lstrip().startswith(MARCA_SIN_TRANSACCION)
+
+    def sentencias(self):
+        """Sentencias separadas por ';' al final de línea (sin comentarios)"""
+        lineas = [l for l in self.sql.splitlines() if not l.strip().startswith("--")]
+        return [s.strip() for s in re.split(r";\s*$", "\n".join(lineas), flags=re.M) if s.strip()]
+
+
+def listar_migraciones():
+    """Todas las migraciones del directorio, ordenadas por versión"""
+    archivos = [a for a in DIRECTORIO.glob("*.sql") if PATRON_ARCHIVO.match(a.name)]
+    return sorted((Migracion(a) for a in archivos), key=lambda m: m.version)
+
+
+def versiones_aplicadas(conn):
+    """versión -> checksum de lo ya aplicado"""
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS esquema_versiones (
+            version INTEGER PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            aplicada TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    filas = conn.execute(text("SELECT version, checksum FROM esquema_versiones")).fetchall()
+    return {fila.version: fila.checksum for fila in filas}
+
+
+def _sin_concurrently_si_particionada(conn, sentencia):
+    """
+    Postgres no admite CREATE INDEX CONCURRENTLY en tablas particionadas (y
+    lo rechaza antes de revisar IF NOT EXISTS). En una BD vacía create_all
+    ya crea pedidos y rutas_asignadas particionadas y sin filas, así que
+    los índices de 001, 002 y 004 sobre ellas se crean sin CONCURRENTLY.
+    """
+    coincidencia = PATRON_CONCURRENTE.match(sentencia)
+    if coincidencia is None:
+        return sentencia
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:tabla)"), {"tabla": coincidencia.group(1)}
+    ).scalar()
+    if relkind == "p":
+        return re.sub(r"\bCONCURRENTLY\s+", "", sentencia, count=1, flags=re.I)
+    return sentencia
+
+
+def _indice_concurrente(sentencia):
+    """Nombre del índice que crea un CREATE INDEX CONCURRENTLY (None si no lo es)"""
+    coincidencia = PATRON_INDICE.match(sentencia)
+    return coincidencia.group(1) if coincidencia else None
+
+
+def _indice_invalido(conn, indice):
+    """True si el índice existe pero quedó INVALID (build concurrente interrumpido)"""
+    valido = conn.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:indice)"), {"indice": indice}
+    ).scalar()
+    return valido is False
+
+
+def _aplicar_sin_transaccion(conn, migracion):
+    """
+    Ejecuta la migración sentencia por sentencia en autocommit. Un índice
+    INVALID de un intento anterior se borra antes de su CREATE (IF NOT EXISTS
+    lo saltaría), y si al terminar alguno sigue inválido la versión no se
+    registra.
+    """
+    indices = []
+    for sentencia in migracion.sentencias():
+        indice = _indice_concurrente(sentencia)
+        if indice is not None:
+            indices.append(indice)
+            if _indice_invalido(conn, indice):
+                print(f"⚠️  Índice {indice} inválido de un intento anterior, se reconstruye")
+                conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {indice}")
+        conn.exec_driver_sql(_sin_concurrently_si_particionada(conn, sentencia))
+
+    invalidos = [indice for indice in indices if _indice_invalido(conn, indice)]
+    if invalidos:
+        raise RuntimeError(
+            f"La migración {migracion.version:03d} dejó índices inválidos: {', '.join(invalidos)}"
+        )
+    _registrar(conn, migracion)
+
+
+def _registrar(conn, migracion):
+    conn.execute(text("""
+        INSERT INTO esquema_versiones (version, nombre, checksum)
+        VALUES (:version, :nombre, :checksum)
+    """), {"version": migracion.version, "nombre": migracion.nombre, "checksum": migracion.checksum})
+
+
+def aplicar_migraciones(destino=None, bind=None):
+    """
+    Aplica las migraciones pendientes y devuelve la lista de versiones aplicadas.
+    destino: aplicar solo hasta esa versión (None = todas).
+    bind: engine a migrar (por defecto el de la aplicación).
+    """
+    bind = bind or engine
+    aplicadas_ahora = []
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("SELECT pg_advisory_lock(:clave)"), {"clave": CLAVE_BLOQUEO})
+        try:
+            aplicadas = versiones_aplicadas(conn)
+
+            for migracion in listar_migraciones():
+                if destino is not None and migracion.version > destino:
+                    break
+                if migracion.version in aplicadas:
+                    if aplicadas[migracion.version] != migracion.checksum:
+                        print(f"⚠️  La migración {migracion.version:03d} cambió después de aplicarse")
+                    continue
+
+                print(f"🔧 Aplicando migración {migracion.version:03d}_{migracion.nombre}...")
+                if migracion.sin_transaccion:
+                    _aplicar_sin_transaccion(conn, migracion)
+                else:
+                    with bind.begin() as tx:
+                        tx.exec_driver_sql(migracion.sql)
+                        _registrar(tx, migracion)
+                aplicadas_ahora.append(migracion.version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": CLAVE_BLOQUEO})
+
+    if aplicadas_ahora:
+        print(f"✅ Migraciones aplicadas: {aplicadas_ahora}")
+    return aplicadas_ahora
+
+
+def estado_migraciones():
+    """Versión actual y pendientes (para /api/database/migraciones)"""
+    with engine.connect() as conn:
+        aplicadas = versiones_aplicadas(conn)
+        conn.commit()
+
+    todas = listar_migraciones()
+    return {
+        "version_actual": max(aplicadas, default=0),
+        "aplicadas": sorted(aplicadas),
+        "pendientes": [m.version for m in todas if m.version not in aplicadas],
+        "modificadas": [m.version for m in todas if m.version in aplicadas and aplicadas[m.version] != m.checksum]
+    }
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Float, Numeric, TIMESTAMP, Boolean, Text, ForeignKey, JSON, CheckConstraint, Time
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Numeric, TIMESTAMP, Boolean, Text, ForeignKey, JSON, CheckConstraint, Time, Index, CHAR, text
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
 from .database import Base
@@ -20,6 +20,7 @@ class Usuario(Base):
     
     __table_args__ = (
         CheckConstraint("rol IN ('admin', 'repartidor')", name='rol_check'),
+        Index('ix_usuarios_rol_activo', 'rol', 'activo'),
     )
 
 class Vehiculo(Base):
@@ -61,6 +62,11 @@ class Asignacion(Base):
     __table_args__ = (
         CheckConstraint("estado IN ('activa', 'completada', 'cancelada')", name='estado_asignacion_check'),
         CheckConstraint("numero_paquetes >= 0", name='paquetes_check'),
+        Index('ix_asignaciones_repartidor_estado', 'id_repartidor', 'estado'),
+        Index('ix_asignaciones_vehiculo_estado', 'id_vehiculo', 'estado'),
+        Index('ix_asignaciones_fecha_id', text('fecha_asignacion DESC'), text('id DESC')),
+        Index('ix_asignaciones_activas_fecha_id', text('fecha_asignacion DESC'), text('id DESC'),
+              postgresql_where=text("estado = 'activa'")),
     )
     
     # Relaciones
@@ -70,44 +76,117 @@ class Asignacion(Base):
 class Pedido(Base):
     __tablename__ = 'pedidos'
     
-    id = Column(Integer, primary_key=True, index=True)
-    numero_pedido = Column(String(50), unique=True, nullable=False)
+    # Particionada por mes de fecha_creacion (migración 007): la llave primaria
+    # incluye la fecha y la unicidad de numero_pedido va en numeros_pedido
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    numero_pedido = Column(String(50), nullable=False)
     id_vehiculo = Column(Integer, ForeignKey('vehiculos.id', ondelete='CASCADE'), nullable=False)
+    id_repartidor = Column(Integer, ForeignKey('usuarios.id', ondelete='SET NULL'))
     capacidad_paquetes = Column(Integer)
     destino_entrega = Column(Text, nullable=False)
     estado = Column(String(20), default='pendiente')
-    fecha_creacion = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    fecha_creacion = Column(TIMESTAMP(timezone=True), primary_key=True, server_default=func.now())
     fecha_asignacion = Column(TIMESTAMP(timezone=True))
     fecha_entrega_estimada = Column(TIMESTAMP(timezone=True))
     fecha_entrega_real = Column(TIMESTAMP(timezone=True))
     
     __table_args__ = (
         CheckConstraint("estado IN ('pendiente', 'procesando', 'en_ruta', 'entregado', 'cancelado')", name='estado_pedido_check'),
+        Index('ix_pedidos_estado_fecha', 'estado', text('fecha_creacion DESC')),
+        Index('ix_pedidos_vehiculo', 'id_vehiculo'),
+        Index('ix_pedidos_fecha_id', text('fecha_creacion DESC'), text('id DESC')),
+        Index('ix_pedidos_repartidor_fecha', 'id_repartidor', text('fecha_creacion DESC')),
+        {'postgresql_partition_by': 'RANGE (fecha_creacion)'},
     )
     
     vehiculo = relationship("Vehiculo", foreign_keys=[id_vehiculo])
+    repartidor = relationship("Usuario", foreign_keys=[id_repartidor])
+
+class NumeroPedido(Base):
+    __tablename__ = 'numeros_pedido'
+    
+    numero_pedido = Column(String(50), primary_key=True)   # unicidad de pedidos.numero_pedido entre particiones
 
 class RutaAsignada(Base):
     __tablename__ = 'rutas_asignadas'
     
-    id = Column(Integer, primary_key=True, index=True)
+    # Particionada por mes de fecha_calculo (migración 007)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     id_asignacion = Column(Integer, ForeignKey('asignaciones.id', ondelete='CASCADE'), nullable=False)
-    id_pedido = Column(Integer, ForeignKey('pedidos.id', ondelete='SET NULL'))
+    id_pedido = Column(Integer)  # sin FOREIGN KEY: pedidos.id sola ya no es única
     origen_direccion = Column(Text, nullable=False)
     destino_direccion = Column(Text, nullable=False)
     distancia_km = Column(Numeric(8, 2), nullable=False)
     tiempo_min = Column(Numeric(8, 2), nullable=False)
-    ruta_mapquest = Column(JSONB, nullable=False)
+    hash_cuerpo = Column(CHAR(64), ForeignKey('cuerpos_ruta.hash'))  # geometría y maniobras en cuerpos_ruta
+    id_ruta_compartida = Column(Integer, ForeignKey('rutas_compartidas.id', ondelete='SET NULL'))
     vehiculo_tipo = Column(String(20), nullable=False)
     consumo_data = Column(JSONB)
     costo_total = Column(Numeric(10, 2))
     emisiones_co2_kg = Column(Numeric(8, 2))
-    fecha_calculo = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    fecha_calculo = Column(TIMESTAMP(timezone=True), primary_key=True, server_default=func.now())
     activa = Column(Boolean, default=True)
     
     __table_args__ = (
         CheckConstraint("vehiculo_tipo IN ('gasolina', 'hibrido', 'electrico')", name='tipo_ruta_check'),
+        Index('ix_rutas_asignadas_asignacion_activa', 'id_asignacion', text('fecha_calculo DESC'),
+              postgresql_where=text('activa')),
+        Index('ix_rutas_asignadas_pedido', 'id_pedido', postgresql_where=text('id_pedido IS NOT NULL')),
+        Index('ix_rutas_asignadas_activas_fecha_id', text('fecha_calculo DESC'), text('id DESC'),
+              postgresql_where=text('activa')),
+        Index('ix_rutas_asignadas_hash_cuerpo', 'hash_cuerpo'),
+        Index('ix_rutas_asignadas_ruta_compartida', 'id_ruta_compartida',
+              postgresql_where=text('id_ruta_compartida IS NOT NULL')),
+        {'postgresql_partition_by': 'RANGE (fecha_calculo)'},
     )
     
     asignacion = relationship("Asignacion", foreign_keys=[id_asignacion])
-    pedido = relationship("Pedido", foreign_keys=[id_pedido])
\ No newline at end of file
+    pedido = relationship("Pedido", primaryjoin="foreign(RutaAsignada.id_pedido) == Pedido.id", viewonly=True)
+
+class CuerpoRuta(Base):
+    __tablename__ = 'cuerpos_ruta'
+    
+    hash = Column(CHAR(64), primary_key=True)               # SHA-256 del jsonb
+    cuerpo = Column(JSONB, nullable=False)                  # geometría (polyline) y maniobras
+    bytes = Column(Integer, nullable=False)
+    fecha_creacion = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class RutaCompartida(Base):
+    __tablename__ = 'rutas_compartidas'
+    
+    id = Column(Integer, primary_key=True)
+    clave = Column(CHAR(64), unique=True, nullable=False)   # SHA-256 de (origen, destino, opciones, época)
+    origen = Column(Text, nullable=False)
+    destino = Column(Text, nullable=False)
+    opciones = Column(JSONB, nullable=False)
+    epoca = Column(Integer, nullable=False)                 # época de tráfico (RUTAS_EPOCA_HORAS)
+    distancia_km = Column(Numeric(8, 2), nullable=False)
+    tiempo_min = Column(Numeric(8, 2), nullable=False)
+    hash_cuerpo = Column(CHAR(64), ForeignKey('cuerpos_ruta.hash'), nullable=False)
+    fecha_calculo = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_rutas_compartidas_epoca', 'epoca'),
+        Index('ix_rutas_compartidas_hash_cuerpo', 'hash_cuerpo'),
+    )
+
+class Contador(Base):
+    __tablename__ = 'contadores'
+    
+    clave = Column(String(60), primary_key=True)
+    valor = Column(BigInteger, nullable=False, default=0)
+    actualizado = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class KpiRollup(Base):
+    __tablename__ = 'kpi_rollups'
+    
+    granularidad = Column(String(10), primary_key=True)   # 'hora' o 'dia'
+    dimension = Column(String(20), primary_key=True)      # 'vehiculo', 'tipo' o 'repartidor'
+    clave = Column(String(60), primary_key=True)
+    bucket = Column(TIMESTAMP(timezone=True), primary_key=True)
+    rutas = Column(BigInteger, nullable=False, default=0)
+    distancia_km = Column(Numeric(14, 2), nullable=False, default=0)
+    tiempo_min = Column(Numeric(14, 2), nullable=False, default=0)
+    costo_total = Column(Numeric(14, 2), nullable=False, default=0)
+    emisiones_co2_kg = Column(Numeric(14, 2), nullable=False, default=0)
+    actualizado = Column(TIMESTAMP(timezone=True), server_default=func.now())
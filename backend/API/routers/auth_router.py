@@ -1,14 +1,16 @@
-﻿from fastapi import APIRouter, HTTPException, Depends, status
+﻿from fastapi import APIRouter, HTTPException, Depends, Request, status
 from pydantic import BaseModel
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-import os
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
 # Importar conexión PostgreSQL
-from ..database import get_db
+from ..database_async import get_async_db
+from ..seguridad import SECRET_KEY, ALGORITHM, create_access_token, token_del_request, usuario_actual
+from backend.core import contadores
+from backend.core import consultas
+from backend.core import sesiones
 
 router = APIRouter()
 load_dotenv()
@@ -48,27 +50,12 @@ class UserResponse(BaseModel):
     activo: bool
     fecha_registro: datetime
 
-# =========================
-# CONFIGURACIÓN JWT
-# =========================
-
-SECRET_KEY = os.getenv("SECRET_KEY", "tu_clave_secreta_super_segura_aqui_123")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
-
-def create_access_token(data: dict):
-    """Crea token JWT"""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
 # =========================
 # ENDPOINTS DE AUTENTICACIÓN
 # =========================
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Login de usuario (admin o repartidor)
     - Acepta email O username
@@ -78,15 +65,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
     """
     try:
         # MODIFICADO: Buscar por email O username
-        query = text("""
-            SELECT id, nombre_completo, email, username, telefono, 
-                   password_hash, rol, activo
-            FROM usuarios 
-            WHERE (email = :identifier OR username = :identifier) 
-            AND activo = TRUE
-        """)
-        
-        result = db.execute(query, {"identifier": request.email})
+        result = await db.execute(consultas.USUARIO_LOGIN, {"identifier": request.email})
         user = result.fetchone()
         
         if not user:
@@ -107,13 +86,9 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
         print(f"✅ Login exitoso: {user.email} - Rol: {user.rol}")
         
         # Actualizar último login
-        update_query = text("""
-            UPDATE usuarios 
-            SET ultimo_login = CURRENT_TIMESTAMP 
-            WHERE id = :id
-        """)
-        db.execute(update_query, {"id": user.id})
-        db.commit()
+        await db.execute(consultas.USUARIO_ULTIMO_LOGIN, {"id": user.id})
+        await db.commit()
+        sesiones.invalidar_usuario(user.id)   # el siguiente request vuelve a leer su perfil
         
         # Crear token JWT
         token_data = {
@@ -145,7 +120,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
         )
 
 @router.post("/register", response_model=UserResponse)
-def register(request: RegisterRequest, db: Session = Depends(get_db)):
+async def register(request: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Registro de nuevo usuario
     - Valida que el email y username sean únicos
@@ -155,8 +130,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
         print(f"📝 Intento de registro: {request.email} - Usuario: {request.username}")
         
         # Verificar si email ya existe
-        check_email = text("SELECT id FROM usuarios WHERE email = :email")
-        email_exists = db.execute(check_email, {"email": request.email}).fetchone()
+        email_exists = (await db.execute(consultas.USUARIO_POR_EMAIL, {"email": request.email})).fetchone()
         
         if email_exists:
             print(f"⚠️  Email ya existe: {request.email}")
@@ -166,8 +140,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
             )
         
         # Verificar si username ya existe
-        check_username = text("SELECT id FROM usuarios WHERE username = :username")
-        username_exists = db.execute(check_username, {"username": request.username}).fetchone()
+        username_exists = (await db.execute(consultas.USUARIO_POR_USERNAME, {"username": request.username})).fetchone()
         
         if username_exists:
             print(f"⚠️  Username ya existe: {request.username}")
@@ -184,15 +157,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
             )
         
         # Insertar nuevo usuario
-        insert_query = text("""
-            INSERT INTO usuarios 
-            (nombre_completo, email, telefono, username, password_hash, rol)
-            VALUES (:nombre, :email, :telefono, :username, :password, :rol)
-            RETURNING id, nombre_completo, email, username, telefono, rol, 
-                     activo, fecha_registro
-        """)
-        
-        result = db.execute(insert_query, {
+        result = await db.execute(consultas.USUARIO_CREAR, {
             "nombre": request.nombre_completo,
             "email": request.email,
             "telefono": request.telefono,
@@ -202,7 +167,9 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
         })
         
         new_user = result.fetchone()
-        db.commit()
+        if new_user.rol == "repartidor" and new_user.activo:
+            await db.run_sync(contadores.ajustar_contador, contadores.REPARTIDORES_ACTIVOS, 1)
+        await db.commit()
         
         print(f"✅ Usuario registrado exitosamente: {new_user.email}")
         
@@ -220,7 +187,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error en registro: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -228,73 +195,30 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
         )
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user(
-    token: str,
-    db: Session = Depends(get_db)
-):
+async def get_current_user(usuario: sesiones.PerfilUsuario = Depends(usuario_actual)):
     """
     Obtiene información del usuario actual mediante token
+    (header Authorization: Bearer o parámetro ?token=)
     """
-    try:
-        # Decodificar token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        
-        if not email:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido"
-            )
-        
-        # Buscar usuario
-        query = text("""
-            SELECT id, nombre_completo, email, username, telefono, 
-                   rol, activo, fecha_registro, ultimo_login
-            FROM usuarios 
-            WHERE email = :email AND activo = TRUE
-        """)
-        
-        result = db.execute(query, {"email": email})
-        user = result.fetchone()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuario no encontrado"
-            )
-        
-        return UserResponse(
-            id=user.id,
-            nombre_completo=user.nombre_completo,
-            email=user.email,
-            username=user.username,
-            telefono=user.telefono,
-            rol=user.rol,
-            activo=user.activo,
-            fecha_registro=user.fecha_registro
-        )
-        
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token expirado o inválido"
-        )
+    return UserResponse(
+        id=usuario.id,
+        nombre_completo=usuario.nombre_completo,
+        email=usuario.email,
+        username=usuario.username,
+        telefono=usuario.telefono,
+        rol=usuario.rol,
+        activo=usuario.activo,
+        fecha_registro=usuario.fecha_registro
+    )
 
 @router.get("/repartidores")
-def get_repartidores(db: Session = Depends(get_db)):
+async def get_repartidores(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene lista de repartidores activos
     (Para que admin pueda asignar en formulario 2)
     """
     try:
-        query = text("""
-            SELECT id, nombre_completo, email, username, telefono
-            FROM usuarios 
-            WHERE rol = 'repartidor' AND activo = TRUE
-            ORDER BY nombre_completo
-        """)
-        
-        result = db.execute(query)
+        result = await db.execute(consultas.REPARTIDORES_ACTIVOS)
         repartidores = result.fetchall()
         
         return {
@@ -317,11 +241,22 @@ def get_repartidores(db: Session = Depends(get_db)):
         )
 
 @router.post("/logout")
-def logout(token: str = None):
+def logout(request: Request):
     """
-    Logout simbólico (en JWT stateless, el cliente debe eliminar el token)
+    Revoca el token (header Authorization: Bearer o parámetro ?token=):
+    hasta que expire, los endpoints autenticados lo rechazan.
+    El cliente también debe eliminarlo.
     """
+    token = token_del_request(request)
+    if token:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("jti"):
+                sesiones.revocar_token(payload["jti"], payload["exp"])
+        except JWTError:
+            pass   # expirado o inválido: ya no sirve
+    
     return {
         "message": "Logout exitoso. Elimine el token del cliente.",
         "timestamp": datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
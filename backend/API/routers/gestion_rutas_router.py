@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import json
 from dotenv import load_dotenv
-import requests
 
-from backend.API.database import get_db
+from backend.API.database_async import get_async_db
 from backend.core.dijkstra import obtener_ruta_multiparada
 from backend.core.simulacion import generar_mapa_visual
+from backend.core.seguimiento import invalidar_seguimientos
+from backend.core.calculos import calcular_por_tipo
+from backend.core.perfiles_vehiculo import obtener_perfil
+from backend.core.rollups import acumular_ruta
+from backend.core.rutas_compartidas import epoca_actual, clave_ruta, buscar_ruta, guardar_ruta
+from backend.core.geometria import desempaquetar_ruta, PRECISION_POLYLINE
+from backend.core import paginacion
+from backend.core import consultas
 
 router = APIRouter()
 load_dotenv()
@@ -70,81 +77,100 @@ UNIVERSIDADES = {
 class CalcularRutaRequest(BaseModel):
     origen: Optional[str] = None
 
+# Opciones con las que se pide la ruta a MapQuest (forman parte de la clave compartida)
+OPCIONES_RUTA = {"optimizar": True, "precision": PRECISION_POLYLINE}
+
 # ============================================
 # FUNCIONES AUXILIARES
 # ============================================
 
-def obtener_ruta_mapquest(origen: str, destino: str):
-    """Consulta MapQuest API para obtener ruta"""
-    API_KEY = os.getenv("MAPQUEST_API_KEY")
+def metricas_ruta(id_vehiculo, distancia_km):
+    """
+    Consumo, costo y emisiones de la ruta con el vehículo asignado
+    (None en cada campo si el vehículo no existe o su tipo no se soporta)
+    """
+    perfil = obtener_perfil(id_vehiculo)
+    calculo = calcular_por_tipo(perfil, distancia_km) if perfil and distancia_km > 0 else None
+    if not calculo:
+        return {"consumo": None, "costo": None, "emisiones": None}
+    
+    return {
+        "consumo": json.dumps(calculo["consumo"]),
+        "costo": round(calculo["costo"], 2),
+        "emisiones": round(calculo["emisiones"], 2)
+    }
+
+async def obtener_ruta_compartida(db, origen, destino, forzar=False):
+    """
+    Ruta origen -> destino de la época de tráfico actual: la guardada en
+    rutas_compartidas si existe (sin llamar a MapQuest) o una nueva.
+    forzar=True siempre consulta MapQuest y reemplaza la guardada.
+    """
+    epoca = epoca_actual()
+    clave = clave_ruta(origen, destino, OPCIONES_RUTA, epoca)
+    
+    if not forzar:
+        encontrada = await db.run_sync(buscar_ruta, clave)
+        if encontrada:
+            id_compartida, distancia_km, tiempo_min, hash_cuerpo, cuerpo = encontrada
+            geometria, _ = desempaquetar_ruta(cuerpo)
+            print(f"♻️  Ruta compartida reutilizada: {id_compartida} ({destino})")
+            return {
+                "id": id_compartida, "hash_cuerpo": hash_cuerpo, "distancia_km": distancia_km,
+                "tiempo_min": tiempo_min, "geometria": geometria, "reutilizada": True
+            }
     
-    if not API_KEY:
+    api_key = os.getenv("MAPQUEST_API_KEY")
+    if not api_key:
         raise HTTPException(status_code=500, detail="API Key de MapQuest no configurada")
     
-    url = f"http://www.mapquestapi.com/directions/v2/route?key={API_KEY}"
+    resultado = await run_in_threadpool(
+        obtener_ruta_multiparada, api_key, [origen, destino],
+        OPCIONES_RUTA["optimizar"], OPCIONES_RUTA["precision"]
+    )
+    if len(resultado.geometria) == 0:
+        raise HTTPException(status_code=400, detail="No se obtuvo geometría de MapQuest")
     
-    payload = {
-        "locations": [origen, destino],
-        "options": {
-            "unit": "k",
-            "routeType": "fastest",
-            "doReverseGeocode": False
-        }
+    id_compartida, hash_cuerpo = await db.run_sync(
+        guardar_ruta, clave, origen, destino, OPCIONES_RUTA, epoca,
+        resultado.distancia_total_km, resultado.tiempo_total_min, resultado.empaquetar()
+    )
+    return {
+        "id": id_compartida, "hash_cuerpo": hash_cuerpo, "distancia_km": resultado.distancia_total_km,
+        "tiempo_min": resultado.tiempo_total_min, "geometria": resultado.geometria, "reutilizada": False
     }
-    
-    try:
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        if "route" not in data:
-            raise Exception("No se pudo calcular la ruta")
-        
-        route = data["route"]
-        
-        return {
-            "distancia_km": route.get("distance", 0),
-            "tiempo_min": route.get("time", 0) / 60,
-            "ruta_completa": data
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error con MapQuest: {str(e)}")
 
 # ============================================
 # ENDPOINTS
 # ============================================
 
 @router.get("/pendientes")
-def listar_asignaciones_pendientes(db: Session = Depends(get_db)):
+async def listar_asignaciones_pendientes(
+    response: Response,
+    id_repartidor: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(paginacion.LIMITE_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Lista asignaciones activas que AÚN NO tienen ruta calculada
+    Lista asignaciones activas que AÚN NO tienen ruta calculada (por páginas)
     """
     try:
-        query = text("""
-            SELECT 
-                a.id as asignacion_id,
-                a.numero_paquetes,
-                a.ruta_municipio as destino,
-                a.fecha_asignacion,
-                u.id as repartidor_id,
-                u.nombre_completo as repartidor_nombre,
-                v.id as vehiculo_id,
-                v.modelo as vehiculo_modelo,
-                v.tipo as vehiculo_tipo
-            FROM asignaciones a
-            INNER JOIN usuarios u ON a.id_repartidor = u.id
-            INNER JOIN vehiculos v ON a.id_vehiculo = v.id
-            LEFT JOIN rutas_asignadas r ON a.id = r.id_asignacion AND r.activa = TRUE
-            WHERE a.estado = 'activa'
-                AND r.id IS NULL
-            ORDER BY a.fecha_asignacion DESC
-        """)
-        
-        result = db.execute(query)
-        asignaciones = result.fetchall()
+        query, params = consultas.ASIGNACIONES_PENDIENTES.preparar(cursor, limite, id_repartidor=id_repartidor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await db.execute(query, params)
+        asignaciones, siguiente = paginacion.cortar_pagina(
+            result.fetchall(), limite, "fecha_asignacion", "asignacion_id"
+        )
+        if siguiente:
+            response.headers[paginacion.ENCABEZADO] = siguiente
         
         return {
             "total": len(asignaciones),
+            "siguiente_cursor": siguiente,
             "asignaciones": [
                 {
                     "asignacion_id": a.asignacion_id,
@@ -167,23 +193,17 @@ def listar_asignaciones_pendientes(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/calcular/{asignacion_id}")
-def calcular_ruta(
+async def calcular_ruta(
     asignacion_id: int,
     request: CalcularRutaRequest = CalcularRutaRequest(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Calcula ruta REAL con geometría para una asignación y la guarda en la DB
     """
     try:
         # 1. Buscar los datos de la asignación
-        check_query = text("""
-            SELECT a.id, a.ruta_municipio, v.tipo as vehiculo_tipo
-            FROM asignaciones a
-            INNER JOIN vehiculos v ON a.id_vehiculo = v.id
-            WHERE a.id = :asignacion_id AND a.estado = 'activa'
-        """)
-        asig = db.execute(check_query, {"asignacion_id": asignacion_id}).fetchone()
+        asig = (await db.execute(consultas.ASIGNACION_PARA_RUTA, {"asignacion_id": asignacion_id})).fetchone()
 
         if not asig:
             raise HTTPException(status_code=404, detail="Asignación no encontrada")
@@ -192,101 +212,87 @@ def calcular_ruta(
         destino_completo = UNIVERSIDADES.get(asig.ruta_municipio, f"{asig.ruta_municipio}, Estado de México")
         origen = request.origen or ORIGEN_BASE
         
-        # 3. LLAMAR A DIJKSTRA
-        api_key = os.getenv("MAPQUEST_API_KEY")
-        maniobras, geometria, bbox, orden = obtener_ruta_multiparada(api_key, [origen, destino_completo])
-
-        if not geometria:
-            raise HTTPException(status_code=400, detail="No se obtuvo geometría de MapQuest")
+        # 3. RUTA COMPARTIDA DE HOY (o LLAMAR A DIJKSTRA si nadie la ha calculado)
+        ruta = await obtener_ruta_compartida(db, origen, destino_completo)
         
         # 4. ACTUALIZAR MAPA PARA EL ADMINISTRADOR (simulacion.py)
-        generar_mapa_visual(None, geometria, [], [{"pos": [0,0], "dir": origen}, {"pos": [0,0], "dir": destino_completo}])
+        await run_in_threadpool(
+            generar_mapa_visual,
+            None, ruta["geometria"], [], [{"pos": [0,0], "dir": origen}, {"pos": [0,0], "dir": destino_completo}]
+        )
 
         # 5. GUARDAR EN BASE DE DATOS PARA EL REPARTIDOR
-        distancia_km = sum(m.get('distance', 0) for m in maniobras)
-        tiempo_min = sum(m.get('time', 0) for m in maniobras) / 60
+        distancia_km = ruta["distancia_km"]
+        tiempo_min = ruta["tiempo_min"]
 
-        datos_ruta = {
-            "puntos": geometria,
-            "maniobras": maniobras,
-            "bbox": bbox
-        }
-
-        insert_query = text("""
-            INSERT INTO rutas_asignadas (
-                id_asignacion, origen_direccion, destino_direccion,
-                distancia_km, tiempo_min, ruta_mapquest,
-                vehiculo_tipo, activa
-            ) VALUES (
-                :asig_id, :origen, :destino,
-                :dist, :tiempo, CAST(:ruta_json AS jsonb),
-                :v_tipo, TRUE
-            )
-        """)
+        metricas = await run_in_threadpool(metricas_ruta, asig.id_vehiculo, distancia_km)
 
-        db.execute(insert_query, {
+        # La geometría no se copia: la ruta apunta a la compartida y a su cuerpo
+        ruta_id = (await db.execute(consultas.RUTA_ASIGNADA_CREAR, {
             "asig_id": asignacion_id,
             "origen": origen,
             "destino": destino_completo,
             "dist": distancia_km,
             "tiempo": tiempo_min,
-            "ruta_json": json.dumps(datos_ruta),
-            "v_tipo": asig.vehiculo_tipo
-        })
+            "hash_cuerpo": ruta["hash_cuerpo"],
+            "id_compartida": ruta["id"],
+            "v_tipo": asig.vehiculo_tipo,
+            **metricas
+        })).scalar()
+        await db.run_sync(acumular_ruta, ruta_id, 1)
 
-        db.commit()
+        await db.commit()
+        invalidar_seguimientos()
 
         # ✅ CORREGIDO: Devolvemos los datos numéricos para evitar el error 'toFixed' en el frontend
         return {
             "status": "success", 
             "mensaje": "Ruta guardada y mapa actualizado",
+            "ruta_id": ruta_id,
             "distancia_km": distancia_km,
             "tiempo_min": tiempo_min,
-            "costo_total": 0,       # Valor por defecto para frontend
-            "emisiones_co2_kg": 0   # Valor por defecto para frontend
+            "costo_total": metricas["costo"] or 0,
+            "emisiones_co2_kg": metricas["emisiones"] or 0,
+            "ruta_reutilizada": ruta["reutilizada"]
         }
     
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error en el router: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/calculadas")
-def listar_rutas_calculadas(db: Session = Depends(get_db)):
+async def listar_rutas_calculadas(
+    response: Response,
+    id_repartidor: Optional[int] = None,
+    vehiculo_tipo: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(paginacion.LIMITE_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Lista todas las rutas calculadas y activas
+    Lista las rutas calculadas y activas, de la más reciente a la más antigua (por páginas)
     """
     try:
-        query = text("""
-            SELECT 
-                r.id as ruta_id,
-                r.origen_direccion,
-                r.destino_direccion,
-                r.distancia_km,
-                r.tiempo_min,
-                r.costo_total,
-                r.emisiones_co2_kg,
-                r.fecha_calculo,
-                a.id as asignacion_id,
-                a.numero_paquetes,
-                u.id as repartidor_id,
-                u.nombre_completo as repartidor_nombre,
-                v.modelo as vehiculo_modelo,
-                v.tipo as vehiculo_tipo
-            FROM rutas_asignadas r
-            INNER JOIN asignaciones a ON r.id_asignacion = a.id
-            INNER JOIN usuarios u ON a.id_repartidor = u.id
-            INNER JOIN vehiculos v ON a.id_vehiculo = v.id
-            WHERE r.activa = TRUE
-            ORDER BY r.fecha_calculo DESC
-        """)
-        
-        result = db.execute(query)
-        rutas = result.fetchall()
+        query, params = consultas.RUTAS_CALCULADAS.preparar(
+            cursor, limite, id_repartidor=id_repartidor, vehiculo_tipo=vehiculo_tipo
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await db.execute(query, params)
+        rutas, siguiente = paginacion.cortar_pagina(result.fetchall(), limite, "fecha_calculo", "ruta_id")
+        if siguiente:
+            response.headers[paginacion.ENCABEZADO] = siguiente
         
         return {
             "total": len(rutas),
+            "siguiente_cursor": siguiente,
             "rutas": [
                 {
                     "ruta_id": r.ruta_id,
@@ -314,73 +320,68 @@ def listar_rutas_calculadas(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.delete("/{ruta_id}")
-def eliminar_ruta(ruta_id: int, db: Session = Depends(get_db)):
+async def eliminar_ruta(ruta_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Marca una ruta como inactiva (soft delete)
     """
     try:
-        query = text("""
-            UPDATE rutas_asignadas
-            SET activa = FALSE
-            WHERE id = :ruta_id
-            RETURNING id
-        """)
+        # Sale de los acumulados de KPIs (no hace nada si ya estaba inactiva)
+        await db.run_sync(acumular_ruta, ruta_id, -1)
         
-        result = db.execute(query, {"ruta_id": ruta_id})
+        result = await db.execute(consultas.RUTA_DESACTIVAR, {"ruta_id": ruta_id})
         
         if not result.fetchone():
             raise HTTPException(status_code=404, detail="Ruta no encontrada")
         
-        db.commit()
+        await db.commit()
+        invalidar_seguimientos()
         
         return {"mensaje": "Ruta eliminada exitosamente", "ruta_id": ruta_id}
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.put("/recalcular/{ruta_id}")
-def recalcular_ruta(ruta_id: int, db: Session = Depends(get_db)):
+async def recalcular_ruta(ruta_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Recalcula una ruta existente (actualiza distancia, tiempo, etc.)
     """
     try:
         # Obtener datos actuales
-        query = text("""
-            SELECT origen_direccion, destino_direccion, vehiculo_tipo
-            FROM rutas_asignadas
-            WHERE id = :ruta_id AND activa = TRUE
-        """)
-        
-        ruta = db.execute(query, {"ruta_id": ruta_id}).fetchone()
+        ruta = (await db.execute(consultas.RUTA_PARA_RECALCULAR, {"ruta_id": ruta_id})).fetchone()
         
         if not ruta:
             raise HTTPException(status_code=404, detail="Ruta no encontrada")
         
-        # Recalcular con MapQuest
-        ruta_data = obtener_ruta_mapquest(ruta.origen_direccion, ruta.destino_direccion)
+        # Recalcular con MapQuest; la ruta nueva reemplaza a la compartida de hoy
+        # para que las siguientes asignaciones al mismo destino la reutilicen
+        nueva = await obtener_ruta_compartida(db, ruta.origen_direccion, ruta.destino_direccion, forzar=True)
+        
+        ruta_data = {
+            "distancia_km": nueva["distancia_km"],
+            "tiempo_min": nueva["tiempo_min"]
+        }
         
-        # Actualizar en BD
-        update_query = text("""
-            UPDATE rutas_asignadas
-            SET 
-                distancia_km = :distancia,
-                tiempo_min = :tiempo,
-                ruta_mapquest = CAST(:ruta_json AS jsonb),
-                fecha_calculo = CURRENT_TIMESTAMP
-            WHERE id = :ruta_id
-        """)
+        # Actualizar en BD (los acumulados salen con los valores viejos y entran con los nuevos)
+        await db.run_sync(acumular_ruta, ruta_id, -1)
         
-        db.execute(update_query, {
+        # La fecha nueva puede mover la fila a la partición del mes actual
+        await db.execute(consultas.RUTA_RECALCULAR, {
             "ruta_id": ruta_id,
+            "fecha_anterior": ruta.fecha_calculo,
             "distancia": ruta_data["distancia_km"],
             "tiempo": ruta_data["tiempo_min"],
-            "ruta_json": json.dumps(ruta_data["ruta_completa"])
+            "hash_cuerpo": nueva["hash_cuerpo"],
+            "id_compartida": nueva["id"],
+            **(await run_in_threadpool(metricas_ruta, ruta.id_vehiculo, ruta_data["distancia_km"]))
         })
+        await db.run_sync(acumular_ruta, ruta_id, 1)
         
-        db.commit()
+        await db.commit()
+        invalidar_seguimientos()
         
         return {
             "mensaje": "Ruta recalculada exitosamente",
@@ -392,5 +393,5 @@ def recalcular_ruta(ruta_id: int, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
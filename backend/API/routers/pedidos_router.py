@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+import csv
 from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import text, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_
 
-from ..database import get_db
+from ..database_async import get_async_db
+from backend.core.perfiles_vehiculo import invalidar_perfiles
+from backend.core import contadores
+from backend.core import paginacion
+from backend.core import importacion
+from backend.core import consultas
 
 router = APIRouter()
 
@@ -24,8 +31,8 @@ class PedidoCreate(BaseModel):
 class PedidoResponse(BaseModel):
     id: int
     numero_pedido: str
-    id_repartidor: int
-    nombre_repartidor: str
+    id_repartidor: Optional[int] = None
+    nombre_repartidor: Optional[str] = None
     id_vehiculo: int
     modelo_vehiculo: str
     tipo_vehiculo: str
@@ -49,199 +56,214 @@ class EstadisticasResponse(BaseModel):
 # =========================
 
 @router.post("/crear", response_model=PedidoResponse)
-def crear_pedido_completo(pedido: PedidoCreate, db: Session = Depends(get_db)):
+async def crear_pedido_completo(pedido: PedidoCreate, db: AsyncSession = Depends(get_async_db)):
     """
-    Crea un nuevo pedido con validación de asignación repartidor-vehículo
+    Crea un nuevo pedido con validación de asignación repartidor-vehículo.
+    
+    Todo ocurre en UNA sentencia (CTE): valida número, repartidor, vehículo y
+    capacidad, crea la asignación si no existe, inserta el pedido y ajusta los
+    contadores. Si algo no es válido no se escribe nada. Antes se toman los
+    candados del repartidor y del vehículo (los de ajustar_asignacion).
     """
+    # Validar estado (no requiere BD)
+    if pedido.estado not in contadores.ESTADOS_PEDIDO:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Estado no válido. Use: {', '.join(contadores.ESTADOS_PEDIDO)}"
+        )
+    
     try:
         print(f"📦 Creando pedido: {pedido.numero_pedido} - Repartidor: {pedido.id_repartidor} - Vehículo: {pedido.id_vehiculo}")
         
-        # 1. Verificar que el número de pedido no exista
-        check_query = text("SELECT id FROM pedidos WHERE numero_pedido = :numero")
-        pedido_existente = db.execute(check_query, {"numero": pedido.numero_pedido}).fetchone()
-        
-        if pedido_existente:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Ya existe un pedido con ese número"
-            )
-        
-        # 2. Verificar que el repartidor existe y es repartidor
-        repartidor_query = text("""
-            SELECT id, nombre_completo 
-            FROM usuarios 
-            WHERE id = :id AND rol = 'repartidor' AND activo = TRUE
-        """)
-        repartidor = db.execute(repartidor_query, {"id": pedido.id_repartidor}).fetchone()
-        
-        if not repartidor:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El repartidor no existe, no es repartidor o no está activo"
-            )
-        
-        # 3. Verificar que el vehículo existe
-        vehiculo_query = text("""
-            SELECT id, modelo, tipo 
-            FROM vehiculos 
-            WHERE id = :id AND activo = TRUE
-        """)
-        vehiculo = db.execute(vehiculo_query, {"id": pedido.id_vehiculo}).fetchone()
-        
-        if not vehiculo:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El vehículo no existe o no está activo"
-            )
-        
-        # 4. Verificar que existe asignación repartidor-vehículo (o crearla)
-        asignacion_query = text("""
-            SELECT id 
-            FROM asignaciones 
-            WHERE id_repartidor = :repartidor AND id_vehiculo = :vehiculo AND estado = 'activa'
-        """)
-        asignacion = db.execute(asignacion_query, {
-            "repartidor": pedido.id_repartidor,
-            "vehiculo": pedido.id_vehiculo
-        }).fetchone()
-        
-        if not asignacion:
-            print(f"⚠️ No hay asignación activa. Creando nueva asignación...")
-            # Crear nueva asignación automáticamente
-            crear_asignacion_query = text("""
-                INSERT INTO asignaciones (id_repartidor, id_vehiculo, numero_paquetes, estado)
-                VALUES (:repartidor, :vehiculo, :paquetes, 'activa')
-                RETURNING id
-            """)
-            
-            result = db.execute(crear_asignacion_query, {
-                "repartidor": pedido.id_repartidor,
-                "vehiculo": pedido.id_vehiculo,
-                "paquetes": pedido.capacidad_paquetes
-            })
-            nueva_asignacion = result.fetchone()
-            db.commit()
-            print(f"✅ Asignación creada: ID {nueva_asignacion.id}")
-        
-        # 5. Validar estado
-        estados_validos = ["pendiente", "procesando", "en_ruta", "entregado", "cancelado"]
-        if pedido.estado not in estados_validos:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Estado no válido. Use: {', '.join(estados_validos)}"
-            )
-        
-        # 6. Validar capacidad del vehículo
-        capacidad_vehiculo_query = text("SELECT capacidad_maxima_paquetes FROM vehiculos WHERE id = :id")
-        capacidad_max = db.execute(capacidad_vehiculo_query, {"id": pedido.id_vehiculo}).fetchone()
-        
-        if capacidad_max and pedido.capacidad_paquetes > capacidad_max[0]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Capacidad excedida. Máximo permitido: {capacidad_max[0]} paquetes"
-            )
-        
-        # 7. Insertar el pedido
-        insert_query = text("""
-            INSERT INTO pedidos 
-            (numero_pedido, id_vehiculo, capacidad_paquetes, destino_entrega, estado)
-            VALUES (:numero, :vehiculo, :capacidad, :destino, :estado)
-            RETURNING id, numero_pedido, id_vehiculo, capacidad_paquetes, 
-                     destino_entrega, estado, fecha_creacion, fecha_asignacion,
-                     fecha_entrega_estimada
-        """)
-        
-        result = db.execute(insert_query, {
+        await db.execute(consultas.ASIGNACION_BLOQUEAR, {
+            "clase_repartidor": contadores.BLOQUEO_REPARTIDOR, "repartidor": pedido.id_repartidor,
+            "clase_vehiculo": contadores.BLOQUEO_VEHICULO, "vehiculo": pedido.id_vehiculo
+        })
+        resultado = (await db.execute(consultas.PEDIDO_CREAR, {
             "numero": pedido.numero_pedido,
+            "repartidor": pedido.id_repartidor,
             "vehiculo": pedido.id_vehiculo,
             "capacidad": pedido.capacidad_paquetes,
             "destino": pedido.destino_entrega,
-            "estado": pedido.estado
-        })
-        
-        nuevo_pedido = result.fetchone()
-        db.commit()
-        
-        print(f"✅ Pedido creado exitosamente: ID {nuevo_pedido.id}")
+            "estado": pedido.estado,
+            "clave_estado": contadores.PEDIDOS.format(pedido.estado),
+            "clave_paquetes": contadores.PEDIDOS_PAQUETES,
+            "clave_asignaciones": contadores.ASIGNACIONES_ACTIVAS,
+            "clave_repartidores": contadores.REPARTIDORES_CON_ASIGNACION,
+            "clave_vehiculos": contadores.VEHICULOS_ASIGNADOS
+        })).fetchone()
+        
+        if resultado.id is None:
+            await db.rollback()
+            if resultado.duplicado or (resultado.repartidor_ok and resultado.vehiculo_ok and resultado.capacidad_ok):
+                detalle = "Ya existe un pedido con ese número"
+            elif not resultado.repartidor_ok:
+                detalle = "El repartidor no existe, no es repartidor o no está activo"
+            elif not resultado.vehiculo_ok:
+                detalle = "El vehículo no existe o no está activo"
+            else:
+                detalle = f"Capacidad excedida. Máximo permitido: {resultado.capacidad_maxima_paquetes} paquetes"
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detalle)
+        
+        await db.commit()
+        
+        if resultado.asignacion_creada:
+            invalidar_perfiles()
+            print(f"✅ Asignación creada: ID {resultado.asignacion_creada}")
+        print(f"✅ Pedido creado exitosamente: ID {resultado.id}")
         
-        # 8. Retornar respuesta completa
         return {
-            "id": nuevo_pedido.id,
-            "numero_pedido": nuevo_pedido.numero_pedido,
-            "id_repartidor": pedido.id_repartidor,
-            "nombre_repartidor": repartidor.nombre_completo,
-            "id_vehiculo": nuevo_pedido.id_vehiculo,
-            "modelo_vehiculo": vehiculo.modelo,
-            "tipo_vehiculo": vehiculo.tipo,
-            "destino_entrega": nuevo_pedido.destino_entrega,
-            "capacidad_paquetes": nuevo_pedido.capacidad_paquetes,
-            "estado": nuevo_pedido.estado,
-            "fecha_creacion": nuevo_pedido.fecha_creacion,
-            "fecha_asignacion": nuevo_pedido.fecha_asignacion,
-            "fecha_entrega_estimada": nuevo_pedido.fecha_entrega_estimada
+            "id": resultado.id,
+            "numero_pedido": resultado.numero_pedido,
+            "id_repartidor": resultado.id_repartidor,
+            "nombre_repartidor": resultado.nombre_repartidor,
+            "id_vehiculo": resultado.id_vehiculo,
+            "modelo_vehiculo": resultado.modelo_vehiculo,
+            "tipo_vehiculo": resultado.tipo_vehiculo,
+            "destino_entrega": resultado.destino_entrega,
+            "capacidad_paquetes": resultado.capacidad_paquetes,
+            "estado": resultado.estado,
+            "fecha_creacion": resultado.fecha_creacion,
+            "fecha_asignacion": resultado.fecha_asignacion,
+            "fecha_entrega_estimada": resultado.fecha_entrega_estimada
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error al crear pedido: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al crear pedido: {str(e)}"
         )
 
+@router.post("/importar")
+async def importar_pedidos(
+    request: Request,
+    formato: Optional[str] = None,
+    todo_o_nada: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Importa pedidos en bloque desde el cuerpo del request (CSV con encabezado
+    o NDJSON, una fila por pedido) con las columnas de /crear.
+    
+    - formato: csv o ndjson (por defecto según el Content-Type)
+    - todo_o_nada: si alguna fila tiene error no se importa ninguna
+    
+    Las filas se cargan con COPY a una tabla temporal y se validan e insertan
+    con una sola sentencia: repartidor activo, vehículo activo, capacidad,
+    número no repetido. Las asignaciones faltantes se crean como en /crear.
+    """
+    if formato is None:
+        formato = "ndjson" if "json" in request.headers.get("content-type", "") else "csv"
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no válido (use 'csv' o 'ndjson')"
+        )
+    
+    try:
+        registros, errores = await run_in_threadpool(importacion.leer_filas, await request.body(), formato)
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Archivo no válido: {str(e)}")
+    
+    total = len(registros) + len(errores)
+    if not registros or (todo_o_nada and errores):
+        return {"total": total, "insertados": 0, "asignaciones_creadas": 0, "errores": errores}
+    
+    try:
+        print(f"📥 Importando {len(registros)} pedidos ({formato})...")
+        
+        # 1. COPY a una tabla temporal (se elimina al terminar la transacción)
+        conn = await db.connection()
+        await conn.execute(consultas.IMPORTACION_TABLA)
+        conexion_asyncpg = (await conn.get_raw_connection()).driver_connection
+        await conexion_asyncpg.copy_records_to_table(
+            "importacion_pedidos", records=registros, columns=["fila", *importacion.COLUMNAS]
+        )
+        
+        # 2. Candados de los repartidores y vehículos del archivo (los de /crear),
+        #    antes de la sentencia que cuenta las asignaciones nuevas
+        await db.execute(consultas.IMPORTACION_BLOQUEAR, {
+            "clase_repartidor": contadores.BLOQUEO_REPARTIDOR,
+            "clase_vehiculo": contadores.BLOQUEO_VEHICULO
+        })
+        
+        # 3. Validar e insertar en bloque. La primera fila del resultado es el
+        #    resumen (fila NULL); las demás, las filas rechazadas.
+        filas = (await db.execute(consultas.IMPORTACION_MERGE, {
+            "estados": contadores.ESTADOS_PEDIDO,
+            "prefijo_estado": contadores.PEDIDOS.format(""),
+            "clave_paquetes": contadores.PEDIDOS_PAQUETES,
+            "clave_asignaciones": contadores.ASIGNACIONES_ACTIVAS,
+            "clave_repartidores": contadores.REPARTIDORES_CON_ASIGNACION,
+            "clave_vehiculos": contadores.VEHICULOS_ASIGNADOS
+        })).fetchall()
+        
+        resumen = next(f for f in filas if f.fila is None)
+        errores = sorted(
+            errores + [{"fila": f.fila, "error": f.error} for f in filas if f.fila is not None],
+            key=lambda e: e["fila"]
+        )
+        
+        if todo_o_nada and errores:
+            await db.rollback()
+            return {"total": total, "insertados": 0, "asignaciones_creadas": 0, "errores": errores}
+        
+        await db.commit()
+        if resumen.asignaciones_creadas:
+            invalidar_perfiles()
+        
+        print(f"✅ Importación: {resumen.insertados} pedidos, {resumen.asignaciones_creadas} asignaciones, {len(errores)} errores")
+        return {
+            "total": total,
+            "insertados": resumen.insertados,
+            "asignaciones_creadas": resumen.asignaciones_creadas,
+            "errores": errores
+        }
+        
+    except Exception as e:
+        await db.rollback()
+        print(f"❌ Error al importar pedidos: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al importar pedidos: {str(e)}"
+        )
+
 @router.get("/", response_model=List[PedidoResponse])
-def listar_pedidos(
+async def listar_pedidos(
+    response: Response,
     estado: Optional[str] = None,
     repartidor_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    id_vehiculo: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(paginacion.LIMITE_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Lista todos los pedidos con opciones de filtro
-    - estado: filtrar por estado
-    - repartidor_id: filtrar por repartidor
+    Lista los pedidos, del más reciente al más antiguo, por páginas
+    - estado / repartidor_id / id_vehiculo: filtros
+    - desde / hasta: rango de fecha_creacion
+    - cursor: valor del encabezado X-Siguiente-Cursor de la página anterior
+    - limite: pedidos por página
     """
     try:
-        # Construir query base con JOINs
-        query_base = """
-            SELECT 
-                p.id,
-                p.numero_pedido,
-                p.id_vehiculo,
-                p.capacidad_paquetes,
-                p.destino_entrega,
-                p.estado,
-                p.fecha_creacion,
-                p.fecha_asignacion,
-                p.fecha_entrega_estimada,
-                u.id as repartidor_id,
-                u.nombre_completo as repartidor_nombre,
-                v.modelo as vehiculo_modelo,
-                v.tipo as vehiculo_tipo
-            FROM pedidos p
-            JOIN vehiculos v ON p.id_vehiculo = v.id
-            JOIN asignaciones a ON v.id = a.id_vehiculo
-            JOIN usuarios u ON a.id_repartidor = u.id
-            WHERE 1=1
-        """
-        
-        params = {}
-        
-        # Aplicar filtros
-        if estado:
-            query_base += " AND p.estado = :estado"
-            params["estado"] = estado
-            
-        if repartidor_id:
-            query_base += " AND u.id = :repartidor_id"
-            params["repartidor_id"] = repartidor_id
-        
-        query_base += " ORDER BY p.fecha_creacion DESC"
-        
-        query = text(query_base)
-        result = db.execute(query, params)
-        pedidos = result.fetchall()
+        query, params = consultas.PEDIDOS_LISTADO.preparar(
+            cursor, limite, estado=estado, repartidor_id=repartidor_id,
+            id_vehiculo=id_vehiculo, desde=desde, hasta=hasta
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        result = await db.execute(query, params)
+        pedidos, siguiente = paginacion.cortar_pagina(result.fetchall(), limite, "fecha_creacion", "id")
+        if siguiente:
+            response.headers[paginacion.ENCABEZADO] = siguiente
         
         # Transformar resultados
         return [
@@ -271,40 +293,21 @@ def listar_pedidos(
         )
 
 @router.get("/estadisticas", response_model=EstadisticasResponse)
-def obtener_estadisticas(db: Session = Depends(get_db)):
+async def obtener_estadisticas(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene estadísticas de pedidos
     """
     try:
-        # Estadísticas de pedidos
-        pedidos_query = text("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(CASE WHEN estado = 'pendiente' THEN 1 END) as pendientes,
-                COUNT(CASE WHEN estado = 'en_ruta' THEN 1 END) as en_ruta,
-                COUNT(CASE WHEN estado = 'entregado' THEN 1 END) as entregados,
-                COALESCE(SUM(capacidad_paquetes), 0) as capacidad_total
-            FROM pedidos
-        """)
-        
-        pedidos_stats = db.execute(pedidos_query).fetchone()
-        
-        # Repartidores activos
-        repartidores_query = text("""
-            SELECT COUNT(DISTINCT id_repartidor) 
-            FROM asignaciones 
-            WHERE estado = 'activa'
-        """)
-        
-        repartidores_activos = db.execute(repartidores_query).fetchone()[0] or 0
+        # Contadores mantenidos por los endpoints de escritura
+        c = await db.run_sync(contadores.leer_contadores)
         
         return {
-            "total_pedidos": pedidos_stats.total or 0,
-            "pedidos_pendientes": pedidos_stats.pendientes or 0,
-            "pedidos_en_ruta": pedidos_stats.en_ruta or 0,
-            "pedidos_entregados": pedidos_stats.entregados or 0,
-            "capacidad_total": pedidos_stats.capacidad_total or 0,
-            "repartidores_activos": repartidores_activos
+            "total_pedidos": sum(c.get(contadores.PEDIDOS.format(e), 0) for e in contadores.ESTADOS_PEDIDO),
+            "pedidos_pendientes": c.get(contadores.PEDIDOS.format("pendiente"), 0),
+            "pedidos_en_ruta": c.get(contadores.PEDIDOS.format("en_ruta"), 0),
+            "pedidos_entregados": c.get(contadores.PEDIDOS.format("entregado"), 0),
+            "capacidad_total": c.get(contadores.PEDIDOS_PAQUETES, 0),
+            "repartidores_activos": c.get(contadores.REPARTIDORES_CON_ASIGNACION, 0)
         }
         
     except Exception as e:
@@ -315,31 +318,13 @@ def obtener_estadisticas(db: Session = Depends(get_db)):
         )
 
 @router.get("/repartidores")
-def obtener_repartidores_activos(db: Session = Depends(get_db)):
+async def obtener_repartidores_activos(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene lista de repartidores activos con sus asignaciones
     (Para poblar dropdown en frontend)
     """
     try:
-        query = text("""
-            SELECT 
-                u.id,
-                u.nombre_completo,
-                u.email,
-                u.telefono,
-                v.id as vehiculo_id,
-                v.modelo as vehiculo_modelo,
-                v.tipo as vehiculo_tipo,
-                a.id as asignacion_id,
-                a.estado as asignacion_estado
-            FROM usuarios u
-            LEFT JOIN asignaciones a ON u.id = a.id_repartidor AND a.estado = 'activa'
-            LEFT JOIN vehiculos v ON a.id_vehiculo = v.id
-            WHERE u.rol = 'repartidor' AND u.activo = TRUE
-            ORDER BY u.nombre_completo
-        """)
-        
-        result = db.execute(query)
+        result = await db.execute(consultas.REPARTIDORES_CON_ASIGNACION)
         repartidores = result.fetchall()
         
         return {
@@ -369,28 +354,13 @@ def obtener_repartidores_activos(db: Session = Depends(get_db)):
         )
 
 @router.get("/vehiculos")
-def obtener_vehiculos_disponibles(db: Session = Depends(get_db)):
+async def obtener_vehiculos_disponibles(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene lista de vehículos disponibles
     (Para poblar dropdown en frontend)
     """
     try:
-        query = text("""
-            SELECT 
-                id,
-                modelo,
-                tipo,
-                capacidad_maxima_paquetes,
-                velocidad_promedio_kmh,
-                rendimiento_gasolina,
-                rendimiento_electrico,
-                activo
-            FROM vehiculos 
-            WHERE activo = TRUE
-            ORDER BY modelo
-        """)
-        
-        result = db.execute(query)
+        result = await db.execute(consultas.VEHICULOS_ACTIVOS)
         vehiculos = result.fetchall()
         
         return {
@@ -416,18 +386,17 @@ def obtener_vehiculos_disponibles(db: Session = Depends(get_db)):
         )
 
 @router.put("/{pedido_id}/estado")
-def actualizar_estado_pedido(
+async def actualizar_estado_pedido(
     pedido_id: int,
     nuevo_estado: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualiza el estado de un pedido
     """
     try:
         # Verificar que el pedido existe
-        check_query = text("SELECT id FROM pedidos WHERE id = :id")
-        pedido = db.execute(check_query, {"id": pedido_id}).fetchone()
+        pedido = (await db.execute(consultas.PEDIDO_ESTADO, {"id": pedido_id})).fetchone()
         
         if not pedido:
             raise HTTPException(
@@ -444,31 +413,12 @@ def actualizar_estado_pedido(
             )
         
         # Actualizar estado
-        update_query = text("""
-            UPDATE pedidos 
-            SET estado = :estado,
-                fecha_asignacion = CASE 
-                    WHEN :estado = 'en_ruta' AND fecha_asignacion IS NULL 
-                    THEN CURRENT_TIMESTAMP 
-                    ELSE fecha_asignacion 
-                END,
-                fecha_entrega_estimada = CASE 
-                    WHEN :estado = 'en_ruta' AND fecha_entrega_estimada IS NULL 
-                    THEN CURRENT_TIMESTAMP + INTERVAL '2 hours'
-                    ELSE fecha_entrega_estimada 
-                END,
-                fecha_entrega_real = CASE 
-                    WHEN :estado = 'entregado' 
-                    THEN CURRENT_TIMESTAMP 
-                    ELSE fecha_entrega_real 
-                END
-            WHERE id = :id
-            RETURNING id, numero_pedido, estado
-        """)
-        
-        result = db.execute(update_query, {"id": pedido_id, "estado": nuevo_estado})
+        result = await db.execute(consultas.PEDIDO_ACTUALIZAR_ESTADO, {
+            "id": pedido_id, "fecha_creacion": pedido.fecha_creacion, "estado": nuevo_estado
+        })
         updated = result.fetchone()
-        db.commit()
+        await db.run_sync(contadores.ajustar_pedido, estado_anterior=pedido.estado, estado_nuevo=updated.estado)
+        await db.commit()
         
         print(f"✅ Estado actualizado: Pedido {updated.numero_pedido} -> {updated.estado}")
         
@@ -482,7 +432,7 @@ def actualizar_estado_pedido(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error al actualizar estado: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -490,18 +440,13 @@ def actualizar_estado_pedido(
         )
 
 @router.delete("/{pedido_id}")
-def eliminar_pedido(pedido_id: int, db: Session = Depends(get_db)):
+async def eliminar_pedido(pedido_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Elimina un pedido (solo si está pendiente)
     """
     try:
         # Verificar que el pedido existe y está pendiente
-        check_query = text("""
-            SELECT id, numero_pedido, estado 
-            FROM pedidos 
-            WHERE id = :id
-        """)
-        pedido = db.execute(check_query, {"id": pedido_id}).fetchone()
+        pedido = (await db.execute(consultas.PEDIDO_PARA_ELIMINAR, {"id": pedido_id})).fetchone()
         
         if not pedido:
             raise HTTPException(
@@ -515,10 +460,10 @@ def eliminar_pedido(pedido_id: int, db: Session = Depends(get_db)):
                 detail="Solo se pueden eliminar pedidos en estado 'pendiente'"
             )
         
-        # Eliminar pedido
-        delete_query = text("DELETE FROM pedidos WHERE id = :id")
-        db.execute(delete_query, {"id": pedido_id})
-        db.commit()
+        # Eliminar pedido, liberar su número y soltar las rutas que lo referencian
+        await db.execute(consultas.PEDIDO_ELIMINAR, {"id": pedido_id, "fecha_creacion": pedido.fecha_creacion})
+        await db.run_sync(contadores.ajustar_pedido, estado_anterior=pedido.estado, paquetes=pedido.capacidad_paquetes)
+        await db.commit()
         
         print(f"✅ Pedido eliminado: {pedido.numero_pedido}")
         
@@ -531,7 +476,7 @@ def eliminar_pedido(pedido_id: int, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error al eliminar pedido: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,19 +1,50 @@
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import numpy as np
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
-from ..database import get_db
+from ..database import engine
+from ..database_async import get_async_db
 from backend.core.calculos import (
     calcular_pedido,
+    calcular_pedidos_lote,
+    calcular_filas_lote,
     calcular_gasolina,
     calcular_electrico,
     calcular_hibrido
 )
+from backend.core.calculos import REPARTO_ENERGIA, coeficientes_por_km
+from backend.core.perfiles_vehiculo import perfil_por_tipo, perfiles_activos, todos_los_perfiles
+from backend.core import contadores
+from backend.core import rollups
+from backend.core import snapshots
 
 router = APIRouter()
 
+SUELDO_CHOFER_HORA = 80         # MXN por hora de manejo
+MAX_DISTANCIAS_MATRIZ = 100     # Límites del escenario what-if
+MAX_VELOCIDADES_MATRIZ = 20
+DIAS_KPIS_DEFECTO = 30          # Rango por defecto de /kpis
+
+# agrupar_por de /analitica/rutas -> columna del snapshot
+AGRUPACIONES_ANALITICA = {"tipo": "vehiculo_tipo", "vehiculo": "id_vehiculo", "repartidor": "id_repartidor"}
+TAMANO_LOTE_MASIVO = 500        # Filas por lote del cursor del lado del servidor
+
+COLUMNAS_MASIVO = [
+    "id_pedido", "numero_pedido", "estado", "fecha_creacion",
+    "id_vehiculo", "vehiculo_modelo", "vehiculo_tipo", "id_repartidor", "repartidor",
+    "distancia_km", "tiempo_minutos", "consumo_litros", "consumo_kwh",
+    "costo_energia", "sueldo_chofer", "costo_total", "emisiones_co2_kg", "error"
+]
+
 # =========================
 # MODELOS PYDANTIC
 # =========================
@@ -35,6 +66,19 @@ class ReporteSimpleRequest(BaseModel):
     precio_gasolina: Optional[float] = 22.50
     precio_kwh: Optional[float] = 2.50
 
+class PedidoDistancia(BaseModel):
+    id_pedido: int
+    distancia_km: float
+
+class ReporteLoteRequest(BaseModel):
+    """Para reportes de muchos pedidos en una sola llamada"""
+    pedidos: List[PedidoDistancia]
+
+class MatrizFlotaRequest(BaseModel):
+    """Escenarios what-if: todos los vehículos activos x distancias x velocidades"""
+    distancias_km: List[float]
+    velocidades_kmh: Optional[List[float]] = None  # None = velocidad promedio de cada vehículo
+
 class ReporteResponse(BaseModel):
     vehiculo_tipo: str
     vehiculo_modelo: str
@@ -54,9 +98,9 @@ class ReporteResponse(BaseModel):
 # =========================
 
 @router.post("/generar", response_model=ReporteResponse)
-def generar_reporte(
+async def generar_reporte(
     reporte: ReporteRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Genera reporte completo desde un pedido existente
@@ -72,7 +116,11 @@ def generar_reporte(
         
         # Si viene id_pedido, usar calcular_pedido de calculos.py
         if reporte.id_pedido:
-            resultado = calcular_pedido(reporte.id_pedido, reporte.distancia_km)
+            # La caché de perfiles se (re)carga con el engine síncrono: en el threadpool, no en run_sync
+            perfiles = await run_in_threadpool(todos_los_perfiles)
+            resultado = await db.run_sync(
+                lambda sesion: calcular_pedido(reporte.id_pedido, reporte.distancia_km, sesion, perfiles)
+            )
             
             if "error" in resultado:
                 raise HTTPException(
@@ -80,9 +128,9 @@ def generar_reporte(
                     detail=resultado["error"]
                 )
             
-            # Calcular sueldo del chofer (80 MXN/hora)
+            # Calcular sueldo del chofer
             tiempo_horas = resultado["tiempo"]["horas"]
-            sueldo_chofer = tiempo_horas * 80
+            sueldo_chofer = tiempo_horas * SUELDO_CHOFER_HORA
             
             # Extraer datos del resultado
             return ReporteResponse(
@@ -101,19 +149,8 @@ def generar_reporte(
             )
         
         else:
-            # Si NO viene id_pedido, buscar un vehículo del tipo solicitado
-            query = text("""
-                SELECT 
-                    id, modelo, tipo, velocidad_promedio_kmh,
-                    rendimiento_gasolina, rendimiento_electrico,
-                    precio_gasolina, precio_kwh,
-                    factor_emisiones_gasolina, factor_emisiones_electrico
-                FROM vehiculos
-                WHERE tipo = :tipo AND activo = TRUE
-                LIMIT 1
-            """)
-            
-            vehiculo = db.execute(query, {"tipo": reporte.tipo_vehiculo}).fetchone()
+            # Si NO viene id_pedido, usar un vehículo del tipo solicitado (caché)
+            vehiculo = await run_in_threadpool(perfil_por_tipo, reporte.tipo_vehiculo)
             
             if not vehiculo:
                 raise HTTPException(
@@ -173,7 +210,7 @@ def generar_reporte_simple(reporte: ReporteSimpleRequest):
             resultado = calcular_hibrido(datos_mock, reporte.distancia_km)
         
         # Calcular sueldo
-        sueldo_chofer = tiempo_horas * 80
+        sueldo_chofer = tiempo_horas * SUELDO_CHOFER_HORA
         
         # Modelo por defecto
         modelos = {
@@ -204,42 +241,281 @@ def generar_reporte_simple(reporte: ReporteSimpleRequest):
             detail=f"Error al generar reporte: {str(e)}"
         )
 
+@router.post("/lote")
+def generar_reporte_lote(reporte: ReporteLoteRequest):
+    """
+    Calcula costo, consumo y emisiones de muchos pedidos a la vez
+    (una sola consulta a la BD y cálculos vectorizados en calculos.py)
+    """
+    try:
+        resultados = calcular_pedidos_lote(
+            (p.id_pedido, p.distancia_km) for p in reporte.pedidos
+        )
+        
+        calculados = [r for r in resultados if "error" not in r]
+        
+        return {
+            "total": len(resultados),
+            "calculados": len(calculados),
+            "errores": len(resultados) - len(calculados),
+            "totales": {
+                "distancia_km": round(sum(r["distancia"]["km"] for r in calculados), 2),
+                "costo_energia": round(sum(r["costo"]["total"] for r in calculados), 2),
+                "emisiones_co2_kg": round(sum(r["emisiones"]["co2_kg"] for r in calculados), 2)
+            },
+            "resultados": resultados
+        }
+        
+    except Exception as e:
+        print(f"❌ Error en reporte por lote: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al generar reporte: {str(e)}"
+        )
+
+@router.get("/masivo")
+def generar_reporte_masivo(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    id_vehiculo: Optional[int] = None,
+    id_repartidor: Optional[int] = None,
+    formato: str = "csv",
+    distancia_defecto_km: Optional[float] = None
+):
+    """
+    Reporte de muchos pedidos transmitido como CSV o NDJSON.
+    - desde / hasta: rango (inclusivo) de fecha de creación
+    - id_vehiculo / id_repartidor: filtros opcionales
+    - distancia_defecto_km: distancia para pedidos que aún no tienen ruta calculada
+    
+    La distancia de cada pedido es la de su ruta más reciente. Los pedidos se
+    leen con un cursor del lado del servidor y se calculan por lotes, así que
+    la memoria usada no depende de cuántos pedidos abarque el reporte.
+    """
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no válido (use 'csv' o 'ndjson')"
+        )
+    
+    # La ruta es la del pedido o, si no tiene, la más reciente de la asignación
+    # (activa o más reciente) de su repartidor con su vehículo. Son dos LATERAL
+    # (y no un OR) para que cada uno use su índice: ix_rutas_asignadas_pedido
+    # e ix_rutas_asignadas_asignacion
+    query_base = """
+        SELECT 
+            p.id,
+            p.numero_pedido,
+            p.id_vehiculo,
+            p.capacidad_paquetes,
+            p.destino_entrega,
+            p.estado,
+            p.fecha_creacion,
+            p.id_repartidor,
+            u.nombre_completo AS repartidor_nombre,
+            COALESCE(ruta_pedido.distancia_km, ruta_asig.distancia_km, :distancia_defecto) AS distancia_km
+        FROM pedidos p
+        LEFT JOIN usuarios u ON p.id_repartidor = u.id
+        LEFT JOIN LATERAL (
+            SELECT a.id
+            FROM asignaciones a
+            WHERE a.id_vehiculo = p.id_vehiculo AND a.id_repartidor = p.id_repartidor
+            ORDER BY (a.estado = 'activa') DESC, a.fecha_asignacion DESC
+            LIMIT 1
+        ) asig ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT r.distancia_km
+            FROM rutas_asignadas r
+            WHERE r.id_pedido = p.id
+            ORDER BY r.fecha_calculo DESC
+            LIMIT 1
+        ) ruta_pedido ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT r.distancia_km
+            FROM rutas_asignadas r
+            WHERE r.id_asignacion = asig.id AND ruta_pedido.distancia_km IS NULL
+            ORDER BY r.fecha_calculo DESC
+            LIMIT 1
+        ) ruta_asig ON TRUE
+        WHERE 1=1
+    """
+    
+    params = {"distancia_defecto": distancia_defecto_km}
+    
+    if desde:
+        query_base += " AND p.fecha_creacion >= :desde"
+        params["desde"] = desde
+    
+    if hasta:
+        query_base += " AND p.fecha_creacion < :hasta"
+        params["hasta"] = hasta + timedelta(days=1)
+    
+    if id_vehiculo:
+        query_base += " AND p.id_vehiculo = :id_vehiculo"
+        params["id_vehiculo"] = id_vehiculo
+    
+    if id_repartidor:
+        query_base += " AND p.id_repartidor = :id_repartidor"
+        params["id_repartidor"] = id_repartidor
+    
+    query_base += " ORDER BY p.fecha_creacion, p.id"
+    
+    if formato == "csv":
+        return StreamingResponse(
+            transmitir_reporte_masivo(text(query_base), params, formato),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": "attachment; filename=reporte_masivo.csv"}
+        )
+    
+    return StreamingResponse(
+        transmitir_reporte_masivo(text(query_base), params, formato),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/matriz-flota")
+def generar_matriz_flota(escenario: MatrizFlotaRequest):
+    """
+    Compara costo, tiempo y CO2 de TODOS los vehículos activos en una rejilla
+    de distancias (y opcionalmente velocidades) con un solo cálculo vectorizado.
+    Matrices con forma [vehiculo][distancia][velocidad].
+    """
+    distancias = np.asarray(escenario.distancias_km, dtype=np.float64)
+    velocidades = None if escenario.velocidades_kmh is None else np.asarray(escenario.velocidades_kmh, dtype=np.float64)
+    
+    if not 0 < len(distancias) <= MAX_DISTANCIAS_MATRIZ or np.any(distancias <= 0):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Indique entre 1 y {MAX_DISTANCIAS_MATRIZ} distancias mayores a 0"
+        )
+    if velocidades is not None and (not 0 < len(velocidades) <= MAX_VELOCIDADES_MATRIZ or np.any(velocidades <= 0)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Indique entre 1 y {MAX_VELOCIDADES_MATRIZ} velocidades mayores a 0"
+        )
+    
+    try:
+        perfiles = [p for p in perfiles_activos() if p.tipo in REPARTO_ENERGIA]
+        coef = coeficientes_por_km(perfiles)
+        
+        # Vehículos con datos incompletos (rendimiento/precio NULL) no se comparan
+        velocidad_propia = np.array([p.velocidad_promedio_kmh or np.nan for p in perfiles])
+        completos = np.isfinite(coef["costo"]) & np.isfinite(coef["emisiones"])
+        if velocidades is None:
+            completos &= np.isfinite(velocidad_propia) & (velocidad_propia > 0)
+        
+        indices = np.flatnonzero(completos)
+        if len(indices) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No hay vehículos activos con datos completos para comparar"
+            )
+        perfiles = [perfiles[i] for i in indices]
+        
+        # --------------------------------------------------
+        # REJILLA (vehiculo, distancia, velocidad)
+        # --------------------------------------------------
+        d = distancias[None, :, None]
+        if velocidades is None:
+            v = velocidad_propia[indices][:, None, None]
+        else:
+            v = velocidades[None, None, :]
+        
+        forma = (len(perfiles), len(distancias), 1 if velocidades is None else len(velocidades))
+        costo_energia = np.broadcast_to(coef["costo"][indices][:, None, None] * d, forma)
+        emisiones = np.broadcast_to(coef["emisiones"][indices][:, None, None] * d, forma)
+        tiempo_horas = np.broadcast_to(d / v, forma)
+        sueldo_chofer = tiempo_horas * SUELDO_CHOFER_HORA
+        costo_total = costo_energia + sueldo_chofer
+        
+        # --------------------------------------------------
+        # MEJOR VEHÍCULO POR ESCENARIO
+        # --------------------------------------------------
+        mas_economico = np.argmin(costo_total, axis=0)
+        menos_emisiones = np.argmin(emisiones, axis=0)
+        mas_rapido = np.argmin(tiempo_horas, axis=0)
+        
+        def resumen(i, j, k):
+            perfil = perfiles[i]
+            return {
+                "id_vehiculo": perfil.id,
+                "modelo": perfil.modelo,
+                "tipo": perfil.tipo,
+                "costo_total": round(float(costo_total[i, j, k]), 2),
+                "tiempo_min": round(float(tiempo_horas[i, j, k]) * 60, 1),
+                "emisiones_co2_kg": round(float(emisiones[i, j, k]), 2)
+            }
+        
+        mejores = [
+            {
+                "distancia_km": float(distancias[j]),
+                "velocidad_kmh": None if velocidades is None else float(velocidades[k]),
+                "mas_economico": resumen(int(mas_economico[j, k]), j, k),
+                "menos_emisiones": resumen(int(menos_emisiones[j, k]), j, k),
+                "mas_rapido": resumen(int(mas_rapido[j, k]), j, k)
+            }
+            for j in range(forma[1])
+            for k in range(forma[2])
+        ]
+        
+        return {
+            "vehiculos": [
+                {
+                    "id": p.id,
+                    "modelo": p.modelo,
+                    "tipo": p.tipo,
+                    "velocidad_promedio_kmh": p.velocidad_promedio_kmh
+                }
+                for p in perfiles
+            ],
+            "distancias_km": distancias.tolist(),
+            "velocidades_kmh": None if velocidades is None else velocidades.tolist(),
+            "sueldo_chofer_hora": SUELDO_CHOFER_HORA,
+            "matriz": {
+                "costo_energia": np.round(costo_energia, 2).tolist(),
+                "sueldo_chofer": np.round(sueldo_chofer, 2).tolist(),
+                "costo_total": np.round(costo_total, 2).tolist(),
+                "tiempo_min": np.round(tiempo_horas * 60, 1).tolist(),
+                "emisiones_co2_kg": np.round(emisiones, 2).tolist()
+            },
+            "mejor_por_escenario": mejores
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error en matriz de flota: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al generar matriz: {str(e)}"
+        )
+
 @router.get("/dashboard")
-def obtener_dashboard(db: Session = Depends(get_db)):
+async def obtener_dashboard(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene estadísticas generales para el dashboard admin
     """
     try:
-        query = text("""
-            SELECT 
-                (SELECT COUNT(*) FROM pedidos WHERE estado = 'pendiente') as pedidos_pendientes,
-                (SELECT COUNT(*) FROM pedidos WHERE estado = 'en_ruta') as pedidos_en_ruta,
-                (SELECT COUNT(*) FROM pedidos WHERE estado = 'entregado') as pedidos_entregados,
-                (SELECT COUNT(*) FROM pedidos WHERE estado = 'cancelado') as pedidos_cancelados,
-                (SELECT COUNT(*) FROM vehiculos WHERE activo = TRUE) as vehiculos_disponibles,
-                (SELECT COUNT(*) FROM asignaciones WHERE estado = 'activa') as asignaciones_activas,
-                (SELECT COUNT(*) FROM usuarios WHERE rol = 'repartidor' AND activo = TRUE) as repartidores_activos
-        """)
-        
-        stats = db.execute(query).fetchone()
+        # Contadores mantenidos por los endpoints de escritura (sin COUNT(*))
+        c = await db.run_sync(contadores.leer_contadores)
+        pedidos = {estado: c.get(contadores.PEDIDOS.format(estado), 0) for estado in contadores.ESTADOS_PEDIDO}
         
         return {
             "pedidos": {
-                "pendientes": stats.pedidos_pendientes,
-                "en_ruta": stats.pedidos_en_ruta,
-                "entregados": stats.pedidos_entregados,
-                "cancelados": stats.pedidos_cancelados,
+                "pendientes": pedidos["pendiente"],
+                "en_ruta": pedidos["en_ruta"],
+                "entregados": pedidos["entregado"],
+                "cancelados": pedidos["cancelado"],
                 "total": sum([
-                    stats.pedidos_pendientes,
-                    stats.pedidos_en_ruta,
-                    stats.pedidos_entregados,
-                    stats.pedidos_cancelados
+                    pedidos["pendiente"],
+                    pedidos["en_ruta"],
+                    pedidos["entregado"],
+                    pedidos["cancelado"]
                 ])
             },
             "flota": {
-                "vehiculos_disponibles": stats.vehiculos_disponibles,
-                "asignaciones_activas": stats.asignaciones_activas,
-                "repartidores_activos": stats.repartidores_activos
+                "vehiculos_disponibles": c.get(contadores.VEHICULOS_ACTIVOS, 0),
+                "asignaciones_activas": c.get(contadores.ASIGNACIONES_ACTIVAS, 0),
+                "repartidores_activos": c.get(contadores.REPARTIDORES_ACTIVOS, 0)
             }
         }
         
@@ -249,6 +525,164 @@ def obtener_dashboard(db: Session = Depends(get_db)):
             detail=f"Error al obtener estadísticas: {str(e)}"
         )
 
+@router.post("/contadores/reconstruir")
+async def reconstruir_contadores_dashboard(db: AsyncSession = Depends(get_async_db)):
+    """
+    Recalcula los contadores del dashboard desde las tablas base
+    (corrección manual si se modificaron datos fuera de la API)
+    """
+    try:
+        return {
+            "mensaje": "Contadores reconstruidos",
+            "contadores": await db.run_sync(contadores.reconstruir_contadores)
+        }
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al reconstruir contadores: {str(e)}"
+        )
+
+@router.get("/kpis")
+async def consultar_kpis(
+    periodo: str = "dia",
+    dimension: str = "tipo",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    clave: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Serie de KPIs de rutas (distancia, tiempo, costo, emisiones) desde los acumulados
+    - periodo: hora, dia, semana, mes o anio
+    - dimension: vehiculo, tipo o repartidor (clave = id o tipo para filtrar uno)
+    - desde / hasta: rango inclusivo (por defecto los últimos 30 días)
+    """
+    if periodo not in rollups.PERIODOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Periodo no válido (use {', '.join(rollups.PERIODOS)})"
+        )
+    if dimension not in rollups.DIMENSIONES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Dimensión no válida (use {', '.join(rollups.DIMENSIONES)})"
+        )
+    
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=DIAS_KPIS_DEFECTO)
+    if desde > hasta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'desde' debe ser anterior a 'hasta'"
+        )
+    
+    try:
+        filas = await db.run_sync(rollups.consultar_kpis, periodo, dimension, *rango_utc(desde, hasta), clave)
+        
+        serie = [
+            {
+                "periodo": f.periodo.isoformat(),
+                "clave": f.clave,
+                "rutas": int(f.rutas),
+                "distancia_km": round(float(f.distancia_km), 2),
+                "tiempo_min": round(float(f.tiempo_min), 1),
+                "costo_total": round(float(f.costo_total), 2),
+                "emisiones_co2_kg": round(float(f.emisiones_co2_kg), 2),
+                "costo_por_km": round(float(f.costo_total / f.distancia_km), 2) if f.distancia_km else 0
+            } for f in filas
+        ]
+        
+        return {
+            "periodo": periodo,
+            "dimension": dimension,
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "totales": {
+                "rutas": sum(p["rutas"] for p in serie),
+                "distancia_km": round(sum(p["distancia_km"] for p in serie), 2),
+                "costo_total": round(sum(p["costo_total"] for p in serie), 2),
+                "emisiones_co2_kg": round(sum(p["emisiones_co2_kg"] for p in serie), 2)
+            },
+            "serie": serie
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al consultar KPIs: {str(e)}"
+        )
+
+@router.post("/kpis/reconstruir")
+async def reconstruir_kpis(db: AsyncSession = Depends(get_async_db)):
+    """
+    Recalcula los acumulados de KPIs desde rutas_asignadas
+    (corrección manual si se modificaron rutas fuera de la API)
+    """
+    try:
+        return {
+            "mensaje": "KPIs reconstruidos",
+            "filas": await db.run_sync(rollups.reconstruir_rollups)
+        }
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al reconstruir KPIs: {str(e)}"
+        )
+
+# =========================
+# ENDPOINTS - ANALÍTICA (snapshots Parquet locales, sin tocar la BD)
+# =========================
+
+@router.get("/analitica/snapshots")
+def estado_snapshots_analitica():
+    """Fecha, filas y tamaño de cada snapshot Parquet"""
+    requerir_snapshots()
+    return {
+        "directorio": str(snapshots.DIRECTORIO),
+        "intervalo_min": snapshots.INTERVALO_MIN,
+        "tablas": snapshots.estado_snapshots()
+    }
+
+@router.post("/analitica/snapshots")
+def exportar_snapshots_analitica():
+    """Exporta ahora los snapshots (además del exportador periódico)"""
+    requerir_snapshots()
+    try:
+        return {"mensaje": "Snapshots exportados", "filas": snapshots.exportar_snapshots()}
+    except Exception as e:
+        print(f"❌ Error al exportar snapshots: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al exportar snapshots: {str(e)}"
+        )
+
+@router.get("/analitica/rutas")
+def analitica_rutas(
+    agrupar_por: str = "tipo",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+):
+    """
+    Totales de rutas activas por tipo, vehiculo o repartidor (rango inclusivo, días UTC)
+    """
+    requerir_snapshots()
+    if agrupar_por not in AGRUPACIONES_ANALITICA:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"agrupar_por no válido (use {', '.join(AGRUPACIONES_ANALITICA)})"
+        )
+    
+    resumen = snapshots.resumen_rutas(AGRUPACIONES_ANALITICA[agrupar_por], *rango_utc(desde, hasta))
+    return respuesta_analitica("rutas", resumen)
+
+@router.get("/analitica/pedidos")
+def analitica_pedidos(desde: Optional[date] = None, hasta: Optional[date] = None):
+    """Pedidos y paquetes por estado (rango inclusivo de fecha de creación, días UTC)"""
+    requerir_snapshots()
+    return respuesta_analitica("pedidos", snapshots.resumen_pedidos(*rango_utc(desde, hasta)))
+
 # =========================
 # FUNCIONES AUXILIARES
 # =========================
@@ -291,7 +725,7 @@ def generar_reporte_simple_con_vehiculo(vehiculo, velocidad, distancia):
     else:
         resultado = calcular_hibrido(vehiculo, distancia)
     
-    sueldo_chofer = tiempo_horas * 80
+    sueldo_chofer = tiempo_horas * SUELDO_CHOFER_HORA
     
     return ReporteResponse(
         vehiculo_tipo=vehiculo.tipo,
@@ -306,4 +740,100 @@ def generar_reporte_simple_con_vehiculo(vehiculo, velocidad, distancia):
         sueldo_chofer=round(sueldo_chofer, 2),
         costo_total=round(resultado["costo"] + sueldo_chofer, 2),
         emisiones_co2_kg=round(resultado["emisiones"], 2)
-    )
\ No newline at end of file
+    )
+
+def transmitir_reporte_masivo(query, params, formato):
+    """
+    Generador del reporte masivo: un trozo de texto por lote de pedidos.
+    Usa su propia conexión porque se consume después de devolver la respuesta.
+    """
+    total = 0
+    if formato == "csv":
+        yield serializar_registros_masivo([], formato, encabezado=True)
+    
+    try:
+        with engine.connect() as conn:
+            resultado = conn.execution_options(
+                stream_results=True,
+                yield_per=TAMANO_LOTE_MASIVO
+            ).execute(query, params)
+            
+            for lote in resultado.partitions():
+                calculados = calcular_filas_lote(lote, [fila.distancia_km for fila in lote])
+                registros = [aplanar_reporte_masivo(fila, r) for fila, r in zip(lote, calculados)]
+                total += len(registros)
+                yield serializar_registros_masivo(registros, formato)
+        
+        print(f"📄 Reporte masivo ({formato}): {total} pedidos")
+    
+    except Exception as e:
+        # Los encabezados ya se enviaron: el error se reporta como último registro
+        print(f"❌ Error en reporte masivo: {str(e)}")
+        error = dict.fromkeys(COLUMNAS_MASIVO)
+        error["error"] = f"Reporte interrumpido tras {total} pedidos: {str(e)}"
+        yield serializar_registros_masivo([error], formato)
+
+def aplanar_reporte_masivo(fila, resultado) -> dict:
+    """Convierte el resultado de calcular_filas_lote en un registro plano"""
+    registro = dict.fromkeys(COLUMNAS_MASIVO)
+    registro.update({
+        "id_pedido": fila.id,
+        "numero_pedido": fila.numero_pedido,
+        "estado": fila.estado,
+        "fecha_creacion": fila.fecha_creacion.isoformat() if fila.fecha_creacion else None,
+        "id_vehiculo": fila.id_vehiculo,
+        "id_repartidor": fila.id_repartidor,
+        "repartidor": fila.repartidor_nombre
+    })
+    
+    if "error" in resultado:
+        registro["error"] = "Pedido sin ruta calculada" if fila.distancia_km is None else resultado["error"]
+        return registro
+    
+    sueldo_chofer = resultado["tiempo"]["horas"] * SUELDO_CHOFER_HORA
+    registro.update({
+        "vehiculo_modelo": resultado["vehiculo"]["modelo"],
+        "vehiculo_tipo": resultado["vehiculo"]["tipo"],
+        "distancia_km": resultado["distancia"]["km"],
+        "tiempo_minutos": resultado["tiempo"]["minutos"],
+        "consumo_litros": resultado["consumo"].get("litros"),
+        "consumo_kwh": resultado["consumo"].get("kwh"),
+        "costo_energia": resultado["costo"]["total"],
+        "sueldo_chofer": round(sueldo_chofer, 2),
+        "costo_total": round(resultado["costo"]["total"] + sueldo_chofer, 2),
+        "emisiones_co2_kg": resultado["emisiones"]["co2_kg"]
+    })
+    return registro
+
+def serializar_registros_masivo(registros, formato, encabezado=False) -> str:
+    """Texto CSV o NDJSON (una línea por registro) de un lote"""
+    if formato == "ndjson":
+        return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros)
+    
+    salida = io.StringIO()
+    escritor = csv.DictWriter(salida, fieldnames=COLUMNAS_MASIVO)
+    if encabezado:
+        escritor.writeheader()
+    escritor.writerows(registros)
+    return salida.getvalue()
+
+def requerir_snapshots():
+    if not snapshots.DISPONIBLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analítica no disponible: instale pyarrow"
+        )
+
+def rango_utc(desde, hasta):
+    """Fechas inclusivas -> (inicio, fin exclusivo) como datetimes UTC"""
+    inicio = datetime.combine(desde, time.min, tzinfo=timezone.utc) if desde else None
+    fin = datetime.combine(hasta + timedelta(days=1), time.min, tzinfo=timezone.utc) if hasta else None
+    return inicio, fin
+
+def respuesta_analitica(tabla, resultados):
+    if resultados is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Aún no hay snapshot de {tabla}; exporte con POST /api/reportes/analitica/snapshots"
+        )
+    return {"total": len(resultados), "resultados": resultados}
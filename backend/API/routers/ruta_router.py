@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from sqlalchemy.orm import Session
@@ -11,35 +13,19 @@ import json
 # Eliminamos la importación de ..dependencies
 from backend.API.database import get_db
 from backend.API.models import Vehiculo, Pedido
-from backend.core.dijkstra import obtener_ruta_multiparada, obtener_incidencias_trafico, construir_grafo_logico
+from backend.core.dijkstra import ResultadoRuta, obtener_ruta_multiparada, obtener_incidencias_trafico, obtener_incidencias_corredor, construir_grafo_logico
 from backend.core.calculos import calcular_pedido, calcular_ruta_sustentable, verificar_capacidad_vehiculo
 from backend.core.simulacion import generar_mapa_visual, traducir_detalles_trafico
+from backend.core import seguimiento
+from backend.core import cuerpos_ruta
+from backend.core import consultas
+from backend.core.geometria import codificar_polyline, desempaquetar_ruta, PRECISION_POLYLINE
 
 router = APIRouter()
 load_dotenv()
 
-# --- FUNCIÓN get_db ALTERNATIVA ---
-# Ya que eliminaste el archivo dependencies.py, necesitamos proveer una alternativa
-def get_db():
-    """
-    Función alternativa para obtener sesión de base de datos.
-    Deberías implementar la lógica real para obtener tu sesión de base de datos aquí.
-    """
-    # Esto es un placeholder - necesitarás implementar la lógica real
-    # basada en cómo configuras tu base de datos
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-    
-    # Configuración de ejemplo - ajusta según tu configuración
-    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Tipo de contenido para recibir la geometría como polyline codificada
+MEDIA_POLYLINE = "application/vnd.rutatec.polyline+json"
 
 # --- MODELOS ---
 
@@ -54,6 +40,10 @@ class RutaMultiparadaRequest(BaseModel):
     lugares: List[str]
     optimizar: Optional[bool] = True
 
+class PosicionGPS(BaseModel):
+    lat: float
+    lng: float
+
 class EventoTrafico(BaseModel):
     type: str  # Tipo interno: construction, event, hazard, etc.
     tipo_texto: str  # Texto descriptivo: Construcción, Evento, Peligro, etc.
@@ -185,33 +175,24 @@ def procesar_incidentes_trafico(incidentes: List[Dict]) -> List[EventoTrafico]:
             nivel_riesgo=nivel_riesgo,
             hora_inicio=hora_inicio,
             hora_fin=hora_fin,
-            impacto=impacto
+            impacto=impacto,
+            distancia_a_ruta=inc.get('distanciaRutaKm')
         ))
     
     return eventos_procesados
 
-def procesar_maniobras_instrucciones(maniobras: List[Dict]) -> List[InstruccionRuta]:
+def procesar_maniobras_instrucciones(ruta: ResultadoRuta) -> List[InstruccionRuta]:
     """Procesa las maniobras de la ruta para crear instrucciones detalladas"""
-    instrucciones = []
-    
-    for i, man in enumerate(maniobras):
-        descripcion = man.get('narrative', 'Continuar')
-        distancia_km = man.get('distance', 0)
-        distancia_formateada = f"{distancia_km:.1f} km"
-        
-        # Obtener coordenadas si están disponibles
-        start_point = man.get('startPoint', {})
-        coordenadas = (start_point.get('lat', 0), start_point.get('lng', 0))
-        
-        instrucciones.append(InstruccionRuta(
-            orden=i + 1,
-            descripcion=descripcion,
-            distancia=distancia_formateada,
+    return [
+        InstruccionRuta(
+            orden=orden,
+            descripcion=descripcion or 'Continuar',
+            distancia=f"{distancia_km:.1f} km",
             distancia_km=distancia_km,
-            coordenadas=coordenadas
-        ))
-    
-    return instrucciones
+            coordenadas=(lat, lng)
+        )
+        for orden, descripcion, distancia_km, lat, lng in ruta.instrucciones
+    ]
 
 def obtener_estadisticas_eventos(eventos: List[EventoTrafico]) -> Dict[str, Any]:
     """Genera estadísticas detalladas sobre los eventos de tráfico"""
@@ -272,22 +253,22 @@ async def calcular_ruta_optimizada(
     
     # 2. Obtener ruta de MapQuest
     print(f"Calculando ruta: {request.origen} -> {request.destino}")
-    maniobras, geometria, bbox, orden = obtener_ruta_multiparada(
+    ruta = obtener_ruta_multiparada(
         MAPQUEST_API_KEY, 
         [request.origen, request.destino]
     )
     
-    if not maniobras:
+    if not ruta:
         raise HTTPException(
             status_code=400, 
             detail="No se pudo calcular la ruta. Verifica las direcciones."
         )
     
-    # 3. Obtener incidentes de tráfico
+    # 3. Obtener incidentes de tráfico (solo en el corredor de la ruta)
     incidentes = []
-    if bbox:
+    if len(ruta.geometria):
         try:
-            incidentes = obtener_incidencias_trafico(MAPQUEST_API_KEY, bbox)
+            incidentes = obtener_incidencias_corredor(MAPQUEST_API_KEY, ruta.geometria)
         except Exception as e:
             print(f"Advertencia al obtener tráfico: {e}")
     
@@ -295,23 +276,23 @@ async def calcular_ruta_optimizada(
     eventos_procesados = procesar_incidentes_trafico(incidentes)
     
     # 5. Procesar instrucciones de la ruta
-    instrucciones = procesar_maniobras_instrucciones(maniobras)
+    instrucciones = procesar_maniobras_instrucciones(ruta)
     
     # 6. Construir grafo lógico con Dijkstra
-    grafo = construir_grafo_logico(maniobras)
+    grafo = construir_grafo_logico(ruta)
     
-    # 7. Calcular distancia total
-    distancia_total = sum(man['distance'] for man in maniobras)
+    # 7. Distancia total (precalculada en el resultado)
+    distancia_total = ruta.distancia_total_km
     
     # 8. Preparar lista de pasos para respuesta (compatible con versión anterior)
-    pasos = []
-    for node_id in grafo.nodes():
-        node_data = grafo.nodes[node_id]
-        pasos.append({
-            "orden": node_id,
-            "descripcion": node_data.get('desc', 'Sin descripción'),
-            "coordenadas": node_data.get('pos', (0, 0))
-        })
+    pasos = [
+        {
+            "orden": orden - 1,
+            "descripcion": descripcion,
+            "coordenadas": (lat, lng)
+        }
+        for orden, descripcion, _, lat, lng in ruta.instrucciones
+    ]
     
     # 9. Si hay pedido_id, calcular métricas detalladas
     costo_total = 0
@@ -320,7 +301,7 @@ async def calcular_ruta_optimizada(
     
     if request.pedido_id:
         try:
-            resultado = calcular_pedido(request.pedido_id, distancia_total)
+            resultado = calcular_pedido(request.pedido_id, distancia_total, db)
             
             if "error" in resultado:
                 mensaje = f"Pedido: {resultado['error']}. Mostrando solo ruta."
@@ -336,7 +317,7 @@ async def calcular_ruta_optimizada(
     
     # 10. Generar mapa visual
     try:
-        generar_mapa_visual(grafo, geometria, incidentes, orden, "mapa_generado.html")
+        generar_mapa_visual(grafo, ruta.geometria, incidentes, ruta.orden, "mapa_generado.html")
         mapa_msg = "Mapa generado: mapa_generado.html"
     except Exception as e:
         mapa_msg = f"Error generando mapa: {str(e)}"
@@ -376,10 +357,11 @@ async def calcular_ruta_optimizada(
 @router.get("/pedido/{pedido_id}")
 def obtener_calculos_pedido(
     pedido_id: int, 
-    distancia_km: float
+    distancia_km: float,
+    db: Session = Depends(get_db)
 ):
     """Endpoint separado solo para cálculos de pedido"""
-    resultado = calcular_pedido(pedido_id, distancia_km)
+    resultado = calcular_pedido(pedido_id, distancia_km, db)
     return resultado
 
 @router.get("/eventos/{lat}/{lng}/{radio}")
@@ -442,47 +424,23 @@ def analisis_detallado_trafico(
     
     try:
         # Obtener ruta
-        maniobras, geometria, bbox, orden = obtener_ruta_multiparada(
+        ruta = obtener_ruta_multiparada(
             MAPQUEST_API_KEY, 
             [request.origen, request.destino]
         )
         
-        if not maniobras:
+        if not ruta:
             raise HTTPException(status_code=400, detail="No se pudo calcular la ruta")
         
-        # Obtener incidentes
+        # Obtener incidentes dentro del corredor de radio_km alrededor de la ruta
+        # (la distancia de cada evento a la ruta ya viene calculada)
         incidentes = []
-        if bbox:
-            incidentes = obtener_incidencias_trafico(MAPQUEST_API_KEY, bbox)
+        if len(ruta.geometria):
+            incidentes = obtener_incidencias_corredor(MAPQUEST_API_KEY, ruta.geometria, margen_km=radio_km)
         
         # Procesar eventos
         eventos_procesados = procesar_incidentes_trafico(incidentes)
         
-        # Calcular distancia de cada evento a la ruta
-        ruta_puntos = [(p[0], p[1]) for p in geometria] if geometria else []
-        
-        for evento in eventos_procesados:
-            try:
-                # Extraer coordenadas del evento
-                lat_str, lng_str = evento.location.split(',')
-                evento_lat = float(lat_str.strip())
-                evento_lng = float(lng_str.strip())
-                
-                # Calcular distancia mínima a la ruta
-                if ruta_puntos:
-                    distancias = []
-                    for punto in ruta_puntos:
-                        dist = haversine_distance(
-                            evento_lat, evento_lng, 
-                            punto[0], punto[1]
-                        )
-                        distancias.append(dist)
-                    
-                    if distancias:
-                        evento.distancia_a_ruta = min(distancias)
-            except:
-                evento.distancia_a_ruta = None
-        
         # Filtrar eventos cercanos a la ruta
         eventos_cercanos = [
             e for e in eventos_procesados 
@@ -493,7 +451,7 @@ def analisis_detallado_trafico(
         estadisticas = obtener_estadisticas_eventos(eventos_cercanos)
         
         # Calcular tiempo adicional por eventos
-        tiempo_base = (sum(m['distance'] for m in maniobras) / 40) * 60  # 40 km/h
+        tiempo_base = (ruta.distancia_total_km / 40) * 60  # 40 km/h
         tiempo_adicional = 0
         
         for evento in eventos_cercanos:
@@ -534,7 +492,7 @@ def analisis_detallado_trafico(
             "ruta": {
                 "origen": request.origen,
                 "destino": request.destino,
-                "distancia_km": round(sum(m['distance'] for m in maniobras), 2),
+                "distancia_km": round(ruta.distancia_total_km, 2),
                 "tiempo_base_min": round(tiempo_base, 1),
                 "tiempo_adicional_min": round(tiempo_adicional, 1),
                 "tiempo_total_min": round(tiempo_total, 1)
@@ -654,24 +612,24 @@ def prediccion_trafico(
         
         # Calcular ruta normal
         MAPQUEST_API_KEY = os.getenv("MAPQUEST_API_KEY")
-        maniobras, geometria, bbox, orden = obtener_ruta_multiparada(
+        ruta = obtener_ruta_multiparada(
             MAPQUEST_API_KEY, 
             [request.origen, request.destino]
         )
         
-        if not maniobras:
+        if not ruta:
             raise HTTPException(status_code=400, detail="No se pudo calcular la ruta")
         
-        distancia = sum(m['distance'] for m in maniobras)
+        distancia = ruta.distancia_total_km
         tiempo_normal = (distancia / 40) * 60  # 40 km/h base
         
         # Aplicar factor de tráfico
         tiempo_predicho = tiempo_normal * factor_trafico
         
-        # Obtener eventos históricos/actuales para la zona
+        # Obtener eventos actuales a lo largo de la ruta
         incidentes = []
-        if bbox:
-            incidentes = obtener_incidencias_trafico(MAPQUEST_API_KEY, bbox)
+        if len(ruta.geometria):
+            incidentes = obtener_incidencias_corredor(MAPQUEST_API_KEY, ruta.geometria)
         
         eventos_procesados = procesar_incidentes_trafico(incidentes)
         
@@ -719,13 +677,13 @@ def calcular_ruta_multiparada(request: RutaMultiparadaRequest):
     
     try:
         # 1. Llamar a dijkstra (SIN CAMBIOS)
-        maniobras, geometria, bbox, orden = obtener_ruta_multiparada(
+        ruta = obtener_ruta_multiparada(
             MAPQUEST_API_KEY, 
             request.lugares, 
             request.optimizar
         )
         
-        if not maniobras:
+        if not ruta:
             raise HTTPException(
                 status_code=400,
                 detail="No se pudo calcular la ruta multiparada"
@@ -733,18 +691,18 @@ def calcular_ruta_multiparada(request: RutaMultiparadaRequest):
         
         # 2. Procesar incidentes y estadísticas
         incidentes = []
-        if bbox:
+        if len(ruta.geometria):
             try:
-                incidentes = obtener_incidencias_trafico(MAPQUEST_API_KEY, bbox)
+                incidentes = obtener_incidencias_corredor(MAPQUEST_API_KEY, ruta.geometria)
             except Exception as e:
                 print(f"Advertencia al obtener tráfico: {e}")
         
         eventos_procesados = procesar_incidentes_trafico(incidentes)
-        instrucciones = procesar_maniobras_instrucciones(maniobras)
-        distancia_total = sum(man['distance'] for man in maniobras)
+        instrucciones = procesar_maniobras_instrucciones(ruta)
+        distancia_total = ruta.distancia_total_km
         
         # 3. Construir grafo
-        grafo = construir_grafo_logico(maniobras)
+        grafo = construir_grafo_logico(ruta)
         
         # 4. Generar mapa (RUTA CORRECTA DEL ARCHIVO)
         ruta_mapa = os.path.join(
@@ -758,9 +716,9 @@ def calcular_ruta_multiparada(request: RutaMultiparadaRequest):
         # ✅ CAPTURAR GEOMETRÍA RETORNADA
         geometria_repartidor = generar_mapa_visual(
             grafo, 
-            geometria, 
+            ruta.geometria, 
             incidentes, 
-            orden, 
+            ruta.orden, 
             ruta_mapa
         )
         
@@ -774,7 +732,7 @@ def calcular_ruta_multiparada(request: RutaMultiparadaRequest):
             "distancia_total_km": round(distancia_total, 2),
             "eventos_trafico": len(eventos_procesados),
             "puntos_geometria": geometria_repartidor,  # Para BD/Repartidor
-            "orden_optimizado": [p['dir'] for p in orden] if orden else request.lugares,
+            "orden_optimizado": [p['dir'] for p in ruta.orden] if ruta.orden else request.lugares,
             "mapa_html": "ruta_multiparada.html",
             "estadisticas": {
                 "total_stops": len(request.lugares) - 1,
@@ -800,17 +758,28 @@ def calcular_ruta_multiparada(request: RutaMultiparadaRequest):
 # (después del endpoint /ruta-multiparada)
 # ============================================
 
-from sqlalchemy import text
 from fastapi import status
 
 @router.get("/repartidor/{id_repartidor}")
-def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
+def obtener_ruta_repartidor(
+    id_repartidor: int,
+    request: Request,
+    incluir_geometria: bool = True,
+    db: Session = Depends(get_db)
+):
     """
     Obtiene la ruta asignada de un repartidor específico.
     Consulta la tabla rutas_asignadas con todas sus relaciones.
     
+    La geometría se envía como polyline codificada si el cliente acepta
+    MEDIA_POLYLINE; en cualquier otro caso se envía como lista de [lat, lng].
+    El cuerpo de la ruta (geometría y maniobras) se lee de cuerpos_ruta solo
+    si incluir_geometria es True; "hash_cuerpo" cambia cuando cambia el cuerpo.
+    
     Args:
         id_repartidor: ID del usuario repartidor
+        request: Petición (para negociar el formato con el header Accept)
+        incluir_geometria: False para recibir solo el resumen de la ruta
         db: Sesión de base de datos
     
     Returns:
@@ -818,55 +787,7 @@ def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
     """
     try:
         # Consulta completa con todas las relaciones
-        query = text("""
-            SELECT 
-                -- Datos del repartidor
-                u.id as repartidor_id,
-                u.nombre_completo as repartidor_nombre,
-                u.telefono as repartidor_telefono,
-                
-                -- Datos de la asignación
-                a.id as asignacion_id,
-                a.numero_paquetes,
-                a.ruta_municipio,
-                a.estado as asignacion_estado,
-                a.fecha_asignacion,
-                
-                -- Datos del vehículo
-                v.id as vehiculo_id,
-                v.modelo as vehiculo_modelo,
-                v.tipo as vehiculo_tipo,
-                v.capacidad_maxima_paquetes,
-                v.velocidad_promedio_kmh,
-                v.hora_envio,
-                
-                -- Datos de la ruta
-                r.id as ruta_id,
-                r.origen_direccion,
-                r.destino_direccion,
-                r.distancia_km,
-                r.tiempo_min,
-                r.ruta_mapquest,
-                r.consumo_data,
-                r.costo_total,
-                r.emisiones_co2_kg,
-                r.fecha_calculo
-                
-            FROM usuarios u
-            INNER JOIN asignaciones a ON u.id = a.id_repartidor
-            INNER JOIN vehiculos v ON a.id_vehiculo = v.id
-            LEFT JOIN rutas_asignadas r ON a.id = r.id_asignacion AND r.activa = TRUE
-            
-            WHERE u.id = :id_repartidor 
-                AND u.rol = 'repartidor' 
-                AND u.activo = TRUE
-                AND a.estado = 'activa'
-            
-            ORDER BY a.fecha_asignacion DESC
-            LIMIT 1
-        """)
-        
-        result = db.execute(query, {"id_repartidor": id_repartidor})
+        result = db.execute(consultas.RUTA_DEL_REPARTIDOR, {"id_repartidor": id_repartidor})
         ruta = result.fetchone()
         
         if not ruta:
@@ -899,31 +820,28 @@ def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
                 }
             }
         
-        # Parsear ruta_mapquest (JSONB)
-        import json
-        ruta_data = ruta.ruta_mapquest if isinstance(ruta.ruta_mapquest, dict) else json.loads(ruta.ruta_mapquest)
-        
-       # Extraer geometría
-        geometria = []
-        
-        # CASO 1: Formato simplificado (guardado por el Admin en gestion_rutas_router)
-        if "puntos" in ruta_data:
-            geometria = ruta_data["puntos"]
-            
-        # CASO 2: Formato crudo de MapQuest (por si acaso)
-        elif "route" in ruta_data and "shape" in ruta_data["route"]:
-            geometria = ruta_data["route"]["shape"].get("shapePoints", [])
-        
-        # Extraer maniobras
-        maniobras = []
-        if "route" in ruta_data and "legs" in ruta_data["route"]:
-            for leg in ruta_data["route"]["legs"]:
-                for maniobra in leg.get("maneuvers", []):
-                    maniobras.append({
-                        "instruccion": maniobra.get("narrative", ""),
-                        "distancia": maniobra.get("distance", 0),
-                        "tiempo": maniobra.get("time", 0)
-                    })
+        # Cuerpo de la ruta (cuerpos_ruta), solo si se pidió la geometría
+        acepta_polyline = MEDIA_POLYLINE in request.headers.get("accept", "")
+        ruta_data = cuerpos_ruta.leer_cuerpo(db, ruta.hash_cuerpo) if incluir_geometria and ruta.hash_cuerpo else None
+        
+        # Extraer geometría y maniobras (cualquier formato guardado)
+        if ruta_data is None:
+            geometria, maniobras_guardadas = None, []
+        elif acepta_polyline and ruta_data.get("formato") == "polyline" and ruta_data.get("precision") == PRECISION_POLYLINE:
+            geometria = ruta_data["polyline"]  # Ya guardada codificada: se envía tal cual
+            maniobras_guardadas = ruta_data.get("maniobras", [])
+        else:
+            puntos, maniobras_guardadas = desempaquetar_ruta(ruta_data)
+            geometria = codificar_polyline(puntos) if acepta_polyline else puntos.tolist()
+        
+        maniobras = [
+            {
+                "instruccion": maniobra.get("narrative", ""),
+                "distancia": maniobra.get("distance", 0),
+                "tiempo": maniobra.get("time", 0)
+            }
+            for maniobra in maniobras_guardadas
+        ]
         
         # Parsear consumo_data si existe
         consumo_info = {}
@@ -934,7 +852,7 @@ def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
                 consumo_info = {}
         
         # Respuesta completa
-        return {
+        respuesta = {
             "mensaje": "Ruta encontrada exitosamente",
             "tiene_ruta": True,
             "repartidor": {
@@ -960,7 +878,9 @@ def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
                 "destino": ruta.destino_direccion,
                 "distancia_km": float(ruta.distancia_km),
                 "tiempo_min": float(ruta.tiempo_min),
+                "hash_cuerpo": ruta.hash_cuerpo.strip() if ruta.hash_cuerpo else None,
                 "geometria": geometria,
+                "geometria_formato": f"polyline{PRECISION_POLYLINE}" if acepta_polyline else "latlng",
                 "maniobras": maniobras,
                 "consumo": consumo_info,
                 "costo_total": float(ruta.costo_total) if ruta.costo_total else 0,
@@ -969,6 +889,12 @@ def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
             }
         }
         
+        return JSONResponse(
+            content=jsonable_encoder(respuesta),
+            media_type=MEDIA_POLYLINE if acepta_polyline else "application/json",
+            headers={"Vary": "Accept"}
+        )
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -978,4 +904,52 @@ def obtener_ruta_repartidor(id_repartidor: int, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al consultar ruta: {str(e)}"
+        )
+
+@router.post("/repartidor/{id_repartidor}/posicion")
+def registrar_posicion_repartidor(
+    id_repartidor: int,
+    posicion: PosicionGPS,
+    db: Session = Depends(get_db)
+):
+    """
+    Recibe un ping de GPS del repartidor y lo ubica sobre su ruta activa.
+    Devuelve avance, distancia/tiempo restantes, siguiente maniobra y si
+    el repartidor está fuera de ruta.
+    
+    La ruta se preprocesa una sola vez y se mantiene en memoria, así que
+    los pings sucesivos no consultan la base de datos.
+    """
+    try:
+        ruta_seguimiento = seguimiento.seguimiento_vigente(id_repartidor)
+        
+        if ruta_seguimiento is None:
+            ruta = db.execute(consultas.RUTA_ACTIVA_DEL_REPARTIDOR, {"id_repartidor": id_repartidor}).fetchone()
+            
+            if not ruta:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="El repartidor no tiene una ruta activa calculada"
+                )
+            
+            def construir():
+                # Solo se descarga la geometría si la ruta no está en memoria
+                ruta_data = cuerpos_ruta.cuerpo_de_ruta(db, ruta.ruta_id)
+                return seguimiento.desde_ruta_guardada(ruta.ruta_id, ruta_data, float(ruta.tiempo_min))
+            
+            ruta_seguimiento = seguimiento.registrar_seguimiento(id_repartidor, ruta.ruta_id, construir)
+        
+        resultado = seguimiento.procesar_ping(id_repartidor, ruta_seguimiento, posicion.lat, posicion.lng)
+        resultado["timestamp"] = datetime.now().isoformat()
+        return resultado
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error al procesar posición del repartidor: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al procesar posición: {str(e)}"
         )
\ No newline at end of file
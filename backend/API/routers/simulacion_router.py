@@ -6,14 +6,14 @@ import os
 from dotenv import load_dotenv
 import folium
 import json
-import math
 
 # Asegúrate de que estos módulos existan en tu estructura de carpetas backend/core/
 from backend.core.dijkstra import (
     obtener_ruta_multiparada,
-    obtener_incidencias_trafico
+    obtener_incidencias_corredor
 )
 from backend.core.simulacion import traducir_detalles_trafico
+from backend.core.geometria import a_arreglos, distancia_a_polilinea_km
 
 router = APIRouter()
 load_dotenv()
@@ -87,26 +87,18 @@ def obtener_icono_y_color_por_tipo(tipo: int):
     }
     return iconos_map.get(tipo, {"icon": "exclamation-circle", "color": "gray", "texto": "Otro"})
 
-def procesar_instrucciones_para_frontend(maniobras):
-    """Procesa las maniobras para el frontend con instrucciones traducidas"""
-    instrucciones = []
-    
-    for i, man in enumerate(maniobras):
-        # Traducir la instrucción
-        instruccion_traducida = traducir_detalles_trafico(man['narrative'])
-        
-        # Formatear distancia
-        distancia_km = man.get('distance', 0)
-        
-        instrucciones.append({
-            "orden": i + 1,
-            "texto": instruccion_traducida,
+def procesar_instrucciones_para_frontend(ruta):
+    """Procesa las maniobras de un ResultadoRuta para el frontend con instrucciones traducidas"""
+    return [
+        {
+            "orden": orden,
+            "texto": traducir_detalles_trafico(narrativa),
             "distancia": f"{distancia_km:.2f} km",
             "distancia_km": distancia_km,
-            "coordenadas": f"{man.get('startPoint', {}).get('lat', 0):.4f}, {man.get('startPoint', {}).get('lng', 0):.4f}"
-        })
-    
-    return instrucciones
+            "coordenadas": f"{lat:.4f}, {lng:.4f}"
+        }
+        for orden, narrativa, distancia_km, lat, lng in ruta.instrucciones
+    ]
 
 def procesar_eventos_para_frontend(incidentes, geometria):
     """Procesa eventos de tráfico para el frontend"""
@@ -125,8 +117,10 @@ def procesar_eventos_para_frontend(incidentes, geometria):
         desc_original = inc.get('fullDesc', inc.get('shortDesc', 'Sin detalles disponibles'))
         desc_traducida = traducir_detalles_trafico(desc_original)
         
-        # Calcular distancia a la ruta
-        distancia_a_ruta = calcular_distancia_a_ruta(lat, lng, geometria)
+        # Distancia a la ruta (ya calculada al filtrar el corredor)
+        distancia_a_ruta = inc.get('distanciaRutaKm')
+        if distancia_a_ruta is None:
+            distancia_a_ruta = calcular_distancia_a_ruta(lat, lng, geometria)
         
         eventos_procesados.append({
             "type": tipo_info["texto"].lower().replace(" ", "_"),
@@ -144,42 +138,12 @@ def procesar_eventos_para_frontend(incidentes, geometria):
     return eventos_procesados
 
 def calcular_distancia_a_ruta(lat, lng, geometria):
-    """Calcula la distancia mínima de un punto a la ruta"""
-    if not geometria:
+    """Calcula la distancia mínima (km) de un punto a la ruta"""
+    if len(geometria) == 0:
         return None
     
-    def haversine(lat1, lon1, lat2, lon2):
-        """Fórmula de Haversine para calcular distancia entre dos puntos"""
-        R = 6371.0  # Radio de la Tierra en km
-        
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        dlon = lon2_rad - lon1_rad
-        dlat = lat2_rad - lat1_rad
-        
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
-    
-    # Encontrar la distancia mínima a cualquier punto de la geometría (muestreo simple)
-    distancias = []
-    # Optimizacion: Si la geometría es muy grande, muestrear cada X puntos para rendimiento
-    paso = 1 if len(geometria) < 1000 else 5
-    
-    for i in range(0, len(geometria), paso):
-        try:
-            punto = geometria[i]
-            punto_lat, punto_lng = punto
-            distancia = haversine(lat, lng, punto_lat, punto_lng)
-            distancias.append(distancia)
-        except:
-            continue
-    
-    return min(distancias) if distancias else None
+    lats, lngs = a_arreglos(geometria)
+    return distancia_a_polilinea_km(lats, lngs, lat, lng)
 
 # =========================
 # ENDPOINT MULTIPARADA (HTML)
@@ -197,24 +161,25 @@ def simular_ruta_multiparada_render(request: SimulacionRequestMulti):
     lugares = [request.origen] + request.destinos
     
     # 1. Obtener datos de la ruta y el Bounding Box
-    maniobras, geometria, bbox, orden = obtener_ruta_multiparada(API_KEY, lugares)
+    ruta = obtener_ruta_multiparada(API_KEY, lugares)
     
-    if not maniobras:
+    if not ruta:
         raise HTTPException(status_code=400, detail="No se pudo calcular la ruta.")
+    geometria, orden = ruta.geometria, ruta.orden
     
-    # 2. Obtener datos de tráfico
+    # 2. Obtener datos de tráfico (solo en el corredor de la ruta)
     incidentes = []
-    if bbox:
+    if len(geometria):
         try:
-            incidentes = obtener_incidencias_trafico(API_KEY, bbox)
+            incidentes = obtener_incidencias_corredor(API_KEY, geometria)
         except Exception as e:
             print(f"Advertencia: No se pudo obtener tráfico: {e}")
 
     # 3. Procesar datos para el frontend (Estadísticas e Instrucciones)
-    instrucciones_procesadas = procesar_instrucciones_para_frontend(maniobras)
+    instrucciones_procesadas = procesar_instrucciones_para_frontend(ruta)
     eventos_procesados = procesar_eventos_para_frontend(incidentes, geometria)
     
-    distancia_total = sum(man['distance'] for man in maniobras)
+    distancia_total = ruta.distancia_total_km
     tiempo_estimado = distancia_total * 1.5  # Estimación simple: 1.5 minutos por km
     
     # 4. Configurar el mapa base
@@ -238,7 +203,7 @@ def simular_ruta_multiparada_render(request: SimulacionRequestMulti):
     folium.LayerControl().add_to(m)
 
     # 6. Dibujar la Ruta Principal
-    if geometria:
+    if len(geometria):
         folium.PolyLine(
             geometria, 
             color="#0055FF", 
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from pydantic import BaseModel
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, time
 
-from ..database import get_db
+from ..database_async import get_async_db
+from backend.core.perfiles_vehiculo import invalidar_perfiles
+from backend.core import contadores
+from backend.core import paginacion
+from backend.core import consultas
 
 router = APIRouter()
 
@@ -57,7 +60,7 @@ class AsignacionResponse(BaseModel):
 # =========================
 
 @router.post("/vehiculos", response_model=VehiculoResponse)
-def crear_vehiculo(vehiculo: VehiculoCreate, db: Session = Depends(get_db)):
+async def crear_vehiculo(vehiculo: VehiculoCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Crea un nuevo vehículo en el sistema
     """
@@ -83,23 +86,12 @@ def crear_vehiculo(vehiculo: VehiculoCreate, db: Session = Depends(get_db)):
             )
         
         # Insertar vehículo
-        insert_query = text("""
-            INSERT INTO vehiculos 
-            (modelo, tipo, capacidad_maxima_paquetes, velocidad_promedio_kmh,
-             hora_envio, rendimiento_gasolina, rendimiento_electrico,
-             precio_gasolina, precio_kwh)
-            VALUES (:modelo, :tipo, :capacidad, :velocidad, :hora_envio,
-                    :rend_gas, :rend_elec, :precio_gas, :precio_kwh)
-            RETURNING id, modelo, tipo, capacidad_maxima_paquetes, 
-                     velocidad_promedio_kmh, activo, fecha_creacion
-        """)
-        
-        result = db.execute(insert_query, {
+        result = await db.execute(consultas.VEHICULO_CREAR, {
             "modelo": vehiculo.modelo,
             "tipo": vehiculo.tipo,
             "capacidad": vehiculo.capacidad_maxima_paquetes,
             "velocidad": vehiculo.velocidad_promedio_kmh,
-            "hora_envio": vehiculo.hora_envio,
+            "hora_envio": time.fromisoformat(vehiculo.hora_envio) if vehiculo.hora_envio else None,
             "rend_gas": vehiculo.rendimiento_gasolina,
             "rend_elec": vehiculo.rendimiento_electrico,
             "precio_gas": vehiculo.precio_gasolina or 22.50,  # Default México
@@ -107,7 +99,10 @@ def crear_vehiculo(vehiculo: VehiculoCreate, db: Session = Depends(get_db)):
         })
         
         nuevo_vehiculo = result.fetchone()
-        db.commit()
+        if nuevo_vehiculo.activo:
+            await db.run_sync(contadores.ajustar_contador, contadores.VEHICULOS_ACTIVOS, 1)
+        await db.commit()
+        invalidar_perfiles()
         
         print(f"✅ Vehículo creado: {nuevo_vehiculo.modelo} (ID: {nuevo_vehiculo.id})")
         
@@ -126,7 +121,7 @@ def crear_vehiculo(vehiculo: VehiculoCreate, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error al crear vehículo: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -134,36 +129,29 @@ def crear_vehiculo(vehiculo: VehiculoCreate, db: Session = Depends(get_db)):
         )
 
 @router.get("/vehiculos", response_model=List[VehiculoResponse])
-def listar_vehiculos(
+async def listar_vehiculos(
+    response: Response,
     disponibles_solo: bool = False,
-    db: Session = Depends(get_db)
+    tipo: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(paginacion.LIMITE_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Lista todos los vehículos o solo los disponibles
+    Lista los vehículos activos (o solo los disponibles) por páginas
+    - tipo: gasolina, hibrido o electrico
+    - cursor: valor del encabezado X-Siguiente-Cursor de la página anterior
     """
     try:
-        query = text("""
-            SELECT 
-                v.id, v.modelo, v.tipo, v.capacidad_maxima_paquetes,
-                v.velocidad_promedio_kmh, v.activo, v.fecha_creacion,
-                CASE 
-                    WHEN a.id IS NOT NULL THEN 'asignado'
-                    ELSE 'disponible'
-                END as estado,
-                u.nombre_completo as asignado_a
-            FROM vehiculos v
-            LEFT JOIN asignaciones a ON v.id = a.id_vehiculo AND a.estado = 'activa'
-            LEFT JOIN usuarios u ON a.id_repartidor = u.id
-            WHERE v.activo = TRUE
-            ORDER BY v.fecha_creacion DESC
-        """)
-        
-        result = db.execute(query)
-        vehiculos = result.fetchall()
-        
-        # Filtrar solo disponibles si se solicita
-        if disponibles_solo:
-            vehiculos = [v for v in vehiculos if v.estado == 'disponible']
+        query, params = consultas.VEHICULOS_LISTADO.preparar(cursor, limite, disponibles_solo=disponibles_solo, tipo=tipo)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        result = await db.execute(query, params)
+        vehiculos, siguiente = paginacion.cortar_pagina(result.fetchall(), limite, "fecha_creacion", "id")
+        if siguiente:
+            response.headers[paginacion.ENCABEZADO] = siguiente
         
         return [
             VehiculoResponse(
@@ -186,27 +174,12 @@ def listar_vehiculos(
         )
 
 @router.get("/vehiculos/{vehiculo_id}", response_model=VehiculoResponse)
-def obtener_vehiculo(vehiculo_id: int, db: Session = Depends(get_db)):
+async def obtener_vehiculo(vehiculo_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene detalles de un vehículo específico
     """
     try:
-        query = text("""
-            SELECT 
-                v.id, v.modelo, v.tipo, v.capacidad_maxima_paquetes,
-                v.velocidad_promedio_kmh, v.activo, v.fecha_creacion,
-                CASE 
-                    WHEN a.id IS NOT NULL THEN 'asignado'
-                    ELSE 'disponible'
-                END as estado,
-                u.nombre_completo as asignado_a
-            FROM vehiculos v
-            LEFT JOIN asignaciones a ON v.id = a.id_vehiculo AND a.estado = 'activa'
-            LEFT JOIN usuarios u ON a.id_repartidor = u.id
-            WHERE v.id = :vehiculo_id AND v.activo = TRUE
-        """)
-        
-        result = db.execute(query, {"vehiculo_id": vehiculo_id})
+        result = await db.execute(consultas.VEHICULO_DETALLE, {"vehiculo_id": vehiculo_id})
         vehiculo = result.fetchone()
         
         if not vehiculo:
@@ -240,14 +213,13 @@ def obtener_vehiculo(vehiculo_id: int, db: Session = Depends(get_db)):
 # =========================
 
 @router.post("/asignaciones", response_model=AsignacionResponse)
-def crear_asignacion(asignacion: AsignacionCreate, db: Session = Depends(get_db)):
+async def crear_asignacion(asignacion: AsignacionCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Asigna un vehículo a un repartidor
     """
     try:
         # Verificar que el repartidor existe
-        check_rep = text("SELECT id, nombre_completo FROM usuarios WHERE id = :id AND rol = 'repartidor' AND activo = TRUE")
-        repartidor = db.execute(check_rep, {"id": asignacion.id_repartidor}).fetchone()
+        repartidor = (await db.execute(consultas.REPARTIDOR_ACTIVO, {"id": asignacion.id_repartidor})).fetchone()
         
         if not repartidor:
             raise HTTPException(
@@ -256,13 +228,7 @@ def crear_asignacion(asignacion: AsignacionCreate, db: Session = Depends(get_db)
             )
         
         # Verificar que el vehículo existe y está disponible
-        check_veh = text("""
-            SELECT v.id, v.modelo, v.capacidad_maxima_paquetes
-            FROM vehiculos v
-            LEFT JOIN asignaciones a ON v.id = a.id_vehiculo AND a.estado = 'activa'
-            WHERE v.id = :id AND v.activo = TRUE AND a.id IS NULL
-        """)
-        vehiculo = db.execute(check_veh, {"id": asignacion.id_vehiculo}).fetchone()
+        vehiculo = (await db.execute(consultas.VEHICULO_DISPONIBLE, {"id": asignacion.id_vehiculo})).fetchone()
         
         if not vehiculo:
             raise HTTPException(
@@ -278,15 +244,7 @@ def crear_asignacion(asignacion: AsignacionCreate, db: Session = Depends(get_db)
             )
         
         # Crear asignación
-        insert_query = text("""
-            INSERT INTO asignaciones 
-            (id_repartidor, id_vehiculo, numero_paquetes, ruta_municipio, estado)
-            VALUES (:id_rep, :id_veh, :num_paq, :ruta, 'activa')
-            RETURNING id, id_repartidor, id_vehiculo, numero_paquetes, 
-                     ruta_municipio, estado, fecha_asignacion
-        """)
-        
-        result = db.execute(insert_query, {
+        result = await db.execute(consultas.ASIGNACION_CREAR, {
             "id_rep": asignacion.id_repartidor,
             "id_veh": asignacion.id_vehiculo,
             "num_paq": asignacion.numero_paquetes,
@@ -294,7 +252,9 @@ def crear_asignacion(asignacion: AsignacionCreate, db: Session = Depends(get_db)
         })
         
         nueva_asignacion = result.fetchone()
-        db.commit()
+        await db.run_sync(contadores.ajustar_asignacion, asignacion.id_repartidor, asignacion.id_vehiculo, 1)
+        await db.commit()
+        invalidar_perfiles()
         
         print(f"✅ Asignación creada: Vehículo {vehiculo.modelo} → Repartidor {repartidor.nombre_completo}")
         
@@ -313,7 +273,7 @@ def crear_asignacion(asignacion: AsignacionCreate, db: Session = Depends(get_db)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Error al crear asignación: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -321,31 +281,32 @@ def crear_asignacion(asignacion: AsignacionCreate, db: Session = Depends(get_db)
         )
 
 @router.get("/asignaciones", response_model=List[AsignacionResponse])
-def listar_asignaciones(
+async def listar_asignaciones(
+    response: Response,
     activas_solo: bool = True,
-    db: Session = Depends(get_db)
+    id_repartidor: Optional[int] = None,
+    id_vehiculo: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(paginacion.LIMITE_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Lista todas las asignaciones o solo las activas
+    Lista las asignaciones (por defecto solo las activas) por páginas
+    - id_repartidor / id_vehiculo: filtros
+    - cursor: valor del encabezado X-Siguiente-Cursor de la página anterior
     """
     try:
-        where_clause = "WHERE a.estado = 'activa'" if activas_solo else ""
-        
-        query = text(f"""
-            SELECT 
-                a.id, a.id_repartidor, a.id_vehiculo, a.numero_paquetes,
-                a.ruta_municipio, a.estado, a.fecha_asignacion,
-                u.nombre_completo as repartidor_nombre,
-                v.modelo as vehiculo_modelo
-            FROM asignaciones a
-            JOIN usuarios u ON a.id_repartidor = u.id
-            JOIN vehiculos v ON a.id_vehiculo = v.id
-            {where_clause}
-            ORDER BY a.fecha_asignacion DESC
-        """)
-        
-        result = db.execute(query)
-        asignaciones = result.fetchall()
+        query, params = consultas.ASIGNACIONES_LISTADO.preparar(
+            cursor, limite, activas_solo=activas_solo, id_repartidor=id_repartidor, id_vehiculo=id_vehiculo
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        result = await db.execute(query, params)
+        asignaciones, siguiente = paginacion.cortar_pagina(result.fetchall(), limite, "fecha_asignacion", "id")
+        if siguiente:
+            response.headers[paginacion.ENCABEZADO] = siguiente
         
         return [
             AsignacionResponse(
@@ -368,21 +329,13 @@ def listar_asignaciones(
         )
 
 @router.delete("/asignaciones/{asignacion_id}")
-def liberar_asignacion(asignacion_id: int, db: Session = Depends(get_db)):
+async def liberar_asignacion(asignacion_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Libera una asignación (marca como completada)
     """
     try:
         # Verificar que existe
-        check_query = text("""
-            SELECT a.id, u.nombre_completo, v.modelo
-            FROM asignaciones a
-            JOIN usuarios u ON a.id_repartidor = u.id
-            JOIN vehiculos v ON a.id_vehiculo = v.id
-            WHERE a.id = :id AND a.estado = 'activa'
-        """)
-        
-        asignacion = db.execute(check_query, {"id": asignacion_id}).fetchone()
+        asignacion = (await db.execute(consultas.ASIGNACION_ACTIVA, {"id": asignacion_id})).fetchone()
         
         if not asignacion:
             raise HTTPException(
@@ -391,14 +344,10 @@ def liberar_asignacion(asignacion_id: int, db: Session = Depends(get_db)):
             )
         
         # Actualizar estado
-        update_query = text("""
-            UPDATE asignaciones 
-            SET estado = 'completada', fecha_fin = CURRENT_TIMESTAMP
-            WHERE id = :id
-        """)
-        
-        db.execute(update_query, {"id": asignacion_id})
-        db.commit()
+        await db.execute(consultas.ASIGNACION_LIBERAR, {"id": asignacion_id})
+        await db.run_sync(contadores.ajustar_asignacion, asignacion.id_repartidor, asignacion.id_vehiculo, -1)
+        await db.commit()
+        invalidar_perfiles()
         
         print(f"✅ Asignación liberada: {asignacion.modelo} de {asignacion.nombre_completo}")
         
@@ -412,7 +361,7 @@ def liberar_asignacion(asignacion_id: int, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al liberar asignación: {str(e)}"
@@ -423,31 +372,24 @@ def liberar_asignacion(asignacion_id: int, db: Session = Depends(get_db)):
 # =========================
 
 @router.get("/estadisticas")
-def obtener_estadisticas(db: Session = Depends(get_db)):
+async def obtener_estadisticas(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene estadísticas generales de la flota
     """
     try:
-        stats_query = text("""
-            SELECT 
-                (SELECT COUNT(*) FROM vehiculos WHERE activo = TRUE) as total_vehiculos,
-                (SELECT COUNT(*) FROM vehiculos v 
-                 LEFT JOIN asignaciones a ON v.id = a.id_vehiculo AND a.estado = 'activa'
-                 WHERE v.activo = TRUE AND a.id IS NULL) as vehiculos_disponibles,
-                (SELECT COUNT(*) FROM asignaciones WHERE estado = 'activa') as asignaciones_activas,
-                (SELECT COUNT(*) FROM usuarios WHERE rol = 'repartidor' AND activo = TRUE) as total_repartidores
-        """)
-        
-        result = db.execute(stats_query)
-        stats = result.fetchone()
+        # Contadores mantenidos por los endpoints de escritura
+        c = await db.run_sync(contadores.leer_contadores)
+        total_vehiculos = c.get(contadores.VEHICULOS_ACTIVOS, 0)
+        vehiculos_asignados = c.get(contadores.VEHICULOS_ASIGNADOS, 0)
+        asignaciones_activas = c.get(contadores.ASIGNACIONES_ACTIVAS, 0)
         
         return {
-            "total_vehiculos": stats.total_vehiculos,
-            "vehiculos_disponibles": stats.vehiculos_disponibles,
-            "vehiculos_asignados": stats.total_vehiculos - stats.vehiculos_disponibles,
-            "asignaciones_activas": stats.asignaciones_activas,
-            "total_repartidores": stats.total_repartidores,
-            "tasa_utilizacion": round((stats.asignaciones_activas / stats.total_vehiculos * 100), 2) if stats.total_vehiculos > 0 else 0
+            "total_vehiculos": total_vehiculos,
+            "vehiculos_disponibles": total_vehiculos - vehiculos_asignados,
+            "vehiculos_asignados": vehiculos_asignados,
+            "asignaciones_activas": asignaciones_activas,
+            "total_repartidores": c.get(contadores.REPARTIDORES_ACTIVOS, 0),
+            "tasa_utilizacion": round((asignaciones_activas / total_vehiculos * 100), 2) if total_vehiculos > 0 else 0
         }
         
     except Exception as e:
@@ -0,0 +1,109 @@
+# backend/API/seguridad.py
+"""
+Identidad del usuario en los requests autenticados.
+
+El JWT se valida localmente (firma, expiración y lista de revocados) y el
+perfil sale de la caché de backend/core/sesiones.py: autorizar un request
+no consulta la BD salvo la primera vez que se ve al usuario o cuando vence
+su entrada en la caché.
+
+El token se lee del header `Authorization: Bearer <token>` o, como lo
+recibía /api/auth/me, del parámetro `?token=`.
+
+Uso en un router:
+    @router.get("/algo")
+    async def algo(usuario = Depends(requerir_rol("admin"))):
+        ...
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Request, status
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database_async import get_async_db
+from backend.core import consultas
+from backend.core import sesiones
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY", "tu_clave_secreta_super_segura_aqui_123")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+
+def create_access_token(data: dict):
+    """Crea token JWT (con jti para poder revocarlo en /logout)"""
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def token_del_request(request: Request):
+    """Token del header Authorization (Bearer) o del parámetro ?token=; None si no viene"""
+    esquema, _, valor = request.headers.get("authorization", "").partition(" ")
+    if esquema.lower() == "bearer" and valor.strip():
+        return valor.strip()
+    return request.query_params.get("token") or None
+
+
+def decodificar_token(token):
+    """Payload de un token válido y no revocado; 401 en cualquier otro caso"""
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No autenticado",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token expirado o inválido",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    if not isinstance(payload.get("user_id"), int) or sesiones.token_revocado(payload.get("jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return payload
+
+
+async def usuario_actual(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Dependencia de FastAPI: PerfilUsuario del token. La sesión solo se usa
+    (y solo toma conexión del pool) si el perfil no está en caché.
+    """
+    payload = decodificar_token(token_del_request(request))
+
+    perfil = sesiones.perfil_en_cache(payload["user_id"])
+    if perfil is None:
+        fila = (await db.execute(consultas.USUARIO_POR_ID, {"id": payload["user_id"]})).fetchone()
+        perfil = sesiones.guardar_perfil(fila) if fila else None
+
+    if perfil is None or not perfil.activo:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado o inactivo",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return perfil
+
+
+def requerir_rol(*roles):
+    """Dependencia que además exige uno de los roles ('admin', 'repartidor'); 403 si no"""
+    async def verificar(usuario: sesiones.PerfilUsuario = Depends(usuario_actual)):
+        if usuario.rol not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tiene permisos para esta operación"
+            )
+        return usuario
+    return verificar
@@ -2,18 +2,21 @@ import os
 from sqlalchemy import text
 from dotenv import load_dotenv
 import json
+import math
+import numpy as np
 
 # Cargar variables de entorno
 load_dotenv()
 
 # Importar conexión PostgreSQL
-from backend.API.database import engine
+from backend.API.database import engine, conexion
+from backend.core.perfiles_vehiculo import obtener_perfil, todos_los_perfiles
 
 # ==========================================================
 # FUNCIONES DE CÁLCULO PARA POSTGRESQL NEON
 # ==========================================================
 
-def calcular_pedido(id_pedido, distancia_km):
+def calcular_pedido(id_pedido, distancia_km, db=None, perfiles=None):
     """
     Calcula métricas para un pedido específico
     Usa el esquema PostgreSQL Neon actualizado
@@ -21,6 +24,9 @@ def calcular_pedido(id_pedido, distancia_km):
     Args:
         id_pedido: ID del pedido en tabla 'pedidos'
         distancia_km: Distancia total en kilómetros
+        db: Sesión del request (opcional, evita tomar otra conexión del pool)
+        perfiles: todos_los_perfiles() ya cargado (opcional; desde db.run_sync
+            hay que pasarlo, porque recargar la caché ahí bloquearía el event loop)
     
     Returns:
         Dict con todas las métricas calculadas
@@ -34,7 +40,7 @@ def calcular_pedido(id_pedido, distancia_km):
         return calcular_pedido_default(id_pedido, distancia_km)
     
     try:
-        with engine.connect() as conn:
+        with conexion(db) as conn:
             # --------------------------------------------------
             # 1. OBTENER DATOS DEL PEDIDO
             # --------------------------------------------------
@@ -45,103 +51,102 @@ def calcular_pedido(id_pedido, distancia_km):
                     p.id_vehiculo,
                     p.capacidad_paquetes,
                     p.destino_entrega,
-                    p.estado,
-                    v.modelo,
-                    v.tipo,
-                    v.capacidad_maxima_paquetes,
-                    v.velocidad_promedio_kmh,
-                    v.rendimiento_gasolina,
-                    v.rendimiento_electrico,
-                    v.precio_gasolina,
-                    v.precio_kwh,
-                    v.factor_emisiones_gasolina,
-                    v.factor_emisiones_electrico
+                    p.estado
                 FROM pedidos p
-                JOIN vehiculos v ON p.id_vehiculo = v.id
                 WHERE p.id = :id_pedido
             """)
             
-            resultado = conn.execute(query_pedido, {"id_pedido": id_pedido})
-            datos = resultado.fetchone()
-            
-            if not datos:
-                return {"error": f"Pedido {id_pedido} no encontrado"}
-            
-            # --------------------------------------------------
-            # 2. EXTRACCIÓN DE DATOS
-            # --------------------------------------------------
-            tipo_vehiculo = datos.tipo.lower()
-            velocidad = float(datos.velocidad_promedio_kmh)
-            
-            # --------------------------------------------------
-            # 3. CÁLCULOS ESPECÍFICOS POR TIPO DE VEHÍCULO
-            # --------------------------------------------------
-            if tipo_vehiculo == "gasolina":
-                resultado = calcular_gasolina(datos, distancia_km)
-                
-            elif tipo_vehiculo == "electrico":
-                resultado = calcular_electrico(datos, distancia_km)
-                
-            elif tipo_vehiculo == "hibrido":
-                resultado = calcular_hibrido(datos, distancia_km)
-                
-            else:
-                return {"error": f"Tipo de vehículo '{tipo_vehiculo}' no soportado"}
-            
-            # --------------------------------------------------
-            # 4. CÁLCULO DE TIEMPO
-            # --------------------------------------------------
-            tiempo_horas = distancia_km / velocidad
-            tiempo_minutos = tiempo_horas * 60
-            
-            # --------------------------------------------------
-            # 5. PREPARAR RESPUESTA FINAL
-            # --------------------------------------------------
-            return {
-                "pedido": {
-                    "id": datos.id,
-                    "numero_pedido": datos.numero_pedido,
-                    "estado": datos.estado,
-                    "destino": datos.destino_entrega,
-                    "capacidad_paquetes": datos.capacidad_paquetes
-                },
-                "vehiculo": {
-                    "modelo": datos.modelo,
-                    "tipo": tipo_vehiculo,
-                    "capacidad_maxima": datos.capacidad_maxima_paquetes,
-                    "velocidad_promedio_kmh": velocidad
-                },
-                "distancia": {
-                    "km": round(distancia_km, 2),
-                    "millas": round(distancia_km * 0.621371, 2)
-                },
-                "tiempo": {
-                    "minutos": round(tiempo_minutos, 1),
-                    "horas": round(tiempo_horas, 2),
-                    "formateado": f"{int(tiempo_minutos//60)}h {int(tiempo_minutos%60)}min"
-                },
-                "consumo": resultado["consumo"],
-                "costo": {
-                    "total": round(resultado["costo"], 2),
-                    "moneda": "MXN",
-                    "por_km": round(resultado["costo"] / distancia_km, 2) if distancia_km > 0 else 0
-                },
-                "emisiones": {
-                    "co2_kg": round(resultado["emisiones"], 2),
-                    "equivalente_arboles": round(resultado["emisiones"] / 21.77, 1),  # 1 árbol absorbe ~21.77kg CO2/año
-                    "por_km": round(resultado["emisiones"] / distancia_km, 3) if distancia_km > 0 else 0
-                },
-                "sustentabilidad": {
-                    "impacto": calcular_impacto_sustentabilidad(resultado["emisiones"], distancia_km),
-                    "puntuacion": calcular_puntuacion_sustentable(tipo_vehiculo, resultado["emisiones"], distancia_km),
-                    "recomendacion": generar_recomendacion(tipo_vehiculo, distancia_km)
-                }
-            }
+            datos = conn.execute(query_pedido, {"id_pedido": id_pedido}).fetchone()
+        
+        # --------------------------------------------------
+        # 2. PARÁMETROS DEL VEHÍCULO (caché, sin consultar la BD)
+        # --------------------------------------------------
+        if perfiles is None:
+            perfiles = todos_los_perfiles()
+        perfil = perfiles.get(datos.id_vehiculo) if datos else None
+        
+        if not perfil:
+            return {"error": f"Pedido {id_pedido} no encontrado"}
+        
+        # --------------------------------------------------
+        # 3. CÁLCULOS ESPECÍFICOS POR TIPO DE VEHÍCULO
+        # --------------------------------------------------
+        resultado = calcular_por_tipo(perfil, distancia_km)
+        
+        if resultado is None:
+            return {"error": f"Tipo de vehículo '{perfil.tipo}' no soportado"}
+        
+        # --------------------------------------------------
+        # 4. PREPARAR RESPUESTA FINAL
+        # --------------------------------------------------
+        return armar_resultado(perfil, distancia_km, resultado, pedido=datos)
             
     except Exception as e:
         print(f"❌ Error en cálculo PostgreSQL: {e}")
         return calcular_pedido_default(id_pedido, distancia_km)
 
+def calcular_por_tipo(perfil, distancia_km):
+    """Consumo, costo y emisiones según el tipo del vehículo (None si no se soporta)"""
+    if perfil.tipo == "gasolina":
+        return calcular_gasolina(perfil, distancia_km)
+    elif perfil.tipo == "electrico":
+        return calcular_electrico(perfil, distancia_km)
+    elif perfil.tipo == "hibrido":
+        return calcular_hibrido(perfil, distancia_km)
+    return None
+
+def armar_resultado(perfil, distancia_km, resultado, pedido=None):
+    """Arma la respuesta de calcular_pedido a partir del cálculo por tipo de vehículo"""
+    tipo_vehiculo = perfil.tipo
+    velocidad = perfil.velocidad_promedio_kmh
+    tiempo_horas = distancia_km / velocidad
+    tiempo_minutos = tiempo_horas * 60
+    
+    respuesta = {}
+    if pedido is not None:
+        respuesta["pedido"] = {
+            "id": pedido.id,
+            "numero_pedido": pedido.numero_pedido,
+            "estado": pedido.estado,
+            "destino": pedido.destino_entrega,
+            "capacidad_paquetes": pedido.capacidad_paquetes
+        }
+    
+    respuesta.update({
+        "vehiculo": {
+            "modelo": perfil.modelo,
+            "tipo": tipo_vehiculo,
+            "capacidad_maxima": perfil.capacidad_maxima_paquetes,
+            "velocidad_promedio_kmh": velocidad
+        },
+        "distancia": {
+            "km": round(distancia_km, 2),
+            "millas": round(distancia_km * 0.621371, 2)
+        },
+        "tiempo": {
+            "minutos": round(tiempo_minutos, 1),
+            "horas": round(tiempo_horas, 2),
+            "formateado": f"{int(tiempo_minutos//60)}h {int(tiempo_minutos%60)}min"
+        },
+        "consumo": resultado["consumo"],
+        "costo": {
+            "total": round(resultado["costo"], 2),
+            "moneda": "MXN",
+            "por_km": round(resultado["costo"] / distancia_km, 2) if distancia_km > 0 else 0
+        },
+        "emisiones": {
+            "co2_kg": round(resultado["emisiones"], 2),
+            "equivalente_arboles": round(resultado["emisiones"] / 21.77, 1),  # 1 árbol absorbe ~21.77kg CO2/año
+            "por_km": round(resultado["emisiones"] / distancia_km, 3) if distancia_km > 0 else 0
+        },
+        "sustentabilidad": {
+            "impacto": calcular_impacto_sustentabilidad(resultado["emisiones"], distancia_km),
+            "puntuacion": calcular_puntuacion_sustentable(tipo_vehiculo, resultado["emisiones"], distancia_km),
+            "recomendacion": generar_recomendacion(tipo_vehiculo, distancia_km)
+        }
+    })
+    return respuesta
+
 # --------------------------------------------------
 # FUNCIONES ESPECÍFICAS DE CÁLCULO
 # --------------------------------------------------
@@ -299,55 +304,289 @@ def calcular_pedido_default(id_pedido, distancia_km):
         "mensaje": "Usando valores por defecto"
     }
 
+# ==========================================================
+# CÁLCULO POR LOTES (reportes y dashboards)
+# ==========================================================
+
+# Fracción de la distancia recorrida con gasolina / electricidad por tipo
+REPARTO_ENERGIA = {
+    "gasolina": (1.0, 0.0),
+    "electrico": (0.0, 1.0),
+    "hibrido": (0.6, 0.4)
+}
+
+# Campos de cada fuente de energía: (índice en REPARTO_ENERGIA, rendimiento, precio, factor de emisiones)
+_CAMPOS_ENERGIA = (
+    (0, "rendimiento_gasolina", "precio_gasolina", "factor_emisiones_gasolina"),
+    (1, "rendimiento_electrico", "precio_kwh", "factor_emisiones_electrico"),
+)
+
+def _campos_invalidos(perfil):
+    """
+    Campos que necesita el cálculo del perfil y vienen NULL o no finitos
+    (o <= 0 si dividen: velocidad y rendimiento). Lista vacía si está completo.
+    """
+    divisores = ["velocidad_promedio_kmh"]
+    factores = []
+    for indice, rendimiento, precio, factor in _CAMPOS_ENERGIA:
+        if REPARTO_ENERGIA[perfil.tipo][indice] > 0:
+            divisores.append(rendimiento)
+            factores += [precio, factor]
+    
+    valores = {campo: getattr(perfil, campo) for campo in divisores + factores}
+    return [
+        campo for campo, valor in valores.items()
+        if valor is None or not math.isfinite(valor) or (campo in divisores and valor <= 0)
+    ]
+
+def _columna(perfiles, campo):
+    """Extrae un campo numérico de varios perfiles como arreglo (NULL -> NaN)"""
+    return np.array(
+        [np.nan if getattr(p, campo) is None else getattr(p, campo) for p in perfiles],
+        dtype=np.float64
+    )
+
+def _energia(distancias, fraccion, rendimiento, precio, factor):
+    """Consumo, costo y emisiones de una fuente de energía (solo donde fraccion > 0)"""
+    usa = fraccion > 0
+    consumo = np.zeros_like(distancias)
+    np.divide(distancias * fraccion, rendimiento, out=consumo, where=usa)
+    costo = np.where(usa, consumo * precio, 0.0)
+    emisiones = np.where(usa, consumo * factor, 0.0)
+    return consumo, costo, emisiones
+
+def calcular_pedidos_lote(pedidos, db=None):
+    """
+    Calcula métricas para muchos pedidos con UNA consulta y fórmulas vectorizadas.
+    
+    Args:
+        pedidos: lista de (id_pedido, distancia_km)
+        db: Sesión del request (opcional)
+    
+    Returns:
+        Lista (en el mismo orden) con la misma estructura que calcular_pedido
+    """
+    pedidos = list(pedidos)
+    if not pedidos:
+        return []
+    
+    if engine is None:
+        return [calcular_pedido_default(id_pedido, distancia) for id_pedido, distancia in pedidos]
+    
+    try:
+        with conexion(db) as conn:
+            query_pedidos = text("""
+                SELECT 
+                    p.id,
+                    p.numero_pedido,
+                    p.id_vehiculo,
+                    p.capacidad_paquetes,
+                    p.destino_entrega,
+                    p.estado
+                FROM pedidos p
+                WHERE p.id = ANY(:ids)
+            """)
+            
+            ids = list({int(id_pedido) for id_pedido, _ in pedidos})
+            por_id = {fila.id: fila for fila in conn.execute(query_pedidos, {"ids": ids})}
+        
+        perfiles = todos_los_perfiles()
+    
+    except Exception as e:
+        print(f"❌ Error en cálculo por lotes PostgreSQL: {e}")
+        return [calcular_pedido_default(id_pedido, distancia) for id_pedido, distancia in pedidos]
+    
+    # Pedidos inexistentes se marcan aquí; el resto se calcula en bloque
+    resultados = [None] * len(pedidos)
+    posiciones = []
+    for pos, (id_pedido, distancia) in enumerate(pedidos):
+        if not distancia or distancia <= 0:
+            resultados[pos] = {"error": "Distancia no válida"}
+        elif int(id_pedido) not in por_id:
+            resultados[pos] = {"error": f"Pedido {id_pedido} no encontrado"}
+        else:
+            posiciones.append(pos)
+    
+    calculados = calcular_filas_lote(
+        [por_id[int(pedidos[pos][0])] for pos in posiciones],
+        [pedidos[pos][1] for pos in posiciones],
+        perfiles
+    )
+    for pos, resultado in zip(posiciones, calculados):
+        resultados[pos] = resultado
+    
+    return resultados
+
+def calcular_filas_lote(filas, distancias, perfiles=None):
+    """
+    Núcleo vectorizado de calcular_pedidos_lote para filas de pedido ya leídas
+    (id, numero_pedido, id_vehiculo, capacidad_paquetes, destino_entrega, estado).
+    
+    Returns:
+        Lista (en el mismo orden) con la estructura de calcular_pedido,
+        o {"error": ...} en la posición de cada fila que no se pudo calcular
+    """
+    if perfiles is None:
+        perfiles = todos_los_perfiles()
+    
+    # --------------------------------------------------
+    # 1. VALIDACIÓN (se conservan los errores por posición)
+    # --------------------------------------------------
+    resultados = [None] * len(filas)
+    validos = []
+    invalidos = {}      # id_vehiculo -> campos inválidos (se revisa una vez por vehículo)
+    for pos, (fila, distancia) in enumerate(zip(filas, distancias)):
+        perfil = perfiles.get(fila.id_vehiculo)
+        if not distancia or distancia <= 0:
+            resultados[pos] = {"error": "Distancia no válida"}
+        elif perfil is None:
+            resultados[pos] = {"error": f"Pedido {fila.id} no encontrado"}
+        elif perfil.tipo not in REPARTO_ENERGIA:
+            resultados[pos] = {"error": f"Tipo de vehículo '{perfil.tipo}' no soportado"}
+        else:
+            # Sin esto un NULL o un rendimiento 0 daría NaN/inf en los totales
+            # y en el JSON de la respuesta (que no admite NaN)
+            if perfil.id not in invalidos:
+                invalidos[perfil.id] = _campos_invalidos(perfil)
+            if invalidos[perfil.id]:
+                resultados[pos] = {
+                    "error": f"Vehículo {perfil.id} sin datos válidos: {', '.join(invalidos[perfil.id])}"
+                }
+            else:
+                validos.append(pos)
+    
+    if not validos:
+        return resultados
+    
+    # --------------------------------------------------
+    # 2. CÁLCULOS VECTORIZADOS
+    # --------------------------------------------------
+    filas = [filas[pos] for pos in validos]
+    vehiculos = [perfiles[f.id_vehiculo] for f in filas]
+    tipos = [v.tipo for v in vehiculos]
+    distancias = np.array([float(distancias[pos]) for pos in validos], dtype=np.float64)
+    fraccion_gas = np.array([REPARTO_ENERGIA[t][0] for t in tipos])
+    fraccion_elec = np.array([REPARTO_ENERGIA[t][1] for t in tipos])
+    
+    litros, costo_gas, emisiones_gas = _energia(
+        distancias, fraccion_gas,
+        _columna(vehiculos, "rendimiento_gasolina"), _columna(vehiculos, "precio_gasolina"),
+        _columna(vehiculos, "factor_emisiones_gasolina")
+    )
+    kwh, costo_elec, emisiones_elec = _energia(
+        distancias, fraccion_elec,
+        _columna(vehiculos, "rendimiento_electrico"), _columna(vehiculos, "precio_kwh"),
+        _columna(vehiculos, "factor_emisiones_electrico")
+    )
+    costos = (costo_gas + costo_elec).tolist()
+    emisiones = (emisiones_gas + emisiones_elec).tolist()
+    litros, kwh = litros.tolist(), kwh.tolist()
+    
+    # --------------------------------------------------
+    # 3. RESPUESTA POR PEDIDO
+    # --------------------------------------------------
+    for k, pos in enumerate(validos):
+        tipo = tipos[k]
+        if tipo == "gasolina":
+            consumo = {"litros": round(litros[k], 2)}
+        elif tipo == "electrico":
+            consumo = {"kwh": round(kwh[k], 2)}
+        else:
+            consumo = {
+                "litros": round(litros[k], 2),
+                "kwh": round(kwh[k], 2),
+                "distribucion": "60% gasolina, 40% eléctrico"
+            }
+        
+        resultados[pos] = armar_resultado(
+            vehiculos[k], float(distancias[k]),
+            {"consumo": consumo, "costo": costos[k], "emisiones": emisiones[k]},
+            pedido=filas[k]
+        )
+    
+    return resultados
+
+def coeficientes_por_km(perfiles):
+    """
+    Consumo, costo de energía y emisiones POR KILÓMETRO de cada perfil
+    (mismas fórmulas que calcular_gasolina/electrico/hibrido, vectorizadas).
+    Todas las métricas son lineales en la distancia, así que cualquier
+    escenario se obtiene multiplicando por la distancia.
+    Los perfiles deben ser de un tipo incluido en REPARTO_ENERGIA.
+    """
+    unos = np.ones(len(perfiles))
+    fraccion_gas = np.array([REPARTO_ENERGIA[p.tipo][0] for p in perfiles])
+    fraccion_elec = np.array([REPARTO_ENERGIA[p.tipo][1] for p in perfiles])
+    
+    litros, costo_gas, emisiones_gas = _energia(
+        unos, fraccion_gas,
+        _columna(perfiles, "rendimiento_gasolina"), _columna(perfiles, "precio_gasolina"),
+        _columna(perfiles, "factor_emisiones_gasolina")
+    )
+    kwh, costo_elec, emisiones_elec = _energia(
+        unos, fraccion_elec,
+        _columna(perfiles, "rendimiento_electrico"), _columna(perfiles, "precio_kwh"),
+        _columna(perfiles, "factor_emisiones_electrico")
+    )
+    
+    return {
+        "litros": litros,
+        "kwh": kwh,
+        "costo": costo_gas + costo_elec,
+        "emisiones": emisiones_gas + emisiones_elec
+    }
+
 # ==========================================================
 # FUNCIONES ADICIONALES PARA FORMULARIOS
 # ==========================================================
 
-def calcular_ruta_sustentable(id_asignacion, distancia_km):
+def calcular_ruta_sustentable(id_asignacion, distancia_km, db=None):
     """
     Calcula métricas para una asignación completa
     (Para mostrar en panel de repartidor)
     """
+    if not distancia_km or distancia_km <= 0:
+        return {"error": "Distancia no válida"}
+    
     try:
-        with engine.connect() as conn:
+        with conexion(db) as conn:
             query = text("""
                 SELECT 
                     a.id,
+                    a.id_vehiculo,
                     a.numero_paquetes,
                     a.ruta_municipio,
-                    u.nombre_completo as repartidor,
-                    v.modelo,
-                    v.tipo,
-                    v.capacidad_maxima_paquetes,
-                    v.velocidad_promedio_kmh,
-                    v.rendimiento_gasolina,
-                    v.rendimiento_electrico,
-                    v.precio_gasolina,
-                    v.precio_kwh
+                    u.nombre_completo as repartidor
                 FROM asignaciones a
                 JOIN usuarios u ON a.id_repartidor = u.id
-                JOIN vehiculos v ON a.id_vehiculo = v.id
                 WHERE a.id = :id_asignacion
             """)
             
             datos = conn.execute(query, {"id_asignacion": id_asignacion}).fetchone()
-            
-            if not datos:
-                return {"error": "Asignación no encontrada"}
-            
-            # Calcular métricas básicas
-            resultado = calcular_pedido(0, distancia_km)  # Usar cálculo genérico
-            
-            # Añadir información específica de asignación
-            resultado["asignacion"] = {
-                "id": datos.id,
-                "repartidor": datos.repartidor,
-                "paquetes": datos.numero_paquetes,
-                "municipio": datos.ruta_municipio,
-                "ocupacion": f"{(datos.numero_paquetes / datos.capacidad_maxima_paquetes) * 100:.1f}%"
-            }
-            
-            return resultado
+        
+        perfil = obtener_perfil(datos.id_vehiculo) if datos else None
+        
+        if not perfil:
+            return {"error": "Asignación no encontrada"}
+        
+        # Calcular métricas con el vehículo de la asignación
+        metricas = calcular_por_tipo(perfil, distancia_km)
+        
+        if metricas is None:
+            return {"error": f"Tipo de vehículo '{perfil.tipo}' no soportado"}
+        
+        resultado = armar_resultado(perfil, distancia_km, metricas)
+        
+        # Añadir información específica de asignación
+        resultado["asignacion"] = {
+            "id": datos.id,
+            "repartidor": datos.repartidor,
+            "paquetes": datos.numero_paquetes,
+            "municipio": datos.ruta_municipio,
+            "ocupacion": f"{(datos.numero_paquetes / perfil.capacidad_maxima_paquetes) * 100:.1f}%"
+        }
+        
+        return resultado
             
     except Exception as e:
         return {"error": f"Error en cálculo: {str(e)}"}
@@ -358,30 +597,23 @@ def verificar_capacidad_vehiculo(id_vehiculo, numero_paquetes):
     (Para formulario de asignación)
     """
     try:
-        with engine.connect() as conn:
-            query = text("""
-                SELECT capacidad_maxima_paquetes, modelo
-                FROM vehiculos 
-                WHERE id = :id_vehiculo AND activo = TRUE
-            """)
-            
-            vehiculo = conn.execute(query, {"id_vehiculo": id_vehiculo}).fetchone()
-            
-            if not vehiculo:
-                return {"error": "Vehículo no encontrado o inactivo"}
-            
-            capacidad = vehiculo.capacidad_maxima_paquetes
-            disponible = capacidad - numero_paquetes
-            
-            return {
-                "vehiculo": vehiculo.modelo,
-                "capacidad_maxima": capacidad,
-                "paquetes_solicitados": numero_paquetes,
-                "disponible": max(0, disponible),
-                "sobrecarga": max(0, -disponible),
-                "valido": numero_paquetes <= capacidad,
-                "porcentaje_uso": f"{(numero_paquetes / capacidad) * 100:.1f}%" if capacidad > 0 else "0%"
-            }
+        vehiculo = obtener_perfil(id_vehiculo)
+        
+        if not vehiculo or not vehiculo.activo:
+            return {"error": "Vehículo no encontrado o inactivo"}
+        
+        capacidad = vehiculo.capacidad_maxima_paquetes
+        disponible = capacidad - numero_paquetes
+        
+        return {
+            "vehiculo": vehiculo.modelo,
+            "capacidad_maxima": capacidad,
+            "paquetes_solicitados": numero_paquetes,
+            "disponible": max(0, disponible),
+            "sobrecarga": max(0, -disponible),
+            "valido": numero_paquetes <= capacidad,
+            "porcentaje_uso": f"{(numero_paquetes / capacidad) * 100:.1f}%" if capacidad > 0 else "0%"
+        }
             
     except Exception as e:
-        return {"error": f"Error en verificación: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error en verificación: {str(e)}"}
@@ -0,0 +1,800 @@
+# NOMBRE DEL ARCHIVO: consultas.py
+"""
+Registro de las sentencias SQL de los routers.
+
+Cada sentencia se arma una sola vez al importar el módulo, con el tipo de
+sus parámetros y de sus columnas de resultado. Como el objeto (y su texto)
+es siempre el mismo:
+- SQLAlchemy la compila una vez y reutiliza la compilación de su caché;
+- asyncpg la prepara en el servidor la primera vez que una conexión la usa
+  y después solo la ejecuta (caché por conexión, ver database_async.py),
+  así que el parseo y el plan no se pagan en cada request.
+
+Los tipos de los parámetros viajan en la sentencia preparada ($1::INTEGER),
+de modo que el plan no depende de lo que Postgres infiera en cada llamada.
+
+Los listados con filtros opcionales usan Listado: cada combinación de
+filtros presentes es una sentencia fija que se arma la primera vez y se
+guarda.
+"""
+import threading
+
+from sqlalchemy import (
+    ARRAY, Boolean, DateTime, Float, Integer, Numeric, String, Text, Time, bindparam, text
+)
+
+from backend.core import paginacion
+
+FECHA = DateTime(timezone=True)
+
+
+def _sentencia(sql, parametros=None, columnas=None):
+    """text() con parámetros y columnas de resultado tipados"""
+    consulta = text(sql)
+    if parametros:
+        consulta = consulta.bindparams(*(bindparam(nombre, type_=tipo) for nombre, tipo in parametros.items()))
+    if columnas:
+        consulta = consulta.columns(**columnas)
+    return consulta
+
+
+class Listado:
+    """
+    Listado paginado por keyset con filtros opcionales.
+
+    - base: SELECT ... WHERE (los filtros se agregan con AND)
+    - filtros: nombre -> condición; si la condición usa :nombre, el valor
+      se pasa como parámetro, si no es una bandera (p. ej. "a.id IS NULL")
+    - parametros / columnas: tipos, como en _sentencia
+
+    En lugar de una sola sentencia con (:x IS NULL OR col = :x), que
+    obliga a Postgres a un plan genérico que no aprovecha los índices ni
+    descarta particiones, cada combinación de filtros es su propia
+    sentencia preparada.
+    """
+    __slots__ = ("base", "filtros", "col_fecha", "col_id", "parametros", "columnas", "_variantes", "_lock")
+
+    def __init__(self, base, filtros, col_fecha, col_id, parametros=None, columnas=None):
+        self.base = base
+        self.filtros = filtros
+        self.col_fecha = col_fecha
+        self.col_id = col_id
+        self.parametros = dict(parametros or {})
+        self.parametros.update(cursor_fecha=FECHA, cursor_id=Integer, limite_pagina=Integer)
+        self.columnas = columnas
+        self._variantes = {}
+        self._lock = threading.Lock()
+
+    def preparar(self, cursor, limite, **valores):
+        """
+        (sentencia, parámetros) de la página. Un filtro está presente si su
+        valor es verdadero. ValueError si el cursor no es válido.
+        """
+        filtro_cursor, params = paginacion.filtro_keyset(cursor, self.col_fecha, self.col_id)
+        params.update(paginacion.parametros_limite(limite))
+        presentes = tuple(nombre for nombre in self.filtros if valores.get(nombre))
+        params.update({nombre: valores[nombre] for nombre in presentes if nombre in self.parametros})
+
+        clave = (presentes, bool(filtro_cursor))
+        with self._lock:
+            sentencia = self._variantes.get(clave)
+            if sentencia is None:
+                sql = (
+                    self.base
+                    + "".join(f" AND {self.filtros[nombre]}" for nombre in presentes)
+                    + filtro_cursor
+                    + paginacion.orden_keyset(self.col_fecha, self.col_id)
+                )
+                tipos = {nombre: tipo for nombre, tipo in self.parametros.items() if nombre in params}
+                sentencia = self._variantes[clave] = _sentencia(sql, tipos, self.columnas)
+        return sentencia, params
+
+
+# ============================================
+# AUTH
+# ============================================
+
+USUARIO_LOGIN = _sentencia("""
+    SELECT id, nombre_completo, email, username, telefono,
+           password_hash, rol, activo
+    FROM usuarios
+    WHERE (email = :identifier OR username = :identifier)
+    AND activo = TRUE
+""", {"identifier": String}, {"id": Integer, "rol": String, "activo": Boolean})
+
+USUARIO_ULTIMO_LOGIN = _sentencia("""
+    UPDATE usuarios
+    SET ultimo_login = CURRENT_TIMESTAMP
+    WHERE id = :id
+""", {"id": Integer})
+
+USUARIO_POR_EMAIL = _sentencia(
+    "SELECT id FROM usuarios WHERE email = :email", {"email": String}, {"id": Integer}
+)
+
+USUARIO_POR_USERNAME = _sentencia(
+    "SELECT id FROM usuarios WHERE username = :username", {"username": String}, {"id": Integer}
+)
+
+USUARIO_CREAR = _sentencia("""
+    INSERT INTO usuarios
+    (nombre_completo, email, telefono, username, password_hash, rol)
+    VALUES (:nombre, :email, :telefono, :username, :password, :rol)
+    RETURNING id, nombre_completo, email, username, telefono, rol,
+             activo, fecha_registro
+""", {
+    "nombre": String, "email": String, "telefono": String,
+    "username": String, "password": String, "rol": String
+}, {"id": Integer, "rol": String, "activo": Boolean, "fecha_registro": FECHA})
+
+# Perfil para la caché de sesiones (también inactivos, para no volver a consultarlos)
+USUARIO_POR_ID = _sentencia("""
+    SELECT id, nombre_completo, email, username, telefono, rol, activo, fecha_registro
+    FROM usuarios
+    WHERE id = :id
+""", {"id": Integer}, {"id": Integer, "activo": Boolean, "fecha_registro": FECHA})
+
+REPARTIDORES_ACTIVOS = _sentencia("""
+    SELECT id, nombre_completo, email, username, telefono
+    FROM usuarios
+    WHERE rol = 'repartidor' AND activo = TRUE
+    ORDER BY nombre_completo
+""", columnas={"id": Integer})
+
+# ============================================
+# PEDIDOS
+# ============================================
+
+# Candados de contadores.ajustar_asignacion (repartidor y luego vehículo). Van
+# en una sentencia ANTERIOR a PEDIDO_CREAR / IMPORTACION_MERGE: así la
+# instantánea de esas ya ve lo que confirmó quien tenía el candado, y dos
+# transacciones no cuentan ambas la "primera" asignación de un repartidor.
+# El volátil pg_advisory_xact_lock se evalúa después del ORDER BY.
+ASIGNACION_BLOQUEAR = _sentencia("""
+    SELECT pg_advisory_xact_lock(c.clase, c.id)
+    FROM (VALUES (1, :clase_repartidor, :repartidor), (2, :clase_vehiculo, :vehiculo)) AS c(orden, clase, id)
+    ORDER BY c.orden
+""", {"clase_repartidor": Integer, "repartidor": Integer, "clase_vehiculo": Integer, "vehiculo": Integer})
+
+# La instantánea de la sentencia es la de ANTES de insertar, así que las
+# subconsultas sobre asignaciones en 'conteo' ven el estado previo
+PEDIDO_CREAR = _sentencia("""
+    WITH datos AS (
+        SELECT
+            CAST(:numero AS varchar) AS numero_pedido,
+            CAST(:repartidor AS integer) AS id_repartidor,
+            CAST(:vehiculo AS integer) AS id_vehiculo,
+            CAST(:capacidad AS integer) AS capacidad_paquetes,
+            CAST(:destino AS text) AS destino_entrega,
+            CAST(:estado AS varchar) AS estado
+    ),
+    rep AS (
+        SELECT u.id, u.nombre_completo
+        FROM usuarios u, datos d
+        WHERE u.id = d.id_repartidor AND u.rol = 'repartidor' AND u.activo = TRUE
+    ),
+    veh AS (
+        SELECT v.id, v.modelo, v.tipo, v.capacidad_maxima_paquetes
+        FROM vehiculos v, datos d
+        WHERE v.id = d.id_vehiculo AND v.activo = TRUE
+    ),
+    validacion AS (
+        SELECT
+            EXISTS (SELECT 1 FROM numeros_pedido n, datos d WHERE n.numero_pedido = d.numero_pedido) AS duplicado,
+            EXISTS (SELECT 1 FROM rep) AS repartidor_ok,
+            EXISTS (SELECT 1 FROM veh) AS vehiculo_ok,
+            COALESCE((SELECT d.capacidad_paquetes <= veh.capacidad_maxima_paquetes FROM veh, datos d), FALSE) AS capacidad_ok
+    ),
+    asig_actual AS (
+        SELECT a.id
+        FROM asignaciones a, datos d
+        WHERE a.id_repartidor = d.id_repartidor AND a.id_vehiculo = d.id_vehiculo AND a.estado = 'activa'
+        LIMIT 1
+    ),
+    nueva_asig AS (
+        INSERT INTO asignaciones (id_repartidor, id_vehiculo, numero_paquetes, estado)
+        SELECT d.id_repartidor, d.id_vehiculo, d.capacidad_paquetes, 'activa'
+        FROM datos d, validacion v
+        WHERE NOT v.duplicado AND v.repartidor_ok AND v.vehiculo_ok AND v.capacidad_ok
+          AND NOT EXISTS (SELECT 1 FROM asig_actual)
+        RETURNING id
+    ),
+    reserva AS (
+        INSERT INTO numeros_pedido (numero_pedido)
+        SELECT d.numero_pedido
+        FROM datos d, validacion v
+        WHERE NOT v.duplicado AND v.repartidor_ok AND v.vehiculo_ok AND v.capacidad_ok
+        ON CONFLICT (numero_pedido) DO NOTHING
+        RETURNING numero_pedido
+    ),
+    nuevo AS (
+        INSERT INTO pedidos
+        (numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes, destino_entrega, estado)
+        SELECT d.numero_pedido, d.id_vehiculo, d.id_repartidor, d.capacidad_paquetes, d.destino_entrega, d.estado
+        FROM datos d
+        JOIN reserva r ON r.numero_pedido = d.numero_pedido
+        RETURNING id, numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes,
+                  destino_entrega, estado, fecha_creacion, fecha_asignacion,
+                  fecha_entrega_estimada
+    ),
+    conteo AS (
+        INSERT INTO contadores (clave, valor, actualizado)
+        SELECT c.clave, c.delta, CURRENT_TIMESTAMP
+        FROM datos d, LATERAL (VALUES
+            (CAST(:clave_estado AS varchar), (SELECT COUNT(*) FROM nuevo)),
+            (CAST(:clave_paquetes AS varchar), (SELECT COALESCE(SUM(capacidad_paquetes), 0) FROM nuevo)),
+            (CAST(:clave_asignaciones AS varchar), (SELECT COUNT(*) FROM nueva_asig)),
+            (CAST(:clave_repartidores AS varchar), (SELECT COUNT(*) FROM nueva_asig WHERE NOT EXISTS (
+                SELECT 1 FROM asignaciones a WHERE a.id_repartidor = d.id_repartidor AND a.estado = 'activa'))),
+            (CAST(:clave_vehiculos AS varchar), (SELECT COUNT(*) FROM nueva_asig WHERE NOT EXISTS (
+                SELECT 1 FROM asignaciones a WHERE a.id_vehiculo = d.id_vehiculo AND a.estado = 'activa')))
+        ) AS c(clave, delta)
+        WHERE c.delta <> 0
+        ON CONFLICT (clave) DO UPDATE
+        SET valor = contadores.valor + EXCLUDED.valor,
+            actualizado = CURRENT_TIMESTAMP
+    )
+    SELECT
+        v.duplicado, v.repartidor_ok, v.vehiculo_ok, v.capacidad_ok,
+        rep.nombre_completo AS nombre_repartidor,
+        veh.modelo AS modelo_vehiculo,
+        veh.tipo AS tipo_vehiculo,
+        veh.capacidad_maxima_paquetes,
+        (SELECT id FROM nueva_asig) AS asignacion_creada,
+        nuevo.*
+    FROM validacion v
+    LEFT JOIN rep ON TRUE
+    LEFT JOIN veh ON TRUE
+    LEFT JOIN nuevo ON TRUE
+""", {
+    "numero": String, "repartidor": Integer, "vehiculo": Integer, "capacidad": Integer,
+    "destino": Text, "estado": String, "clave_estado": String, "clave_paquetes": String,
+    "clave_asignaciones": String, "clave_repartidores": String, "clave_vehiculos": String
+}, {
+    "duplicado": Boolean, "repartidor_ok": Boolean, "vehiculo_ok": Boolean, "capacidad_ok": Boolean,
+    "capacidad_maxima_paquetes": Integer, "asignacion_creada": Integer, "id": Integer,
+    "fecha_creacion": FECHA, "fecha_asignacion": FECHA, "fecha_entrega_estimada": FECHA
+})
+
+# Tabla temporal de /importar (se elimina al terminar la transacción)
+IMPORTACION_TABLA = _sentencia("""
+    CREATE TEMP TABLE importacion_pedidos (
+        fila INTEGER,
+        numero_pedido VARCHAR(50),
+        id_repartidor INTEGER,
+        id_vehiculo INTEGER,
+        capacidad_paquetes INTEGER,
+        destino_entrega TEXT,
+        estado VARCHAR(20)
+    ) ON COMMIT DROP
+""")
+
+# Lo mismo que ASIGNACION_BLOQUEAR para todos los repartidores y vehículos
+# del archivo, en orden (todos los repartidores y luego todos los vehículos,
+# por id) para no cruzarse con otra importación ni con ajustar_asignacion
+IMPORTACION_BLOQUEAR = _sentencia("""
+    SELECT COUNT(pg_advisory_xact_lock(c.clase, c.id))
+    FROM (
+        SELECT * FROM (
+            SELECT DISTINCT 1 AS orden, CAST(:clase_repartidor AS integer) AS clase, id_repartidor AS id
+            FROM importacion_pedidos
+            UNION ALL
+            SELECT DISTINCT 2, CAST(:clase_vehiculo AS integer), id_vehiculo
+            FROM importacion_pedidos
+        ) AS ids
+        ORDER BY orden, id
+        OFFSET 0
+    ) AS c
+""", {"clase_repartidor": Integer, "clase_vehiculo": Integer})
+
+# Valida e inserta en bloque lo cargado con COPY. La primera fila del
+# resultado es el resumen (fila NULL); las demás, las filas rechazadas.
+IMPORTACION_MERGE = _sentencia("""
+    WITH validados AS (
+        SELECT
+            s.*,
+            CASE
+                WHEN s.estado <> ALL(CAST(:estados AS varchar[])) THEN 'Estado no válido'
+                WHEN s.fila <> MIN(s.fila) OVER (PARTITION BY s.numero_pedido)
+                    THEN 'Número de pedido repetido en el archivo'
+                WHEN EXISTS (SELECT 1 FROM numeros_pedido n WHERE n.numero_pedido = s.numero_pedido)
+                    THEN 'Ya existe un pedido con ese número'
+                WHEN u.id IS NULL THEN 'El repartidor no existe, no es repartidor o no está activo'
+                WHEN v.id IS NULL THEN 'El vehículo no existe o no está activo'
+                WHEN s.capacidad_paquetes > v.capacidad_maxima_paquetes
+                    THEN 'Capacidad excedida. Máximo permitido: ' || v.capacidad_maxima_paquetes || ' paquetes'
+            END AS error
+        FROM importacion_pedidos s
+        LEFT JOIN usuarios u ON u.id = s.id_repartidor AND u.rol = 'repartidor' AND u.activo = TRUE
+        LEFT JOIN vehiculos v ON v.id = s.id_vehiculo AND v.activo = TRUE
+    ),
+    validos AS (
+        SELECT * FROM validados WHERE error IS NULL
+    ),
+    nuevas_asig AS (
+        INSERT INTO asignaciones (id_repartidor, id_vehiculo, numero_paquetes, estado)
+        SELECT vl.id_repartidor, vl.id_vehiculo, (array_agg(vl.capacidad_paquetes ORDER BY vl.fila))[1], 'activa'
+        FROM validos vl
+        WHERE NOT EXISTS (
+            SELECT 1 FROM asignaciones a
+            WHERE a.id_repartidor = vl.id_repartidor AND a.id_vehiculo = vl.id_vehiculo AND a.estado = 'activa'
+        )
+        GROUP BY vl.id_repartidor, vl.id_vehiculo
+        RETURNING id_repartidor, id_vehiculo
+    ),
+    reservados AS (
+        INSERT INTO numeros_pedido (numero_pedido)
+        SELECT numero_pedido FROM validos
+        ON CONFLICT (numero_pedido) DO NOTHING
+        RETURNING numero_pedido
+    ),
+    nuevos AS (
+        INSERT INTO pedidos
+        (numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes, destino_entrega, estado)
+        SELECT vl.numero_pedido, vl.id_vehiculo, vl.id_repartidor, vl.capacidad_paquetes, vl.destino_entrega, vl.estado
+        FROM validos vl
+        JOIN reservados r ON r.numero_pedido = vl.numero_pedido
+        ORDER BY vl.fila
+        RETURNING numero_pedido, estado, capacidad_paquetes
+    ),
+    conteo AS (
+        INSERT INTO contadores (clave, valor, actualizado)
+        SELECT d.clave, SUM(d.delta), CURRENT_TIMESTAMP
+        FROM (
+            SELECT CAST(:prefijo_estado AS varchar) || estado AS clave, COUNT(*) AS delta
+            FROM nuevos GROUP BY estado
+            UNION ALL
+            SELECT CAST(:clave_paquetes AS varchar), COALESCE(SUM(capacidad_paquetes), 0) FROM nuevos
+            UNION ALL
+            SELECT CAST(:clave_asignaciones AS varchar), COUNT(*) FROM nuevas_asig
+            UNION ALL
+            SELECT CAST(:clave_repartidores AS varchar), COUNT(DISTINCT n.id_repartidor)
+            FROM nuevas_asig n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM asignaciones a WHERE a.id_repartidor = n.id_repartidor AND a.estado = 'activa'
+            )
+            UNION ALL
+            SELECT CAST(:clave_vehiculos AS varchar), COUNT(DISTINCT n.id_vehiculo)
+            FROM nuevas_asig n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM asignaciones a WHERE a.id_vehiculo = n.id_vehiculo AND a.estado = 'activa'
+            )
+        ) AS d
+        WHERE d.delta <> 0
+        GROUP BY d.clave
+        ON CONFLICT (clave) DO UPDATE
+        SET valor = contadores.valor + EXCLUDED.valor,
+            actualizado = CURRENT_TIMESTAMP
+    )
+    SELECT
+        NULL::integer AS fila,
+        NULL::text AS error,
+        (SELECT COUNT(*) FROM nuevos) AS insertados,
+        (SELECT COUNT(*) FROM nuevas_asig) AS asignaciones_creadas
+    UNION ALL
+    SELECT v.fila, COALESCE(v.error, 'Ya existe un pedido con ese número'), NULL, NULL
+    FROM validados v
+    WHERE v.error IS NOT NULL
+       OR NOT EXISTS (SELECT 1 FROM nuevos n WHERE n.numero_pedido = v.numero_pedido)
+""", {
+    "estados": ARRAY(String), "prefijo_estado": String, "clave_paquetes": String,
+    "clave_asignaciones": String, "clave_repartidores": String, "clave_vehiculos": String
+}, {"fila": Integer, "error": Text, "insertados": Integer, "asignaciones_creadas": Integer})
+
+# Un renglón por pedido: el repartidor se guarda en el pedido
+PEDIDOS_LISTADO = Listado("""
+    SELECT
+        p.id,
+        p.numero_pedido,
+        p.id_vehiculo,
+        p.capacidad_paquetes,
+        p.destino_entrega,
+        p.estado,
+        p.fecha_creacion,
+        p.fecha_asignacion,
+        p.fecha_entrega_estimada,
+        p.id_repartidor as repartidor_id,
+        u.nombre_completo as repartidor_nombre,
+        v.modelo as vehiculo_modelo,
+        v.tipo as vehiculo_tipo
+    FROM pedidos p
+    JOIN vehiculos v ON p.id_vehiculo = v.id
+    LEFT JOIN usuarios u ON p.id_repartidor = u.id
+    WHERE 1=1
+""", {
+    "estado": "p.estado = :estado",
+    "repartidor_id": "p.id_repartidor = :repartidor_id",
+    "id_vehiculo": "p.id_vehiculo = :id_vehiculo",
+    "desde": "p.fecha_creacion >= :desde",
+    "hasta": "p.fecha_creacion < :hasta",
+}, "p.fecha_creacion", "p.id", {
+    "estado": String, "repartidor_id": Integer, "id_vehiculo": Integer, "desde": FECHA, "hasta": FECHA
+}, {"id": Integer, "fecha_creacion": FECHA, "fecha_asignacion": FECHA, "fecha_entrega_estimada": FECHA})
+
+REPARTIDORES_CON_ASIGNACION = _sentencia("""
+    SELECT
+        u.id,
+        u.nombre_completo,
+        u.email,
+        u.telefono,
+        v.id as vehiculo_id,
+        v.modelo as vehiculo_modelo,
+        v.tipo as vehiculo_tipo,
+        a.id as asignacion_id,
+        a.estado as asignacion_estado
+    FROM usuarios u
+    LEFT JOIN asignaciones a ON u.id = a.id_repartidor AND a.estado = 'activa'
+    LEFT JOIN vehiculos v ON a.id_vehiculo = v.id
+    WHERE u.rol = 'repartidor' AND u.activo = TRUE
+    ORDER BY u.nombre_completo
+""", columnas={"id": Integer, "vehiculo_id": Integer, "asignacion_id": Integer})
+
+VEHICULOS_ACTIVOS = _sentencia("""
+    SELECT
+        id,
+        modelo,
+        tipo,
+        capacidad_maxima_paquetes,
+        velocidad_promedio_kmh,
+        rendimiento_gasolina,
+        rendimiento_electrico,
+        activo
+    FROM vehiculos
+    WHERE activo = TRUE
+    ORDER BY modelo
+""", columnas={"id": Integer, "capacidad_maxima_paquetes": Integer, "velocidad_promedio_kmh": Numeric})
+
+PEDIDO_ESTADO = _sentencia(
+    "SELECT id, estado, fecha_creacion FROM pedidos WHERE id = :id",
+    {"id": Integer}, {"id": Integer, "fecha_creacion": FECHA}
+)
+
+# Con la fecha (columna de partición) el UPDATE va directo a la partición del pedido
+PEDIDO_ACTUALIZAR_ESTADO = _sentencia("""
+    UPDATE pedidos
+    SET estado = :estado,
+        fecha_asignacion = CASE
+            WHEN :estado = 'en_ruta' AND fecha_asignacion IS NULL
+            THEN CURRENT_TIMESTAMP
+            ELSE fecha_asignacion
+        END,
+        fecha_entrega_estimada = CASE
+            WHEN :estado = 'en_ruta' AND fecha_entrega_estimada IS NULL
+            THEN CURRENT_TIMESTAMP + INTERVAL '2 hours'
+            ELSE fecha_entrega_estimada
+        END,
+        fecha_entrega_real = CASE
+            WHEN :estado = 'entregado'
+            THEN CURRENT_TIMESTAMP
+            ELSE fecha_entrega_real
+        END
+    WHERE id = :id AND fecha_creacion = :fecha_creacion
+    RETURNING id, numero_pedido, estado
+""", {"estado": String, "id": Integer, "fecha_creacion": FECHA}, {"id": Integer})
+
+PEDIDO_PARA_ELIMINAR = _sentencia("""
+    SELECT id, numero_pedido, estado, capacidad_paquetes, fecha_creacion
+    FROM pedidos
+    WHERE id = :id
+""", {"id": Integer}, {"id": Integer, "capacidad_paquetes": Integer, "fecha_creacion": FECHA})
+
+# Elimina el pedido, libera su número y suelta las rutas que lo referencian
+# (rutas_asignadas.id_pedido ya no tiene FOREIGN KEY con ON DELETE SET NULL)
+PEDIDO_ELIMINAR = _sentencia("""
+    WITH borrado AS (
+        DELETE FROM pedidos
+        WHERE id = :id AND fecha_creacion = :fecha_creacion
+        RETURNING id, numero_pedido
+    ),
+    numero AS (
+        DELETE FROM numeros_pedido n
+        USING borrado b
+        WHERE n.numero_pedido = b.numero_pedido
+    )
+    UPDATE rutas_asignadas r
+    SET id_pedido = NULL
+    FROM borrado b
+    WHERE r.id_pedido = b.id
+""", {"id": Integer, "fecha_creacion": FECHA})
+
+# ============================================
+# VEHÍCULOS Y ASIGNACIONES
+# ============================================
+
+VEHICULO_CREAR = _sentencia("""
+    INSERT INTO vehiculos
+    (modelo, tipo, capacidad_maxima_paquetes, velocidad_promedio_kmh,
+     hora_envio, rendimiento_gasolina, rendimiento_electrico,
+     precio_gasolina, precio_kwh)
+    VALUES (:modelo, :tipo, :capacidad, :velocidad, :hora_envio,
+            :rend_gas, :rend_elec, :precio_gas, :precio_kwh)
+    RETURNING id, modelo, tipo, capacidad_maxima_paquetes,
+             velocidad_promedio_kmh, activo, fecha_creacion
+""", {
+    "modelo": String, "tipo": String, "capacidad": Integer, "velocidad": Numeric, "hora_envio": Time,
+    "rend_gas": Numeric, "rend_elec": Numeric, "precio_gas": Numeric, "precio_kwh": Numeric
+}, {"id": Integer, "capacidad_maxima_paquetes": Integer, "velocidad_promedio_kmh": Numeric,
+    "activo": Boolean, "fecha_creacion": FECHA})
+
+VEHICULOS_LISTADO = Listado("""
+    SELECT
+        v.id, v.modelo, v.tipo, v.capacidad_maxima_paquetes,
+        v.velocidad_promedio_kmh, v.activo, v.fecha_creacion,
+        CASE
+            WHEN a.id IS NOT NULL THEN 'asignado'
+            ELSE 'disponible'
+        END as estado,
+        u.nombre_completo as asignado_a
+    FROM vehiculos v
+    LEFT JOIN LATERAL (
+        SELECT id, id_repartidor FROM asignaciones
+        WHERE id_vehiculo = v.id AND estado = 'activa'
+        ORDER BY fecha_asignacion DESC
+        LIMIT 1
+    ) a ON TRUE
+    LEFT JOIN usuarios u ON a.id_repartidor = u.id
+    WHERE v.activo = TRUE
+""", {
+    "disponibles_solo": "a.id IS NULL",
+    "tipo": "v.tipo = :tipo",
+}, "v.fecha_creacion", "v.id", {"tipo": String}, {
+    "id": Integer, "capacidad_maxima_paquetes": Integer, "velocidad_promedio_kmh": Numeric,
+    "activo": Boolean, "fecha_creacion": FECHA
+})
+
+VEHICULO_DETALLE = _sentencia("""
+    SELECT
+        v.id, v.modelo, v.tipo, v.capacidad_maxima_paquetes,
+        v.velocidad_promedio_kmh, v.activo, v.fecha_creacion,
+        CASE
+            WHEN a.id IS NOT NULL THEN 'asignado'
+            ELSE 'disponible'
+        END as estado,
+        u.nombre_completo as asignado_a
+    FROM vehiculos v
+    LEFT JOIN asignaciones a ON v.id = a.id_vehiculo AND a.estado = 'activa'
+    LEFT JOIN usuarios u ON a.id_repartidor = u.id
+    WHERE v.id = :vehiculo_id AND v.activo = TRUE
+""", {"vehiculo_id": Integer}, {
+    "id": Integer, "capacidad_maxima_paquetes": Integer, "velocidad_promedio_kmh": Numeric,
+    "activo": Boolean, "fecha_creacion": FECHA
+})
+
+REPARTIDOR_ACTIVO = _sentencia(
+    "SELECT id, nombre_completo FROM usuarios WHERE id = :id AND rol = 'repartidor' AND activo = TRUE",
+    {"id": Integer}, {"id": Integer}
+)
+
+VEHICULO_DISPONIBLE = _sentencia("""
+    SELECT v.id, v.modelo, v.capacidad_maxima_paquetes
+    FROM vehiculos v
+    LEFT JOIN asignaciones a ON v.id = a.id_vehiculo AND a.estado = 'activa'
+    WHERE v.id = :id AND v.activo = TRUE AND a.id IS NULL
+""", {"id": Integer}, {"id": Integer, "capacidad_maxima_paquetes": Integer})
+
+ASIGNACION_CREAR = _sentencia("""
+    INSERT INTO asignaciones
+    (id_repartidor, id_vehiculo, numero_paquetes, ruta_municipio, estado)
+    VALUES (:id_rep, :id_veh, :num_paq, :ruta, 'activa')
+    RETURNING id, id_repartidor, id_vehiculo, numero_paquetes,
+             ruta_municipio, estado, fecha_asignacion
+""", {"id_rep": Integer, "id_veh": Integer, "num_paq": Integer, "ruta": Text}, {
+    "id": Integer, "id_repartidor": Integer, "id_vehiculo": Integer, "numero_paquetes": Integer,
+    "fecha_asignacion": FECHA
+})
+
+ASIGNACIONES_LISTADO = Listado("""
+    SELECT
+        a.id, a.id_repartidor, a.id_vehiculo, a.numero_paquetes,
+        a.ruta_municipio, a.estado, a.fecha_asignacion,
+        u.nombre_completo as repartidor_nombre,
+        v.modelo as vehiculo_modelo
+    FROM asignaciones a
+    JOIN usuarios u ON a.id_repartidor = u.id
+    JOIN vehiculos v ON a.id_vehiculo = v.id
+    WHERE 1=1
+""", {
+    "activas_solo": "a.estado = 'activa'",
+    "id_repartidor": "a.id_repartidor = :id_repartidor",
+    "id_vehiculo": "a.id_vehiculo = :id_vehiculo",
+}, "a.fecha_asignacion", "a.id", {"id_repartidor": Integer, "id_vehiculo": Integer}, {
+    "id": Integer, "id_repartidor": Integer, "id_vehiculo": Integer, "numero_paquetes": Integer,
+    "fecha_asignacion": FECHA
+})
+
+ASIGNACION_ACTIVA = _sentencia("""
+    SELECT a.id, a.id_repartidor, a.id_vehiculo, u.nombre_completo, v.modelo
+    FROM asignaciones a
+    JOIN usuarios u ON a.id_repartidor = u.id
+    JOIN vehiculos v ON a.id_vehiculo = v.id
+    WHERE a.id = :id AND a.estado = 'activa'
+""", {"id": Integer}, {"id": Integer, "id_repartidor": Integer, "id_vehiculo": Integer})
+
+ASIGNACION_LIBERAR = _sentencia("""
+    UPDATE asignaciones
+    SET estado = 'completada', fecha_fin = CURRENT_TIMESTAMP
+    WHERE id = :id
+""", {"id": Integer})
+
+# ============================================
+# GESTIÓN DE RUTAS
+# ============================================
+
+ASIGNACIONES_PENDIENTES = Listado("""
+    SELECT
+        a.id as asignacion_id,
+        a.numero_paquetes,
+        a.ruta_municipio as destino,
+        a.fecha_asignacion,
+        u.id as repartidor_id,
+        u.nombre_completo as repartidor_nombre,
+        v.id as vehiculo_id,
+        v.modelo as vehiculo_modelo,
+        v.tipo as vehiculo_tipo
+    FROM asignaciones a
+    INNER JOIN usuarios u ON a.id_repartidor = u.id
+    INNER JOIN vehiculos v ON a.id_vehiculo = v.id
+    WHERE a.estado = 'activa'
+        AND NOT EXISTS (
+            SELECT 1 FROM rutas_asignadas r
+            WHERE r.id_asignacion = a.id AND r.activa = TRUE
+              AND r.fecha_calculo >= a.fecha_asignacion  -- una ruta siempre es posterior a su asignación
+        )
+""", {
+    "id_repartidor": "a.id_repartidor = :id_repartidor",
+}, "a.fecha_asignacion", "a.id", {"id_repartidor": Integer}, {
+    "asignacion_id": Integer, "numero_paquetes": Integer, "fecha_asignacion": FECHA,
+    "repartidor_id": Integer, "vehiculo_id": Integer
+})
+
+ASIGNACION_PARA_RUTA = _sentencia("""
+    SELECT a.id, a.ruta_municipio, a.id_vehiculo, v.tipo as vehiculo_tipo
+    FROM asignaciones a
+    INNER JOIN vehiculos v ON a.id_vehiculo = v.id
+    WHERE a.id = :asignacion_id AND a.estado = 'activa'
+""", {"asignacion_id": Integer}, {"id": Integer, "id_vehiculo": Integer})
+
+RUTA_ASIGNADA_CREAR = _sentencia("""
+    INSERT INTO rutas_asignadas (
+        id_asignacion, origen_direccion, destino_direccion,
+        distancia_km, tiempo_min, hash_cuerpo, id_ruta_compartida,
+        vehiculo_tipo, consumo_data, costo_total, emisiones_co2_kg, activa
+    ) VALUES (
+        :asig_id, :origen, :destino,
+        :dist, :tiempo, :hash_cuerpo, :id_compartida,
+        :v_tipo, CAST(:consumo AS jsonb), :costo, :emisiones, TRUE
+    )
+    RETURNING id
+""", {
+    "asig_id": Integer, "origen": Text, "destino": Text, "dist": Float, "tiempo": Float,
+    "hash_cuerpo": String, "id_compartida": Integer, "v_tipo": String,
+    "consumo": Text, "costo": Float, "emisiones": Float
+}, {"id": Integer})
+
+RUTAS_CALCULADAS = Listado("""
+    SELECT
+        r.id as ruta_id,
+        r.origen_direccion,
+        r.destino_direccion,
+        r.distancia_km,
+        r.tiempo_min,
+        r.costo_total,
+        r.emisiones_co2_kg,
+        r.fecha_calculo,
+        a.id as asignacion_id,
+        a.numero_paquetes,
+        u.id as repartidor_id,
+        u.nombre_completo as repartidor_nombre,
+        v.modelo as vehiculo_modelo,
+        v.tipo as vehiculo_tipo
+    FROM rutas_asignadas r
+    INNER JOIN asignaciones a ON r.id_asignacion = a.id
+    INNER JOIN usuarios u ON a.id_repartidor = u.id
+    INNER JOIN vehiculos v ON a.id_vehiculo = v.id
+    WHERE r.activa = TRUE
+""", {
+    "id_repartidor": "a.id_repartidor = :id_repartidor",
+    "vehiculo_tipo": "r.vehiculo_tipo = :vehiculo_tipo",
+}, "r.fecha_calculo", "r.id", {"id_repartidor": Integer, "vehiculo_tipo": String}, {
+    "ruta_id": Integer, "distancia_km": Numeric, "tiempo_min": Numeric, "costo_total": Numeric,
+    "emisiones_co2_kg": Numeric, "fecha_calculo": FECHA, "asignacion_id": Integer,
+    "numero_paquetes": Integer, "repartidor_id": Integer
+})
+
+RUTA_DESACTIVAR = _sentencia("""
+    UPDATE rutas_asignadas
+    SET activa = FALSE
+    WHERE id = :ruta_id
+    RETURNING id
+""", {"ruta_id": Integer}, {"id": Integer})
+
+RUTA_PARA_RECALCULAR = _sentencia("""
+    SELECT r.origen_direccion, r.destino_direccion, r.vehiculo_tipo, r.fecha_calculo, a.id_vehiculo
+    FROM rutas_asignadas r
+    INNER JOIN asignaciones a ON r.id_asignacion = a.id
+    WHERE r.id = :ruta_id AND r.activa = TRUE
+""", {"ruta_id": Integer}, {"fecha_calculo": FECHA, "id_vehiculo": Integer})
+
+RUTA_RECALCULAR = _sentencia("""
+    UPDATE rutas_asignadas
+    SET
+        distancia_km = :distancia,
+        tiempo_min = :tiempo,
+        hash_cuerpo = :hash_cuerpo,
+        id_ruta_compartida = :id_compartida,
+        consumo_data = CAST(:consumo AS jsonb),
+        costo_total = :costo,
+        emisiones_co2_kg = :emisiones,
+        fecha_calculo = CURRENT_TIMESTAMP
+    WHERE id = :ruta_id AND fecha_calculo = :fecha_anterior
+""", {
+    "ruta_id": Integer, "fecha_anterior": FECHA, "distancia": Float, "tiempo": Float,
+    "hash_cuerpo": String, "id_compartida": Integer, "consumo": Text, "costo": Float, "emisiones": Float
+})
+
+# ============================================
+# RUTA DEL REPARTIDOR (ruta_router, sesión síncrona)
+# ============================================
+
+RUTA_DEL_REPARTIDOR = _sentencia("""
+    SELECT
+        -- Datos del repartidor
+        u.id as repartidor_id,
+        u.nombre_completo as repartidor_nombre,
+        u.telefono as repartidor_telefono,
+
+        -- Datos de la asignación
+        a.id as asignacion_id,
+        a.numero_paquetes,
+        a.ruta_municipio,
+        a.estado as asignacion_estado,
+        a.fecha_asignacion,
+
+        -- Datos del vehículo
+        v.id as vehiculo_id,
+        v.modelo as vehiculo_modelo,
+        v.tipo as vehiculo_tipo,
+        v.capacidad_maxima_paquetes,
+        v.velocidad_promedio_kmh,
+        v.hora_envio,
+
+        -- Datos de la ruta
+        r.id as ruta_id,
+        r.origen_direccion,
+        r.destino_direccion,
+        r.distancia_km,
+        r.tiempo_min,
+        r.hash_cuerpo,
+        r.consumo_data,
+        r.costo_total,
+        r.emisiones_co2_kg,
+        r.fecha_calculo
+
+    FROM usuarios u
+    INNER JOIN asignaciones a ON u.id = a.id_repartidor
+    INNER JOIN vehiculos v ON a.id_vehiculo = v.id
+    LEFT JOIN rutas_asignadas r ON a.id = r.id_asignacion AND r.activa = TRUE
+        AND r.fecha_calculo >= a.fecha_asignacion  -- descarta particiones anteriores a la asignación
+
+    WHERE u.id = :id_repartidor
+        AND u.rol = 'repartidor'
+        AND u.activo = TRUE
+        AND a.estado = 'activa'
+
+    ORDER BY a.fecha_asignacion DESC
+    LIMIT 1
+""", {"id_repartidor": Integer}, {
+    "repartidor_id": Integer, "asignacion_id": Integer, "numero_paquetes": Integer,
+    "fecha_asignacion": FECHA, "vehiculo_id": Integer, "capacidad_maxima_paquetes": Integer,
+    "hora_envio": Time, "ruta_id": Integer, "fecha_calculo": FECHA
+})
+
+RUTA_ACTIVA_DEL_REPARTIDOR = _sentencia("""
+    SELECT r.id as ruta_id, r.tiempo_min
+    FROM asignaciones a
+    INNER JOIN rutas_asignadas r ON a.id = r.id_asignacion AND r.activa = TRUE
+        AND r.fecha_calculo >= a.fecha_asignacion
+    WHERE a.id_repartidor = :id_repartidor AND a.estado = 'activa'
+    ORDER BY a.fecha_asignacion DESC, r.fecha_calculo DESC
+    LIMIT 1
+""", {"id_repartidor": Integer}, {"ruta_id": Integer})
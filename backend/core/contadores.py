@@ -0,0 +1,142 @@
+# NOMBRE DEL ARCHIVO: contadores.py
+"""
+Contadores de estadísticas mantenidos de forma incremental en la tabla
+'contadores' (clave -> valor).
+
+Los endpoints que escriben pedidos, vehículos, asignaciones o usuarios
+ajustan los contadores DENTRO de su misma transacción, así que los
+dashboards leen unas cuantas filas en lugar de contar tablas completas.
+reconstruir_contadores() los recalcula desde cero (arranque / corrección).
+"""
+from sqlalchemy import text
+
+ESTADOS_PEDIDO = ["pendiente", "procesando", "en_ruta", "entregado", "cancelado"]
+
+# Claves
+PEDIDOS = "pedidos:{}"                                  # por estado
+PEDIDOS_PAQUETES = "pedidos_paquetes"                   # SUM(capacidad_paquetes)
+VEHICULOS_ACTIVOS = "vehiculos_activos"
+VEHICULOS_ASIGNADOS = "vehiculos_asignados"             # con al menos una asignación activa
+ASIGNACIONES_ACTIVAS = "asignaciones_activas"
+REPARTIDORES_ACTIVOS = "repartidores_activos"           # usuarios con rol repartidor activos
+REPARTIDORES_CON_ASIGNACION = "repartidores_con_asignacion"
+
+# Clases de pg_advisory_xact_lock(clase, id) de ajustar_asignacion (también las
+# toman /pedidos/crear e /importar, ver consultas.ASIGNACION_BLOQUEAR)
+BLOQUEO_REPARTIDOR = 7410101
+BLOQUEO_VEHICULO = 7410102
+
+
+def ajustar_contador(db, clave, delta):
+    """Suma delta al contador (lo crea si no existe). No hace commit."""
+    if not delta:
+        return
+    db.execute(text("""
+        INSERT INTO contadores (clave, valor, actualizado)
+        VALUES (:clave, :delta, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE
+        SET valor = contadores.valor + EXCLUDED.valor,
+            actualizado = CURRENT_TIMESTAMP
+    """), {"clave": clave, "delta": delta})
+
+
+def ajustar_pedido(db, estado_anterior=None, estado_nuevo=None, paquetes=0):
+    """Ajusta contadores al crear (solo nuevo), borrar (solo anterior) o cambiar estado"""
+    if estado_anterior == estado_nuevo:
+        return
+    if estado_anterior:
+        ajustar_contador(db, PEDIDOS.format(estado_anterior), -1)
+    if estado_nuevo:
+        ajustar_contador(db, PEDIDOS.format(estado_nuevo), 1)
+    if estado_anterior is None:
+        ajustar_contador(db, PEDIDOS_PAQUETES, paquetes or 0)
+    elif estado_nuevo is None:
+        ajustar_contador(db, PEDIDOS_PAQUETES, -(paquetes or 0))
+
+
+def ajustar_asignacion(db, id_repartidor, id_vehiculo, delta):
+    """
+    Llamar DESPUÉS de activar (delta=1) o cerrar (delta=-1) una asignación.
+    Además de asignaciones_activas, mantiene cuántos vehículos (activos) y
+    repartidores distintos tienen alguna asignación activa.
+    """
+    ajustar_contador(db, ASIGNACIONES_ACTIVAS, delta)
+
+    # Serializa a quienes cambian asignaciones del mismo repartidor/vehículo
+    # para que dos transacciones concurrentes no crean ambas ser la primera
+    # (o la última); no depende del orden en que se toca la fila de
+    # asignaciones_activas. En READ COMMITTED el conteo de abajo ya ve lo que
+    # confirmó la otra al soltar el candado.
+    db.execute(text("SELECT pg_advisory_xact_lock(:clase, :id)"), {"clase": BLOQUEO_REPARTIDOR, "id": id_repartidor})
+    db.execute(text("SELECT pg_advisory_xact_lock(:clase, :id)"), {"clase": BLOQUEO_VEHICULO, "id": id_vehiculo})
+
+    activas = db.execute(text("""
+        SELECT
+            (SELECT COUNT(*) FROM asignaciones
+             WHERE id_repartidor = :rep AND estado = 'activa') AS del_repartidor,
+            (SELECT COUNT(*) FROM asignaciones
+             WHERE id_vehiculo = :veh AND estado = 'activa') AS del_vehiculo,
+            COALESCE((SELECT activo FROM vehiculos WHERE id = :veh), FALSE) AS vehiculo_activo
+    """), {"rep": id_repartidor, "veh": id_vehiculo}).fetchone()
+
+    # Primera asignación activa (delta=1 -> quedó 1) o última (delta=-1 -> quedó 0)
+    limite = 1 if delta > 0 else 0
+    if activas.del_repartidor == limite:
+        ajustar_contador(db, REPARTIDORES_CON_ASIGNACION, delta)
+    # Igual que en reconstruir_contadores: solo cuentan los vehículos activos
+    if activas.vehiculo_activo and activas.del_vehiculo == limite:
+        ajustar_contador(db, VEHICULOS_ASIGNADOS, delta)
+
+
+def leer_contadores(db):
+    """Todos los contadores como dict (claves ausentes valen 0 vía .get)"""
+    filas = db.execute(text("SELECT clave, valor FROM contadores")).fetchall()
+    return {fila.clave: int(fila.valor) for fila in filas}
+
+
+# Los pedidos de particiones archivadas siguen contando en el dashboard
+_PEDIDOS_CON_ARCHIVO = """
+    SELECT id, estado, capacidad_paquetes FROM pedidos
+    UNION ALL
+    SELECT id, estado, capacidad_paquetes FROM archivo.pedidos
+"""
+
+
+def reconstruir_contadores(db):
+    """Recalcula todos los contadores desde las tablas base y hace commit"""
+    estados = ", ".join(f"('{estado}')" for estado in ESTADOS_PEDIDO)
+
+    db.execute(text("LOCK TABLE contadores IN EXCLUSIVE MODE"))
+    db.execute(text(f"""
+        INSERT INTO contadores (clave, valor, actualizado)
+        SELECT clave, valor, CURRENT_TIMESTAMP FROM (
+            SELECT 'pedidos:' || e.estado AS clave, COUNT(p.id) AS valor
+            FROM (VALUES {estados}) AS e(estado)
+            LEFT JOIN ({_PEDIDOS_CON_ARCHIVO}) p ON p.estado = e.estado
+            GROUP BY e.estado
+            UNION ALL
+            SELECT '{PEDIDOS_PAQUETES}', COALESCE(SUM(capacidad_paquetes), 0) FROM ({_PEDIDOS_CON_ARCHIVO}) p
+            UNION ALL
+            SELECT '{VEHICULOS_ACTIVOS}', COUNT(*) FROM vehiculos WHERE activo = TRUE
+            UNION ALL
+            SELECT '{VEHICULOS_ASIGNADOS}', COUNT(DISTINCT a.id_vehiculo)
+            FROM asignaciones a JOIN vehiculos v ON v.id = a.id_vehiculo
+            WHERE a.estado = 'activa' AND v.activo = TRUE
+            UNION ALL
+            SELECT '{ASIGNACIONES_ACTIVAS}', COUNT(*) FROM asignaciones WHERE estado = 'activa'
+            UNION ALL
+            SELECT '{REPARTIDORES_ACTIVOS}', COUNT(*) FROM usuarios
+            WHERE rol = 'repartidor' AND activo = TRUE
+            UNION ALL
+            SELECT '{REPARTIDORES_CON_ASIGNACION}', COUNT(DISTINCT id_repartidor)
+            FROM asignaciones WHERE estado = 'activa'
+        ) AS conteos
+        ON CONFLICT (clave) DO UPDATE
+        SET valor = EXCLUDED.valor,
+            actualizado = EXCLUDED.actualizado
+    """))
+    db.commit()
+
+    contadores = leer_contadores(db)
+    print(f"📊 Contadores reconstruidos: {len(contadores)} claves")
+    return contadores
@@ -0,0 +1,80 @@
+# NOMBRE DEL ARCHIVO: cuerpos_ruta.py
+"""
+Cuerpos de ruta (geometría + maniobras) guardados aparte en 'cuerpos_ruta',
+direccionados por el SHA-256 de su contenido.
+
+rutas_asignadas solo guarda el resumen (distancia, tiempo, costos) y el hash
+del cuerpo, así que los listados, los reportes y el VACUUM no arrastran
+JSON de varios KB por fila. El cuerpo se lee solo cuando hace falta dibujar
+o seguir la ruta, y dos rutas idénticas comparten un mismo cuerpo.
+
+El hash se calcula en PostgreSQL sobre el texto canónico de jsonb, así que
+no depende de cómo Python serialice el JSON.
+"""
+import json
+
+from sqlalchemy import text
+
+# Fragmento de WITH: guarda :cuerpo_json (si no existe) y expone cuerpo.hash
+CTE_CUERPO = """
+    cuerpo AS (
+        SELECT encode(sha256(convert_to(e.c::text, 'UTF8')), 'hex') AS hash,
+               e.c,
+               octet_length(e.c::text) AS bytes
+        FROM (SELECT CAST(:cuerpo_json AS jsonb) AS c) AS e
+    ),
+    cuerpo_guardado AS (
+        INSERT INTO cuerpos_ruta (hash, cuerpo, bytes)
+        SELECT hash, c, bytes FROM cuerpo
+        ON CONFLICT (hash) DO NOTHING
+    )
+"""
+
+# Los cuerpos sin rutas se borran solo si tienen cierta antigüedad, para no
+# competir con una ruta que lo esté referenciando en este momento
+ANTIGUEDAD_PURGA = "1 hour"
+
+
+def como_dict(valor):
+    """psycopg2 entrega jsonb como dict; asyncpg, como texto"""
+    if valor is None or isinstance(valor, dict):
+        return valor
+    return json.loads(valor)
+
+
+def leer_cuerpo(db, hash_cuerpo):
+    """Cuerpo (dict) por su hash, o None"""
+    fila = db.execute(
+        text("SELECT cuerpo FROM cuerpos_ruta WHERE hash = :hash"), {"hash": hash_cuerpo}
+    ).fetchone()
+    return como_dict(fila.cuerpo) if fila else None
+
+
+def cuerpo_de_ruta(db, ruta_id):
+    """Cuerpo (dict) de una ruta de rutas_asignadas, o None"""
+    fila = db.execute(text("""
+        SELECT c.cuerpo
+        FROM rutas_asignadas r
+        JOIN cuerpos_ruta c ON c.hash = r.hash_cuerpo
+        WHERE r.id = :ruta_id
+    """), {"ruta_id": ruta_id}).fetchone()
+    return como_dict(fila.cuerpo) if fila else None
+
+
+def purgar_cuerpos_huerfanos(db):
+    """
+    Borra los cuerpos que ya no usa ninguna ruta (p. ej. tras recalcular),
+    incluidas las de particiones archivadas, y hace commit
+    """
+    result = db.execute(text(f"""
+        DELETE FROM cuerpos_ruta c
+        WHERE c.fecha_creacion < CURRENT_TIMESTAMP - INTERVAL '{ANTIGUEDAD_PURGA}'
+          AND NOT EXISTS (SELECT 1 FROM rutas_asignadas r WHERE r.hash_cuerpo = c.hash)
+          AND NOT EXISTS (SELECT 1 FROM archivo.rutas_asignadas ra WHERE ra.hash_cuerpo = c.hash)
+          AND NOT EXISTS (SELECT 1 FROM rutas_compartidas rc WHERE rc.hash_cuerpo = c.hash)
+    """))
+    db.commit()
+
+    if result.rowcount:
+        print(f"🧹 Cuerpos de ruta sin usar eliminados: {result.rowcount}")
+    return result.rowcount
@@ -1,9 +1,132 @@
 # NOMBRE DEL ARCHIVO: dijkstra.py
 import requests
 import networkx as nx
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-def obtener_ruta_multiparada(api_key, lista_lugares, optimizar=True):
-    """Obtiene ruta optimizada para múltiples paradas"""
+from . import geometria as geo
+
+# Parámetros del corredor de tráfico
+CORREDOR_MARGEN_KM = 2.0      # Distancia máxima de un incidente a la ruta
+CORREDOR_TRAMO_KM = 25.0      # Longitud de cada tramo consultado a MapQuest
+CORREDOR_MAX_HILOS = 8        # Consultas simultáneas a la API de tráfico
+
+# Formato comprimido de la geometría que se pide a MapQuest, por precisión
+FORMATOS_SHAPE = {5: "cmp", 6: "cmp6"}
+
+class ResultadoRuta:
+    """
+    Resultado de obtener_ruta_multiparada guardado por columnas.
+    Las maniobras se guardan como arreglos (distancias, tiempos, puntos de
+    inicio) en lugar de la lista de dicts de MapQuest; las vistas que no
+    siempre se usan (instrucciones, orden, maniobras) se arman al pedirlas.
+    Es "falso" cuando MapQuest no devolvió ruta.
+    """
+
+    __slots__ = (
+        "narrativas", "distancias_km", "tiempos_seg", "inicios",
+        "geometria", "polyline", "precision", "bbox",
+        "distancia_total_km", "tiempo_total_min",
+        "_ubicaciones", "_orden", "_instrucciones", "_maniobras"
+    )
+
+    def __init__(self, narrativas=(), distancias_km=(), tiempos_seg=(), inicios=(),
+                 polyline="", precision=geo.PRECISION_POLYLINE, bbox=None, ubicaciones=()):
+        self.narrativas = list(narrativas)
+        self.distancias_km = np.asarray(distancias_km, dtype=np.float64)
+        self.tiempos_seg = np.asarray(tiempos_seg, dtype=np.float64)
+        self.inicios = np.asarray(inicios, dtype=np.float64).reshape(-1, 2)
+        self.polyline = polyline
+        self.precision = precision
+        self.geometria = geo.decodificar_polyline(polyline, precision)
+        self.bbox = bbox
+        self.distancia_total_km = float(self.distancias_km.sum())
+        self.tiempo_total_min = float(self.tiempos_seg.sum()) / 60
+        self._ubicaciones = ubicaciones
+        self._orden = None
+        self._instrucciones = None
+        self._maniobras = None
+
+    @classmethod
+    def desde_mapquest(cls, ruta, precision=geo.PRECISION_POLYLINE):
+        """Extrae las columnas de data["route"] en una sola pasada"""
+        mans = [man for leg in ruta["legs"] for man in leg["maneuvers"]]
+        n = len(mans)
+
+        narrativas = [man.get("narrative", "") for man in mans]
+        distancias = np.fromiter((man.get("distance", 0) for man in mans), dtype=np.float64, count=n)
+        tiempos = np.fromiter((man.get("time", 0) for man in mans), dtype=np.float64, count=n)
+        inicios = np.fromiter(
+            (c for man in mans for c in (man.get("startPoint", {}).get("lat", 0), man.get("startPoint", {}).get("lng", 0))),
+            dtype=np.float64, count=2 * n
+        )
+
+        caja = ruta["boundingBox"]
+        bbox = f"{caja['ul']['lat']},{caja['ul']['lng']},{caja['lr']['lat']},{caja['lr']['lng']}"
+
+        return cls(
+            narrativas, distancias, tiempos, inicios,
+            polyline=ruta.get("shape", {}).get("shapePoints", ""),
+            precision=precision,
+            bbox=bbox,
+            ubicaciones=ruta.get("locations", [])
+        )
+
+    def __bool__(self):
+        return len(self.narrativas) > 0
+
+    @property
+    def orden(self):
+        """Paradas en el orden optimizado: [{'dir': ..., 'pos': (lat, lng)}, ...]"""
+        if self._orden is None:
+            self._orden = [
+                {
+                    'dir': f"{loc.get('street','')}, {loc.get('adminArea5','')}",
+                    'pos': (loc['latLng']['lat'], loc['latLng']['lng'])
+                }
+                for loc in self._ubicaciones if 'latLng' in loc
+            ]
+        return self._orden
+
+    @property
+    def instrucciones(self):
+        """Tuplas (orden, narrativa, distancia_km, lat, lng) por maniobra"""
+        if self._instrucciones is None:
+            self._instrucciones = list(zip(
+                range(1, len(self.narrativas) + 1),
+                self.narrativas,
+                self.distancias_km.tolist(),
+                self.inicios[:, 0].tolist(),
+                self.inicios[:, 1].tolist()
+            ))
+        return self._instrucciones
+
+    @property
+    def maniobras(self):
+        """Maniobras compactas (formato de almacenamiento de geometria.empaquetar_ruta)"""
+        if self._maniobras is None:
+            self._maniobras = [
+                {"narrative": texto, "distance": dist, "time": seg, "startPoint": {"lat": lat, "lng": lng}}
+                for texto, dist, seg, (lat, lng) in zip(
+                    self.narrativas, self.distancias_km.tolist(),
+                    self.tiempos_seg.tolist(), self.inicios.tolist()
+                )
+            ]
+        return self._maniobras
+
+    def empaquetar(self):
+        """Payload para cuerpos_ruta.cuerpo (reutiliza la polyline recibida)"""
+        return geo.empaquetar_ruta(
+            self.geometria, self.maniobras, self.bbox,
+            polyline=self.polyline if self.precision == geo.PRECISION_POLYLINE else None
+        )
+
+
+def obtener_ruta_multiparada(api_key, lista_lugares, optimizar=True, precision=geo.PRECISION_POLYLINE):
+    """
+    Obtiene ruta optimizada para múltiples paradas.
+    Devuelve un ResultadoRuta (vacío si MapQuest no pudo trazarla).
+    """
     url = "http://www.mapquestapi.com/directions/v2/route"
     
     payload = {
@@ -16,7 +139,7 @@ def obtener_ruta_multiparada(api_key, lista_lugares, optimizar=True):
             "unit": "k",       
             "locale": "es_MX", 
             "routeOptimization": optimizar,
-            "shapeFormat": "raw", 
+            "shapeFormat": FORMATOS_SHAPE[precision], 
             "generalize": 0       
         }
     }
@@ -29,39 +152,12 @@ def obtener_ruta_multiparada(api_key, lista_lugares, optimizar=True):
             error_msg = data['info']['messages']
             print(f" Error de MapQuest: {error_msg} ")
             raise Exception(f"MapQuest no pudo trazar la ruta: {error_msg}")
-            
-        todas_maniobras = []
-        todos_puntos_shape = []
         
-        # 1. Maniobras
-        legs = data["route"]["legs"]
-        for leg in legs:
-            for man in leg["maneuvers"]:
-                todas_maniobras.append(man)
-        
-        # 2. Geometría
-        if "shape" in data["route"] and "shapePoints" in data["route"]["shape"]:
-            shape_raw = data["route"]["shape"]["shapePoints"]
-            todos_puntos_shape = list(zip(shape_raw[0::2], shape_raw[1::2]))
-        
-        # 3. Orden Optimizado
-        orden_optimizado = []
-        if "locations" in data["route"]:
-            for location in data["route"]["locations"]:
-                direccion = f"{location.get('street','')}, {location.get('adminArea5','')}"
-                if 'latLng' in location:
-                    latLng = (location['latLng']['lat'], location['latLng']['lng'])
-                    orden_optimizado.append({'dir': direccion, 'pos': latLng})
-        
-        # 4. BOUNDING BOX (Estándar para tráfico)
-        bbox = data["route"]["boundingBox"]
-        boundingBox_str = f"{bbox['ul']['lat']},{bbox['ul']['lng']},{bbox['lr']['lat']},{bbox['lr']['lng']}"
-        
-        return todas_maniobras, todos_puntos_shape, boundingBox_str, orden_optimizado
+        return ResultadoRuta.desde_mapquest(data["route"], precision)
     
     except Exception as e:
         print(f"Error crítico en Dijkstra: {e}")
-        return [], [], None, []
+        return ResultadoRuta()
 
 def obtener_incidencias_trafico(api_key, bounding_box_str):
     """Obtiene incidentes de tráfico."""
@@ -76,29 +172,74 @@ def obtener_incidencias_trafico(api_key, bounding_box_str):
     }
     
     try:
-        res = requests.get(url, params=params)
+        res = requests.get(url, params=params, timeout=15)
         return res.json().get("incidents", [])
     except Exception as e:
         print(f"Error obteniendo tráfico: {e}")
         return []
 
-def construir_grafo_logico(maniobras):
-    """Construye grafo lógico a partir de maniobras"""
+def obtener_incidencias_corredor(api_key, geometria, margen_km=CORREDOR_MARGEN_KM,
+                                 longitud_tramo_km=CORREDOR_TRAMO_KM):
+    """
+    Obtiene incidentes de tráfico SOLO a lo largo de la ruta.
+    
+    En lugar de un único boundingBox que en rutas largas cubre casi todo
+    el Estado de México, divide la geometría en tramos, consulta cada tramo
+    en paralelo, elimina duplicados por id y descarta los incidentes que
+    quedan a más de margen_km de la polilínea.
+    Cada incidente devuelto incluye 'distanciaRutaKm'.
+    """
+    if geometria is None or len(geometria) == 0:
+        return []
+    
+    lats, lngs = geo.a_arreglos(geometria)
+    tramos = geo.dividir_en_tramos(lats, lngs, longitud_tramo_km)
+    cajas = [
+        geo.bbox_con_margen(lats[ini:fin + 1], lngs[ini:fin + 1], margen_km)
+        for ini, fin in tramos
+    ]
+    
+    with ThreadPoolExecutor(max_workers=min(CORREDOR_MAX_HILOS, len(cajas))) as pool:
+        respuestas = list(pool.map(lambda caja: obtener_incidencias_trafico(api_key, caja), cajas))
+    
+    # Deduplicar por id, recordando qué tramos devolvieron cada incidente
+    incidentes = {}
+    tramos_por_incidente = {}
+    for idx_tramo, lista in enumerate(respuestas):
+        for inc in lista:
+            clave = inc.get('id') or (inc.get('lat'), inc.get('lng'), inc.get('type'))
+            incidentes.setdefault(clave, inc)
+            tramos_por_incidente.setdefault(clave, []).append(idx_tramo)
+    
+    # Filtrar al corredor: basta medir contra los tramos que lo devolvieron
+    en_corredor = []
+    for clave, inc in incidentes.items():
+        lat, lng = inc.get('lat'), inc.get('lng')
+        if lat is None or lng is None:
+            continue
+        distancia = min(
+            geo.distancia_a_polilinea_km(
+                lats[tramos[t][0]:tramos[t][1] + 1],
+                lngs[tramos[t][0]:tramos[t][1] + 1],
+                lat, lng
+            )
+            for t in tramos_por_incidente[clave]
+        )
+        if distancia <= margen_km:
+            inc['distanciaRutaKm'] = round(distancia, 3)
+            en_corredor.append(inc)
+    
+    return en_corredor
+
+def construir_grafo_logico(ruta):
+    """Construye grafo lógico a partir de las maniobras de un ResultadoRuta"""
     G = nx.DiGraph()
-    node_counter = 0
+    n = len(ruta.narrativas)
     
-    for i in range(len(maniobras)):
-        actual = maniobras[i]
-        pos_actual = (actual['startPoint']['lat'], actual['startPoint']['lng'])
-        desc = actual['narrative']
-        distancia = actual['distance']
-        
-        G.add_node(node_counter, pos=pos_actual, desc=desc)
-        
-        if i < len(maniobras) - 1:
-            G.add_edge(node_counter, node_counter + 1, weight=distancia)
-        
-        node_counter += 1
+    G.add_nodes_from(
+        (i, {"pos": (lat, lng), "desc": desc})
+        for i, (desc, (lat, lng)) in enumerate(zip(ruta.narrativas, ruta.inicios.tolist()))
+    )
+    G.add_weighted_edges_from(zip(range(n - 1), range(1, n), ruta.distancias_km[:n - 1].tolist()))
     
     return G
-
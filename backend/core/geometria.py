@@ -0,0 +1,192 @@
+# NOMBRE DEL ARCHIVO: geometria.py
+"""
+Utilidades geométricas vectorizadas para trabajar con la geometría de las rutas
+(listas de puntos lat/lng) sin recorrerlas punto por punto en Python.
+"""
+import numpy as np
+
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = np.pi * RADIO_TIERRA_KM / 180.0
+
+
+def a_arreglos(geometria):
+    """Convierte una geometría [(lat, lng), ...] en dos arreglos NumPy (lats, lngs)"""
+    puntos = np.asarray(geometria, dtype=np.float64).reshape(-1, 2)
+    return puntos[:, 0], puntos[:, 1]
+
+
+def proyectar_km(lats, lngs, lat_ref):
+    """
+    Proyección equirectangular local a kilómetros.
+    Suficientemente precisa para distancias cortas (corredores, desvíos de GPS).
+    """
+    cos_ref = np.cos(np.radians(lat_ref))
+    x = np.asarray(lngs, dtype=np.float64) * KM_POR_GRADO * cos_ref
+    y = np.asarray(lats, dtype=np.float64) * KM_POR_GRADO
+    return x, y
+
+
+def distancias_acumuladas_km(lats, lngs):
+    """Distancia acumulada (km) desde el primer punto hasta cada punto de la polilínea"""
+    if len(lats) == 0:
+        return np.zeros(0)
+    x, y = proyectar_km(lats, lngs, float(np.mean(lats)))
+    tramos = np.hypot(np.diff(x), np.diff(y))
+    return np.concatenate(([0.0], np.cumsum(tramos)))
+
+
+def dividir_en_tramos(lats, lngs, longitud_tramo_km):
+    """
+    Divide la polilínea en tramos consecutivos de ~longitud_tramo_km.
+    Devuelve una lista de (inicio, fin) con índices inclusivos que comparten
+    el punto de unión, para que ningún segmento quede fuera.
+    """
+    n = len(lats)
+    if n < 2:
+        return [(0, max(n - 1, 0))]
+
+    acumulada = distancias_acumuladas_km(lats, lngs)
+    cortes = np.searchsorted(
+        acumulada,
+        np.arange(longitud_tramo_km, acumulada[-1], longitud_tramo_km)
+    )
+    limites = np.unique(np.concatenate(([0], cortes, [n - 1])))
+    return [(int(a), int(b)) for a, b in zip(limites[:-1], limites[1:])]
+
+
+def bbox_con_margen(lats, lngs, margen_km):
+    """
+    Bounding box (formato MapQuest 'ul_lat,ul_lng,lr_lat,lr_lng') de un conjunto
+    de puntos, ampliado margen_km en todas direcciones.
+    """
+    lat_max, lat_min = float(np.max(lats)), float(np.min(lats))
+    lng_max, lng_min = float(np.max(lngs)), float(np.min(lngs))
+
+    margen_lat = margen_km / KM_POR_GRADO
+    margen_lng = margen_km / (KM_POR_GRADO * max(np.cos(np.radians((lat_max + lat_min) / 2)), 1e-6))
+
+    return f"{lat_max + margen_lat},{lng_min - margen_lng},{lat_min - margen_lat},{lng_max + margen_lng}"
+
+
+def distancia_a_polilinea_km(lats, lngs, lat, lng):
+    """
+    Distancia mínima (km) de un punto a la polilínea, contra SEGMENTOS
+    (no solo contra vértices), calculada en un solo paso vectorizado.
+    """
+    n = len(lats)
+    if n == 0:
+        return None
+
+    x, y = proyectar_km(lats, lngs, lat)
+    px, py = proyectar_km(lat, lng, lat)
+
+    if n == 1:
+        return float(np.hypot(x[0] - px, y[0] - py))
+
+    ax, ay = x[:-1], y[:-1]
+    dx, dy = x[1:] - ax, y[1:] - ay
+    largo2 = dx * dx + dy * dy
+    t = np.where(largo2 > 0, ((px - ax) * dx + (py - ay) * dy) / np.where(largo2 > 0, largo2, 1), 0.0)
+    t = np.clip(t, 0.0, 1.0)
+
+    return float(np.min(np.hypot(ax + t * dx - px, ay + t * dy - py)))
+
+
+# ==========================================================
+# POLYLINE CODIFICADA (algoritmo de Google, precisión 5 o 6)
+# ==========================================================
+
+PRECISION_POLYLINE = 6
+_MAX_BLOQUES = 7  # 7 bloques de 5 bits alcanzan para deltas de +-180° en E6
+
+
+def codificar_polyline(geometria, precision=PRECISION_POLYLINE):
+    """Codifica [(lat, lng), ...] como polyline (vectorizado, sin bucle por punto)"""
+    puntos = np.asarray(geometria, dtype=np.float64).reshape(-1, 2)
+    if len(puntos) == 0:
+        return ""
+
+    cuantizados = np.round(puntos * 10 ** precision).astype(np.int64)
+    deltas = np.diff(cuantizados, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    valores = (deltas << 1) ^ (deltas >> 63)  # zigzag: signo al bit menos significativo
+
+    desplazamientos = 5 * np.arange(_MAX_BLOQUES, dtype=np.int64)
+    bloques = (valores[:, None] >> desplazamientos) & 0x1F
+    n_bloques = 1 + np.sum(valores[:, None] >= (np.int64(1) << desplazamientos[1:]), axis=1)
+
+    usados = np.arange(_MAX_BLOQUES) < n_bloques[:, None]
+    continua = np.arange(_MAX_BLOQUES) < (n_bloques[:, None] - 1)
+    caracteres = (bloques | (continua * 0x20)) + 63
+
+    return caracteres[usados].astype(np.uint8).tobytes().decode("ascii")
+
+
+def decodificar_polyline(cadena, precision=PRECISION_POLYLINE):
+    """Decodifica una polyline directamente a un arreglo NumPy (n, 2) de [lat, lng]"""
+    if not cadena:
+        return np.zeros((0, 2))
+
+    b = np.frombuffer(cadena.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    fin = b < 0x20
+    inicios = np.flatnonzero(np.concatenate(([True], fin[:-1])))
+    grupo = np.cumsum(np.concatenate(([0], fin[:-1].astype(np.int64))))
+    posicion = np.arange(len(b)) - inicios[grupo]
+
+    valores = np.add.reduceat((b & 0x1F) << (5 * posicion), inicios)
+    deltas = (valores >> 1) ^ -(valores & 1)
+
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+
+
+# ==========================================================
+# FORMATO DE ALMACENAMIENTO DE RUTAS
+# ==========================================================
+
+CAMPOS_MANIOBRA = ("narrative", "distance", "time")
+
+
+def empaquetar_ruta(geometria, maniobras, bbox=None, polyline=None):
+    """
+    Formato compacto para cuerpos_ruta.cuerpo: geometría como
+    polyline y solo los campos de cada maniobra que usa la aplicación.
+    Si ya se tiene la polyline (precisión 6) se guarda tal cual.
+    """
+    compactas = []
+    for man in maniobras:
+        compacta = {campo: man.get(campo) for campo in CAMPOS_MANIOBRA}
+        punto = man.get("startPoint") or {}
+        compacta["startPoint"] = {"lat": punto.get("lat"), "lng": punto.get("lng")}
+        compactas.append(compacta)
+
+    return {
+        "formato": "polyline",
+        "precision": PRECISION_POLYLINE,
+        "polyline": polyline if polyline is not None else codificar_polyline(geometria, PRECISION_POLYLINE),
+        "maniobras": compactas,
+        "bbox": bbox
+    }
+
+
+def desempaquetar_ruta(ruta_data):
+    """
+    Lee cualquier formato de cuerpo de ruta guardado.
+    Devuelve (geometria como arreglo (n, 2), lista de maniobras).
+    """
+    # Formato compacto (polyline)
+    if ruta_data.get("formato") == "polyline":
+        geometria = decodificar_polyline(ruta_data.get("polyline", ""), ruta_data.get("precision", PRECISION_POLYLINE))
+        return geometria, ruta_data.get("maniobras", [])
+
+    # Formato anterior: lista de pares [lat, lng]
+    if "puntos" in ruta_data:
+        return np.asarray(ruta_data["puntos"], dtype=np.float64).reshape(-1, 2), ruta_data.get("maniobras", [])
+
+    # Respuesta cruda de MapQuest
+    maniobras = []
+    geometria = np.zeros((0, 2))
+    if "route" in ruta_data:
+        shape = ruta_data["route"].get("shape", {}).get("shapePoints", [])
+        geometria = np.asarray(shape, dtype=np.float64).reshape(-1, 2)
+        for leg in ruta_data["route"].get("legs", []):
+            maniobras.extend(leg.get("maneuvers", []))
+    return geometria, maniobras
@@ -0,0 +1,108 @@
+# NOMBRE DEL ARCHIVO: importacion.py
+"""
+Lectura de archivos de importación masiva de pedidos (CSV o NDJSON).
+
+Aquí solo se revisa la forma de cada fila (columnas presentes y tipos);
+las reglas que dependen de la BD (número repetido, repartidor activo,
+capacidad del vehículo) se validan en bloque con SQL después del COPY a
+la tabla temporal.
+"""
+import csv
+import io
+import json
+
+COLUMNAS = ("numero_pedido", "id_repartidor", "id_vehiculo", "capacidad_paquetes", "destino_entrega", "estado")
+OBLIGATORIAS = COLUMNAS[:-1]
+ENTERAS = ("id_repartidor", "id_vehiculo", "capacidad_paquetes")
+ESTADO_DEFECTO = "pendiente"
+
+LIMITE_FILAS = 200_000
+LONGITUD_NUMERO = 50      # pedidos.numero_pedido VARCHAR(50)
+MIN_ENTERO, MAX_ENTERO = -2**31, 2**31 - 1    # INTEGER de PostgreSQL
+
+
+def _entero(valor):
+    """
+    int de un valor CSV (texto) o NDJSON (número); ValueError si no es un
+    entero exacto dentro de INTEGER. true/false y 1.7 no se aceptan (int()
+    los convertiría en 1) y un valor fuera de rango haría fallar el COPY
+    de todo el archivo en lugar de solo esta fila.
+    """
+    if isinstance(valor, bool):
+        raise ValueError
+    if isinstance(valor, float):
+        if not valor.is_integer():
+            raise ValueError
+        valor = int(valor)
+    elif isinstance(valor, str):
+        valor = valor.strip()
+        if not valor.lstrip("+-").isdigit() or not valor.isascii():
+            raise ValueError
+        valor = int(valor)
+    elif not isinstance(valor, int):
+        raise ValueError
+    if not MIN_ENTERO <= valor <= MAX_ENTERO:
+        raise ValueError
+    return valor
+
+
+def _normalizar(fila, datos):
+    """Tupla (fila, *COLUMNAS) lista para COPY; ValueError con el motivo si no es válida"""
+    if not isinstance(datos, dict):
+        raise ValueError("La fila no es un objeto")
+
+    faltantes = [c for c in OBLIGATORIAS if datos.get(c) in (None, "")]
+    if faltantes:
+        raise ValueError(f"Faltan columnas: {', '.join(faltantes)}")
+
+    valores = {}
+    for columna in COLUMNAS:
+        valor = datos.get(columna)
+        if columna in ENTERAS:
+            try:
+                valor = _entero(valor)
+            except ValueError:
+                raise ValueError(f"'{columna}' debe ser un número entero (de {MIN_ENTERO} a {MAX_ENTERO})")
+        else:
+            valor = str(valor).strip() if valor not in (None, "") else None
+        valores[columna] = valor
+
+    if len(valores["numero_pedido"]) > LONGITUD_NUMERO:
+        raise ValueError(f"'numero_pedido' excede {LONGITUD_NUMERO} caracteres")
+    if valores["capacidad_paquetes"] <= 0:
+        raise ValueError("'capacidad_paquetes' debe ser mayor que 0")
+    valores["estado"] = valores["estado"] or ESTADO_DEFECTO
+
+    return (fila,) + tuple(valores[c] for c in COLUMNAS)
+
+
+def leer_filas(contenido, formato):
+    """
+    Convierte el archivo en (registros, errores):
+    - registros: tuplas (fila, numero_pedido, id_repartidor, ...) para COPY
+    - errores: [{"fila": n, "error": motivo}] de las filas mal formadas
+    La fila 1 es la primera de datos (sin contar el encabezado del CSV).
+    """
+    texto = contenido.decode("utf-8-sig") if isinstance(contenido, bytes) else contenido
+
+    if formato == "ndjson":
+        lineas = ((n, linea) for n, linea in enumerate(texto.splitlines(), start=1) if linea.strip())
+        filas = []
+        for n, linea in lineas:
+            try:
+                filas.append((n, json.loads(linea)))
+            except json.JSONDecodeError:
+                filas.append((n, None))
+    else:
+        filas = list(enumerate(csv.DictReader(io.StringIO(texto)), start=1))
+
+    if len(filas) > LIMITE_FILAS:
+        raise ValueError(f"El archivo excede {LIMITE_FILAS} filas")
+
+    registros, errores = [], []
+    for n, datos in filas:
+        try:
+            registros.append(_normalizar(n, datos))
+        except ValueError as e:
+            errores.append({"fila": n, "error": str(e) if datos is not None else "JSON no válido"})
+    return registros, errores
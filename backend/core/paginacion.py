@@ -0,0 +1,71 @@
+# NOMBRE DEL ARCHIVO: paginacion.py
+"""
+Paginación por cursor (keyset) para los listados.
+
+En lugar de OFFSET, cada página continúa justo después de la última fila
+de la anterior: WHERE (fecha, id) < (:cursor_fecha, :cursor_id) ORDER BY
+fecha DESC, id DESC. Con el índice (fecha DESC, id DESC) el costo de una
+página no depende de cuántas filas hay antes, así que los paneles que
+consultan cada 30 s responden igual con 1 mil o con 1 millón de filas.
+
+El cursor es opaco para el cliente: base64 de "fecha_iso|id".
+"""
+import base64
+import binascii
+from datetime import datetime
+
+LIMITE_DEFECTO = 100
+LIMITE_MAXIMO = 500
+
+ENCABEZADO = "X-Siguiente-Cursor"
+
+
+def codificar_cursor(fecha, id_fila):
+    valor = f"{fecha.isoformat()}|{id_fila}".encode("utf-8")
+    return base64.urlsafe_b64encode(valor).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """(fecha, id) del cursor; ValueError si no es válido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fecha, id_fila = base64.urlsafe_b64decode(cursor + relleno).decode("utf-8").split("|")
+        return datetime.fromisoformat(fecha), int(id_fila)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Cursor no válido")
+
+
+def filtro_keyset(cursor, columna_fecha, columna_id):
+    """
+    Condición SQL (para agregar con AND) y parámetros que continúan después
+    del cursor. Sin cursor devuelve ("", {}).
+    La condición simple sobre la fecha es redundante pero permite descartar
+    las particiones mensuales posteriores al cursor (la comparación de
+    filas no se usa para eso).
+    """
+    if not cursor:
+        return "", {}
+    fecha, id_fila = decodificar_cursor(cursor)
+    return (
+        f" AND {columna_fecha} <= :cursor_fecha"
+        f" AND ({columna_fecha}, {columna_id}) < (:cursor_fecha, :cursor_id)",
+        {"cursor_fecha": fecha, "cursor_id": id_fila}
+    )
+
+
+def orden_keyset(columna_fecha, columna_id):
+    """ORDER BY + LIMIT (se pide una fila de más para saber si hay otra página)"""
+    return f" ORDER BY {columna_fecha} DESC, {columna_id} DESC LIMIT :limite_pagina"
+
+
+def parametros_limite(limite):
+    return {"limite_pagina": limite + 1}
+
+
+def cortar_pagina(filas, limite, campo_fecha, campo_id):
+    """(filas de la página, cursor de la siguiente o None si es la última)"""
+    if len(filas) <= limite:
+        return filas, None
+    filas = filas[:limite]
+    ultima = filas[-1]
+    return filas, codificar_cursor(getattr(ultima, campo_fecha), getattr(ultima, campo_id))
@@ -0,0 +1,237 @@
+# NOMBRE DEL ARCHIVO: particiones.py
+"""
+Mantenimiento de las particiones mensuales de pedidos y rutas_asignadas.
+
+Las dos tablas están particionadas por mes en UTC (pedidos por
+fecha_creacion, rutas_asignadas por fecha_calculo) y tienen una partición
+DEFAULT de respaldo (migración 007). Cada pasada:
+- crea las particiones del mes actual y de los MESES_ADELANTE siguientes;
+- archiva las de más de RETENCION_MESES meses: las separa de la tabla
+  (DETACH) y las cuelga de archivo.pedidos / archivo.rutas_asignadas.
+  Una partición que todavía tiene filas vivas (pedidos sin entregar ni
+  cancelar, o rutas activas) se deja para la siguiente pasada.
+
+Así los endpoints solo recorren los meses recientes, y lo archivado sigue
+disponible consultando el esquema 'archivo'.
+"""
+import os
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from backend.API.database import SessionLocal
+
+ESQUEMA_ARCHIVO = "archivo"
+
+# tabla -> condición de fila viva (las particiones con alguna no se archivan)
+TABLAS = {
+    "pedidos": "estado IN ('pendiente', 'procesando', 'en_ruta')",
+    "rutas_asignadas": "activa",
+}
+PATRON_PARTICION = re.compile(r"^(pedidos|rutas_asignadas)_(\d{4})_(\d{2})$")
+
+RETENCION_MESES = int(os.getenv("PARTICIONES_RETENCION_MESES", "12"))
+MESES_ADELANTE = 3
+INTERVALO_HORAS = float(os.getenv("PARTICIONES_INTERVALO_HORAS", "24"))
+ESPERA_BLOQUEO = "5s"   # lock_timeout del DETACH: si hay consultas largas se reintenta en otra pasada
+
+
+def sumar_meses(mes, n):
+    """Primer día del mes que está n meses después (o antes) de `mes`"""
+    total = mes.year * 12 + mes.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def mes_actual():
+    hoy = datetime.now(timezone.utc)
+    return date(hoy.year, hoy.month, 1)
+
+
+def nombre_particion(tabla, mes):
+    return f"{tabla}_{mes:%Y_%m}"
+
+
+def _limites(mes):
+    """Límites FROM / TO de la partición del mes (mismos que crear_particion_mensual)"""
+    return f"{mes:%Y-%m-%d} 00:00:00+00", f"{sumar_meses(mes, 1):%Y-%m-%d} 00:00:00+00"
+
+
+def asegurar_particiones(db, meses_adelante=MESES_ADELANTE):
+    """Crea las particiones que falten del mes actual en adelante; devuelve sus nombres"""
+    creadas = []
+    inicio = mes_actual()
+    for tabla in TABLAS:
+        for n in range(meses_adelante + 1):
+            mes = sumar_meses(inicio, n)
+            try:
+                if db.execute(text("SELECT crear_particion_mensual(:tabla, :mes)"),
+                              {"tabla": tabla, "mes": mes}).scalar():
+                    creadas.append(nombre_particion(tabla, mes))
+                db.commit()
+            except Exception as e:
+                # Normalmente: la DEFAULT ya tiene filas de ese mes
+                db.rollback()
+                print(f"⚠️  No se pudo crear {nombre_particion(tabla, mes)}: {e}")
+
+    if creadas:
+        print(f"🗂️  Particiones creadas: {', '.join(creadas)}")
+    return creadas
+
+
+def listar_particiones(db):
+    """Particiones de las tablas activas y de las archivadas, con tamaño y filas estimadas"""
+    return db.execute(text("""
+        SELECT
+            n.nspname AS esquema,
+            padre.relname AS tabla,
+            hija.relname AS particion,
+            pg_get_expr(hija.relpartbound, hija.oid) AS limites,
+            CAST(GREATEST(hija.reltuples, 0) AS bigint) AS filas_estimadas,
+            pg_total_relation_size(hija.oid) AS bytes
+        FROM pg_inherits h
+        JOIN pg_class padre ON padre.oid = h.inhparent
+        JOIN pg_class hija ON hija.oid = h.inhrelid
+        JOIN pg_namespace n ON n.oid = padre.relnamespace
+        WHERE padre.relkind = 'p'
+          AND padre.relname = ANY(:tablas)
+          AND n.nspname IN (current_schema(), :archivo)
+        ORDER BY n.nspname, padre.relname, hija.relname
+    """), {"tablas": list(TABLAS), "archivo": ESQUEMA_ARCHIVO}).fetchall()
+
+
+def _adjuntar_al_archivo(db, tabla, particion, mes):
+    """ATTACH de una partición ya movida al esquema de archivo (revisa sus filas, fuera del lock de la tabla activa)"""
+    desde, hasta = _limites(mes)
+    try:
+        db.execute(text(f"""
+            ALTER TABLE {ESQUEMA_ARCHIVO}.{tabla}
+            ATTACH PARTITION {ESQUEMA_ARCHIVO}."{particion}"
+            FOR VALUES FROM ('{desde}') TO ('{hasta}')
+        """))
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️  {particion} quedó en '{ESQUEMA_ARCHIVO}' sin adjuntar: {e}")
+        return False
+
+
+def _archivar(db, tabla, particion, mes):
+    """
+    DETACH y cambio de esquema en una transacción corta (bloquea la tabla
+    activa solo mientras tanto); después el ATTACH al padre archivado.
+    """
+    db.commit()
+    try:
+        db.execute(text(f"SET LOCAL lock_timeout = '{ESPERA_BLOQUEO}'"))
+        db.execute(text(f'ALTER TABLE {tabla} DETACH PARTITION "{particion}"'))
+
+        # Se revisa ya separada (nadie puede escribirle) y con los índices parciales de estado/activa
+        if db.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{particion}" WHERE {TABLAS[tabla]})')).scalar():
+            db.rollback()
+            print(f"⏭️  {particion} todavía tiene filas vivas; se archivará en otra pasada")
+            return False
+
+        db.execute(text(f'ALTER TABLE "{particion}" SET SCHEMA {ESQUEMA_ARCHIVO}'))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️  No se pudo archivar {particion}: {e}")
+        return False
+
+    _adjuntar_al_archivo(db, tabla, particion, mes)
+    return True
+
+
+def _adjuntar_pendientes(db):
+    """Reintenta el ATTACH de las particiones archivadas que quedaron sueltas"""
+    sueltas = db.execute(text("""
+        SELECT c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :archivo AND c.relkind = 'r' AND NOT c.relispartition
+    """), {"archivo": ESQUEMA_ARCHIVO}).scalars().all()
+
+    for particion in sueltas:
+        coincidencia = PATRON_PARTICION.match(particion)
+        if coincidencia:
+            tabla, anio, mes = coincidencia.groups()
+            _adjuntar_al_archivo(db, tabla, particion, date(int(anio), int(mes), 1))
+
+
+def archivar_particiones(db, retencion_meses=RETENCION_MESES):
+    """Archiva las particiones mensuales anteriores a la retención; devuelve sus nombres"""
+    limite = sumar_meses(mes_actual(), -retencion_meses)
+    archivadas = []
+
+    for fila in listar_particiones(db):
+        coincidencia = PATRON_PARTICION.match(fila.particion)
+        if fila.esquema == ESQUEMA_ARCHIVO or not coincidencia:
+            continue   # ya archivada, o la DEFAULT
+        mes = date(int(coincidencia.group(2)), int(coincidencia.group(3)), 1)
+        if mes < limite and _archivar(db, fila.tabla, fila.particion, mes):
+            archivadas.append(fila.particion)
+
+    _adjuntar_pendientes(db)
+    db.commit()
+
+    if archivadas:
+        print(f"📦 Particiones archivadas: {', '.join(archivadas)}")
+    return archivadas
+
+
+def mantener_particiones(db):
+    """Una pasada completa: crear las próximas y archivar las viejas"""
+    asegurar_particiones(db)
+    return archivar_particiones(db)
+
+
+def estado_particiones():
+    """Particiones activas y archivadas (para /api/database/particiones)"""
+    with SessionLocal() as db:
+        filas = listar_particiones(db)
+        en_default = {
+            tabla: db.execute(text(f"SELECT COUNT(*) FROM {tabla}_default")).scalar()
+            for tabla in TABLAS
+        }
+
+    return {
+        "retencion_meses": RETENCION_MESES,
+        "filas_en_default": en_default,   # deberían ser 0: son filas fuera de los meses creados
+        "particiones": [
+            {
+                "esquema": f.esquema,
+                "tabla": f.tabla,
+                "particion": f.particion,
+                "limites": f.limites,
+                "filas_estimadas": f.filas_estimadas,
+                "bytes": f.bytes
+            }
+            for f in filas
+        ]
+    }
+
+
+_hilo = None
+
+
+def iniciar_mantenimiento_periodico():
+    """Hilo en segundo plano que mantiene las particiones cada INTERVALO_HORAS (una sola vez por proceso)"""
+    global _hilo
+    if INTERVALO_HORAS <= 0 or _hilo is not None:
+        return
+
+    def ciclo():
+        while True:
+            try:
+                with SessionLocal() as db:
+                    mantener_particiones(db)
+            except Exception as e:
+                print(f"⚠️  Error en el mantenimiento de particiones: {e}")
+            time.sleep(INTERVALO_HORAS * 3600)
+
+    _hilo = threading.Thread(target=ciclo, name="mantenimiento-particiones", daemon=True)
+    _hilo.start()
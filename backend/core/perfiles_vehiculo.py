@@ -0,0 +1,110 @@
+# NOMBRE DEL ARCHIVO: perfiles_vehiculo.py
+"""
+Caché en memoria de los parámetros de cada vehículo (rendimiento, precios,
+factores de emisión) que usan los cálculos de costo y emisiones.
+
+Se carga completa con UNA consulta la primera vez que se necesita y se
+descarta cuando los endpoints de vehículos/asignaciones escriben en la BD.
+"""
+import threading
+
+from sqlalchemy import text
+
+from backend.API.database import engine
+
+
+class PerfilVehiculo:
+    """Parámetros de un vehículo ya convertidos a float (mismos nombres que la tabla)"""
+
+    __slots__ = (
+        "id", "modelo", "tipo", "capacidad_maxima_paquetes", "velocidad_promedio_kmh",
+        "rendimiento_gasolina", "rendimiento_electrico", "precio_gasolina", "precio_kwh",
+        "factor_emisiones_gasolina", "factor_emisiones_electrico", "activo"
+    )
+
+    _NUMERICOS = (
+        "velocidad_promedio_kmh", "rendimiento_gasolina", "rendimiento_electrico",
+        "precio_gasolina", "precio_kwh", "factor_emisiones_gasolina", "factor_emisiones_electrico"
+    )
+
+    def __init__(self, fila):
+        self.id = fila.id
+        self.modelo = fila.modelo
+        self.tipo = (fila.tipo or "").lower()
+        self.capacidad_maxima_paquetes = fila.capacidad_maxima_paquetes
+        self.activo = bool(fila.activo)
+        for campo in self._NUMERICOS:
+            valor = getattr(fila, campo)
+            setattr(self, campo, None if valor is None else float(valor))
+
+
+_lock = threading.Lock()       # solo entre quienes cargan; invalidar no lo toma
+_perfiles = None    # id_vehiculo -> PerfilVehiculo
+_generacion = 0     # sube en cada invalidación
+
+
+def _cargar():
+    query = text("""
+        SELECT
+            id, modelo, tipo, capacidad_maxima_paquetes, velocidad_promedio_kmh,
+            rendimiento_gasolina, rendimiento_electrico,
+            precio_gasolina, precio_kwh,
+            factor_emisiones_gasolina, factor_emisiones_electrico,
+            activo
+        FROM vehiculos
+        ORDER BY id
+    """)
+    with engine.connect() as conn:
+        return {fila.id: PerfilVehiculo(fila) for fila in conn.execute(query)}
+
+
+def todos_los_perfiles():
+    """
+    Diccionario id_vehiculo -> PerfilVehiculo (se carga una sola vez).
+    Una carga que empezó antes de una invalidación se devuelve a quien la
+    pidió pero no se guarda.
+    """
+    global _perfiles
+    perfiles = _perfiles
+    if perfiles is None:
+        with _lock:
+            perfiles = _perfiles
+            if perfiles is None:
+                generacion = _generacion
+                perfiles = _cargar()
+                _perfiles = perfiles
+                # Se revisa DESPUÉS de guardar: invalidar sube la generación y
+                # luego limpia, así que si subió antes de esta revisión se
+                # limpia aquí y si no, su limpieza llega después de guardar
+                if generacion != _generacion:
+                    _perfiles = None
+                else:
+                    print(f"🚚 Perfiles de vehículo en caché: {len(perfiles)}")
+    return perfiles
+
+
+def obtener_perfil(id_vehiculo):
+    """Perfil de un vehículo (activo o no), o None si no existe"""
+    return todos_los_perfiles().get(id_vehiculo)
+
+
+def perfiles_activos():
+    """Perfiles de los vehículos activos, ordenados por id"""
+    return [p for p in todos_los_perfiles().values() if p.activo]
+
+
+def perfil_por_tipo(tipo):
+    """Primer vehículo activo del tipo indicado, o None"""
+    tipo = tipo.lower()
+    return next((p for p in perfiles_activos() if p.tipo == tipo), None)
+
+
+def invalidar_perfiles():
+    """
+    Descarta la caché (llamar después de escribir vehículos o asignaciones).
+    No toma _lock, que se retiene durante toda la consulta de una carga: se
+    puede llamar desde un handler async sin bloquear el event loop.
+    """
+    global _perfiles, _generacion
+    _generacion += 1
+    _perfiles = None
@@ -0,0 +1,147 @@
+# NOMBRE DEL ARCHIVO: rollups.py
+"""
+Acumulados de KPIs de rutas (rutas, distancia, tiempo, costo y emisiones)
+por hora y por día, para cada vehículo, tipo de vehículo y repartidor.
+
+Se mantienen en la tabla 'kpi_rollups' DENTRO de la misma transacción que
+guarda, recalcula o elimina una ruta, así que una consulta de un mes o un
+año lee unos cientos de filas en lugar de recorrer rutas_asignadas.
+Solo cuentan las rutas activas.
+"""
+from sqlalchemy import text
+
+DIMENSIONES = ("vehiculo", "tipo", "repartidor")
+
+# periodo de consulta -> (granularidad almacenada, unidad de date_trunc)
+PERIODOS = {
+    "hora": ("hora", "hour"),
+    "dia": ("dia", "day"),
+    "semana": ("dia", "week"),
+    "mes": ("dia", "month"),
+    "anio": ("dia", "year"),
+}
+
+# Cada ruta aporta una fila por granularidad x dimensión
+_FUENTE = """
+    FROM rutas_asignadas r
+    JOIN asignaciones a ON r.id_asignacion = a.id
+    CROSS JOIN (VALUES ('hora', 'hour'), ('dia', 'day')) AS g(granularidad, unidad)
+    CROSS JOIN LATERAL (VALUES
+        ('vehiculo', a.id_vehiculo::text),
+        ('tipo', r.vehiculo_tipo),
+        ('repartidor', a.id_repartidor::text)
+    ) AS d(dimension, clave)
+"""
+
+_CONFLICTO = """
+    ON CONFLICT (granularidad, dimension, clave, bucket) DO UPDATE
+    SET rutas = kpi_rollups.rutas + EXCLUDED.rutas,
+        distancia_km = kpi_rollups.distancia_km + EXCLUDED.distancia_km,
+        tiempo_min = kpi_rollups.tiempo_min + EXCLUDED.tiempo_min,
+        costo_total = kpi_rollups.costo_total + EXCLUDED.costo_total,
+        emisiones_co2_kg = kpi_rollups.emisiones_co2_kg + EXCLUDED.emisiones_co2_kg,
+        actualizado = CURRENT_TIMESTAMP
+"""
+
+
+def acumular_ruta(db, ruta_id, signo):
+    """
+    Suma (signo=1, después de guardar) o resta (signo=-1, ANTES de modificar
+    o desactivar) una ruta activa en sus acumulados. No hace commit.
+    """
+    tocados = db.execute(text(f"""
+        INSERT INTO kpi_rollups (
+            granularidad, bucket, dimension, clave,
+            rutas, distancia_km, tiempo_min, costo_total, emisiones_co2_kg, actualizado
+        )
+        SELECT
+            g.granularidad, date_trunc(g.unidad, r.fecha_calculo), d.dimension, d.clave,
+            s.signo,
+            s.signo * r.distancia_km,
+            s.signo * r.tiempo_min,
+            s.signo * COALESCE(r.costo_total, 0),
+            s.signo * COALESCE(r.emisiones_co2_kg, 0),
+            CURRENT_TIMESTAMP
+        {_FUENTE}
+        CROSS JOIN (SELECT CAST(:signo AS integer) AS signo) AS s
+        WHERE r.id = :ruta_id AND r.activa = TRUE
+        {_CONFLICTO}
+        RETURNING granularidad, dimension, clave, bucket, rutas
+    """), {"ruta_id": ruta_id, "signo": signo}).fetchall()
+
+    # Buckets de ESTA ruta que se quedaron sin rutas (a lo más uno por granularidad x dimensión)
+    for fila in tocados:
+        if fila.rutas <= 0:
+            db.execute(text("""
+                DELETE FROM kpi_rollups
+                WHERE granularidad = :granularidad AND dimension = :dimension
+                  AND clave = :clave AND bucket = :bucket AND rutas <= 0
+            """), {
+                "granularidad": fila.granularidad, "dimension": fila.dimension,
+                "clave": fila.clave, "bucket": fila.bucket
+            })
+
+
+def consultar_kpis(db, periodo, dimension, desde, hasta, clave=None):
+    """
+    Serie de KPIs agregados por periodo y clave en [desde, hasta).
+    'hora' lee los acumulados por hora; los demás periodos, los diarios.
+    """
+    granularidad, unidad = PERIODOS[periodo]
+
+    query_base = """
+        SELECT
+            date_trunc(:unidad, bucket) AS periodo,
+            clave,
+            SUM(rutas) AS rutas,
+            SUM(distancia_km) AS distancia_km,
+            SUM(tiempo_min) AS tiempo_min,
+            SUM(costo_total) AS costo_total,
+            SUM(emisiones_co2_kg) AS emisiones_co2_kg
+        FROM kpi_rollups
+        WHERE granularidad = :granularidad
+          AND dimension = :dimension
+          AND bucket >= :desde AND bucket < :hasta
+    """
+    params = {
+        "unidad": unidad, "granularidad": granularidad,
+        "dimension": dimension, "desde": desde, "hasta": hasta
+    }
+
+    if clave is not None:
+        query_base += " AND clave = :clave"
+        params["clave"] = str(clave)
+
+    query_base += " GROUP BY 1, 2 ORDER BY 1, 2"
+    return db.execute(text(query_base), params).fetchall()
+
+
+def hay_rollups(db):
+    return db.execute(text("SELECT EXISTS (SELECT 1 FROM kpi_rollups)")).scalar()
+
+
+def reconstruir_rollups(db):
+    """Recalcula todos los acumulados desde rutas_asignadas y hace commit"""
+    db.execute(text("LOCK TABLE kpi_rollups IN EXCLUSIVE MODE"))
+    db.execute(text("DELETE FROM kpi_rollups"))
+    result = db.execute(text(f"""
+        INSERT INTO kpi_rollups (
+            granularidad, bucket, dimension, clave,
+            rutas, distancia_km, tiempo_min, costo_total, emisiones_co2_kg, actualizado
+        )
+        SELECT
+            g.granularidad, date_trunc(g.unidad, r.fecha_calculo), d.dimension, d.clave,
+            COUNT(*),
+            SUM(r.distancia_km),
+            SUM(r.tiempo_min),
+            SUM(COALESCE(r.costo_total, 0)),
+            SUM(COALESCE(r.emisiones_co2_kg, 0)),
+            CURRENT_TIMESTAMP
+        {_FUENTE}
+        WHERE r.activa = TRUE
+        GROUP BY 1, 2, 3, 4
+    """))
+    db.commit()
+
+    print(f"📈 KPIs acumulados reconstruidos: {result.rowcount} filas")
+    return result.rowcount
@@ -0,0 +1,103 @@
+# NOMBRE DEL ARCHIVO: rutas_compartidas.py
+"""
+Rutas calculadas compartidas entre asignaciones.
+
+Muchas asignaciones van del mismo origen (ORIGEN_BASE) al mismo municipio.
+La primera que calcula la ruta en una época de tráfico guarda el resultado
+en 'rutas_compartidas' con la clave (origen, destino, opciones, época); las
+siguientes la reutilizan sin llamar a MapQuest y sin guardar otra copia de
+la geometría (el cuerpo vive una sola vez en cuerpos_ruta).
+
+La época cambia cada EPOCA_HORAS horas, así que el tráfico de ayer no se
+reutiliza hoy. Recalcular una ruta siempre consulta MapQuest y reemplaza la
+ruta compartida de la época actual.
+"""
+import hashlib
+import json
+import os
+import time
+
+from sqlalchemy import text
+
+from .cuerpos_ruta import CTE_CUERPO, como_dict
+
+EPOCA_HORAS = int(os.getenv("RUTAS_EPOCA_HORAS", "24"))
+EPOCAS_CONSERVADAS = 7    # rutas compartidas más viejas sin asignaciones se purgan
+
+
+def epoca_actual():
+    return int(time.time() // (EPOCA_HORAS * 3600))
+
+
+def _normalizar(direccion):
+    return " ".join(direccion.split()).casefold()
+
+
+def clave_ruta(origen, destino, opciones, epoca):
+    """SHA-256 de (origen, destino, opciones, época) con direcciones normalizadas"""
+    contenido = json.dumps(
+        [_normalizar(origen), _normalizar(destino), opciones, epoca],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def buscar_ruta(db, clave):
+    """
+    (id, distancia_km, tiempo_min, hash_cuerpo, cuerpo dict) o None.
+    Solo lee: no bloquea la fila, así que muchas asignaciones al mismo
+    destino pueden reutilizarla a la vez.
+    """
+    fila = db.execute(text("""
+        SELECT rc.id, rc.distancia_km, rc.tiempo_min, rc.hash_cuerpo, c.cuerpo
+        FROM rutas_compartidas rc
+        JOIN cuerpos_ruta c ON c.hash = rc.hash_cuerpo
+        WHERE rc.clave = :clave
+    """), {"clave": clave}).fetchone()
+    if not fila:
+        return None
+    return fila.id, float(fila.distancia_km), float(fila.tiempo_min), fila.hash_cuerpo, como_dict(fila.cuerpo)
+
+
+def guardar_ruta(db, clave, origen, destino, opciones, epoca, distancia_km, tiempo_min, cuerpo):
+    """
+    Guarda (o reemplaza) la ruta compartida y su cuerpo. Devuelve (id, hash_cuerpo).
+    No hace commit.
+    """
+    fila = db.execute(text(f"""
+        WITH {CTE_CUERPO}
+        INSERT INTO rutas_compartidas (
+            clave, origen, destino, opciones, epoca,
+            distancia_km, tiempo_min, hash_cuerpo, fecha_calculo
+        )
+        SELECT
+            :clave, :origen, :destino, CAST(:opciones AS jsonb), :epoca,
+            :distancia, :tiempo, cuerpo.hash, CURRENT_TIMESTAMP
+        FROM cuerpo
+        ON CONFLICT (clave) DO UPDATE
+        SET distancia_km = EXCLUDED.distancia_km,
+            tiempo_min = EXCLUDED.tiempo_min,
+            hash_cuerpo = EXCLUDED.hash_cuerpo,
+            fecha_calculo = CURRENT_TIMESTAMP
+        RETURNING id, hash_cuerpo
+    """), {
+        "clave": clave, "origen": origen, "destino": destino,
+        "opciones": json.dumps(opciones, sort_keys=True), "epoca": epoca,
+        "distancia": distancia_km, "tiempo": tiempo_min,
+        "cuerpo_json": json.dumps(cuerpo)
+    }).fetchone()
+    return fila.id, fila.hash_cuerpo
+
+
+def purgar_rutas_vencidas(db):
+    """Borra las rutas compartidas de épocas viejas que ya no usa ninguna asignación y hace commit"""
+    result = db.execute(text("""
+        DELETE FROM rutas_compartidas rc
+        WHERE rc.epoca < :epoca_minima
+          AND NOT EXISTS (SELECT 1 FROM rutas_asignadas r WHERE r.id_ruta_compartida = rc.id)
+    """), {"epoca_minima": epoca_actual() - EPOCAS_CONSERVADAS})
+    db.commit()
+
+    if result.rowcount:
+        print(f"🧹 Rutas compartidas vencidas eliminadas: {result.rowcount}")
+    return result.rowcount
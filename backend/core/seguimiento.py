@@ -0,0 +1,256 @@
+# NOMBRE DEL ARCHIVO: seguimiento.py
+"""
+Seguimiento en vivo del avance de un repartidor sobre su ruta asignada.
+
+La geometría de la ruta se preprocesa UNA vez (proyección a km, distancias
+acumuladas, índice de celdas por segmento y posición de cada maniobra) para
+que cada ping de GPS solo evalúe los pocos segmentos cercanos.
+"""
+import threading
+import time
+
+import numpy as np
+
+from . import geometria as geo
+from .simulacion import traducir_instruccion_ruta
+
+UMBRAL_FUERA_RUTA_KM = 0.15    # Más lejos que esto se considera fuera de ruta
+TAMANO_CELDA_KM = 0.5          # Debe ser >= UMBRAL_FUERA_RUTA_KM
+HOLGURA_RETROCESO_KM = 0.3     # Retroceso tolerado respecto al último ping
+VENTANA_AVANCE_KM = 3.0        # Avance máximo esperado entre pings consecutivos
+VIGENCIA_CACHE_SEG = 30        # Cada cuánto se revisa si cambió la ruta activa
+
+
+class SeguimientoRuta:
+    """Ruta preprocesada para map-matching de posiciones GPS"""
+
+    __slots__ = (
+        "ruta_id", "lats", "lngs", "lat_ref", "x", "y", "acumulada",
+        "total_km", "tiempo_total_min", "celdas",
+        "man_km", "man_min_acum", "man_texto"
+    )
+
+    def __init__(self, ruta_id, geometria, maniobras=None, tiempo_total_min=0):
+        self.ruta_id = ruta_id
+        self.lats, self.lngs = geo.a_arreglos(geometria)
+        if len(self.lats) < 2:
+            raise ValueError("La ruta necesita al menos 2 puntos para el seguimiento")
+
+        self.lat_ref = float(np.mean(self.lats))
+        self.x, self.y = geo.proyectar_km(self.lats, self.lngs, self.lat_ref)
+        self.acumulada = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(self.x), np.diff(self.y)))))
+        self.total_km = float(self.acumulada[-1])
+        self.tiempo_total_min = float(tiempo_total_min or 0)
+        self.celdas = self._indexar_segmentos()
+        self._ubicar_maniobras(maniobras or [])
+
+    # --------------------------------------------------
+    # PREPROCESAMIENTO
+    # --------------------------------------------------
+
+    def _indexar_segmentos(self):
+        """Índice de rejilla: celda (i, j) -> arreglo de segmentos que la tocan"""
+        cx = np.floor(self.x / TAMANO_CELDA_KM).astype(np.int64)
+        cy = np.floor(self.y / TAMANO_CELDA_KM).astype(np.int64)
+        x0, x1 = np.minimum(cx[:-1], cx[1:]), np.maximum(cx[:-1], cx[1:])
+        y0, y1 = np.minimum(cy[:-1], cy[1:]), np.maximum(cy[:-1], cy[1:])
+
+        # Casi todos los segmentos caen en una sola celda: se agrupan de golpe
+        simples = (x0 == x1) & (y0 == y1)
+        segs_simples = np.flatnonzero(simples)
+        orden = np.lexsort((y0[segs_simples], x0[segs_simples]))
+        segs_simples = segs_simples[orden]
+        claves = np.stack((x0[segs_simples], y0[segs_simples]), axis=1)
+        cortes = np.flatnonzero(np.any(np.diff(claves, axis=0) != 0, axis=1)) + 1
+
+        celdas = {}
+        for grupo in np.split(segs_simples, cortes):
+            if len(grupo):
+                celdas[(int(x0[grupo[0]]), int(y0[grupo[0]]))] = list(grupo)
+
+        # Segmentos largos que cruzan varias celdas
+        for seg in np.flatnonzero(~simples):
+            for i in range(x0[seg], x1[seg] + 1):
+                for j in range(y0[seg], y1[seg] + 1):
+                    celdas.setdefault((int(i), int(j)), []).append(int(seg))
+
+        return {clave: np.asarray(segs, dtype=np.int64) for clave, segs in celdas.items()}
+
+    def _ubicar_maniobras(self, maniobras):
+        """Posición (km sobre la ruta) y tiempo acumulado al inicio de cada maniobra"""
+        posiciones, tiempos, textos = [], [], []
+        tiempo_acum = 0.0
+        km_previo = 0.0
+        for man in maniobras:
+            punto = man.get("startPoint") or {}
+            if "lat" in punto and "lng" in punto:
+                km, _ = self._proyectar(punto["lat"], punto["lng"], km_previo)
+                km_previo = km
+                posiciones.append(km)
+                tiempos.append(tiempo_acum)
+                textos.append(traducir_instruccion_ruta(man.get("narrative", "")))
+            tiempo_acum += man.get("time", 0) / 60
+
+        self.man_km = np.asarray(posiciones, dtype=np.float64)
+        self.man_min_acum = np.asarray(tiempos, dtype=np.float64)
+        self.man_texto = textos
+        if tiempo_acum > 0 and not self.tiempo_total_min:
+            self.tiempo_total_min = tiempo_acum
+
+    # --------------------------------------------------
+    # MAP-MATCHING
+    # --------------------------------------------------
+
+    def _candidatos(self, px, py):
+        ci = int(np.floor(px / TAMANO_CELDA_KM))
+        cj = int(np.floor(py / TAMANO_CELDA_KM))
+        bloques = [
+            self.celdas[(i, j)]
+            for i in (ci - 1, ci, ci + 1)
+            for j in (cj - 1, cj, cj + 1)
+            if (i, j) in self.celdas
+        ]
+        if not bloques:
+            return None
+        return np.unique(np.concatenate(bloques))
+
+    def _proyectar(self, lat, lng, km_previo=None):
+        """
+        Proyecta un punto sobre la ruta.
+        Devuelve (km_sobre_ruta, distancia_a_ruta_km).
+        """
+        px, py = geo.proyectar_km(lat, lng, self.lat_ref)
+        segs = self._candidatos(px, py)
+        if segs is None:
+            # Lejos de cualquier celda: búsqueda completa (sigue siendo vectorizada)
+            segs = np.arange(len(self.x) - 1)
+
+        ax, ay = self.x[segs], self.y[segs]
+        dx, dy = self.x[segs + 1] - ax, self.y[segs + 1] - ay
+        largo2 = dx * dx + dy * dy
+        t = np.where(largo2 > 0, ((px - ax) * dx + (py - ay) * dy) / np.where(largo2 > 0, largo2, 1), 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(ax + t * dx - px, ay + t * dy - py)
+        km = self.acumulada[segs] + t * np.sqrt(largo2)
+
+        elegido = int(np.argmin(dist))
+        if km_previo is not None:
+            # En rutas que regresan por la misma vía, preferir el tramo más
+            # cercano dentro de la ventana que sigue al último avance conocido
+            validos = (dist <= UMBRAL_FUERA_RUTA_KM) & (km >= km_previo - HOLGURA_RETROCESO_KM)
+            en_ventana = validos & (km <= km_previo + VENTANA_AVANCE_KM)
+            if en_ventana.any():
+                validos = en_ventana
+            if validos.any():
+                # Retroceder penaliza igual que alejarse de la vía
+                idx = np.flatnonzero(validos)
+                puntaje = dist[idx] + np.maximum(km_previo - km[idx], 0.0)
+                elegido = int(idx[np.argmin(puntaje)])
+
+        return float(km[elegido]), float(dist[elegido])
+
+    def ubicar(self, lat, lng, km_previo=None):
+        """Calcula el avance del repartidor para una posición GPS"""
+        km, distancia = self._proyectar(lat, lng, km_previo)
+        restante_km = max(self.total_km - km, 0.0)
+
+        if len(self.man_km) > 0 and self.tiempo_total_min > 0:
+            transcurrido = float(np.interp(km, self.man_km, self.man_min_acum))
+            restante_min = max(self.tiempo_total_min - transcurrido, 0.0)
+        elif self.total_km > 0:
+            restante_min = self.tiempo_total_min * restante_km / self.total_km
+        else:
+            restante_min = 0.0
+
+        siguiente = None
+        idx = int(np.searchsorted(self.man_km, km, side="right"))
+        if idx < len(self.man_km):
+            siguiente = {
+                "orden": idx + 1,
+                "instruccion": self.man_texto[idx],
+                "distancia_km": round(float(self.man_km[idx]) - km, 3)
+            }
+
+        # Punto ajustado sobre la ruta
+        lat_ajustada = float(np.interp(km, self.acumulada, self.lats))
+        lng_ajustada = float(np.interp(km, self.acumulada, self.lngs))
+
+        return {
+            "ruta_id": self.ruta_id,
+            "avance_km": round(km, 3),
+            "avance_porcentaje": round(100 * km / self.total_km, 1) if self.total_km > 0 else 100.0,
+            "restante_km": round(restante_km, 3),
+            "restante_min": round(restante_min, 1),
+            "fuera_de_ruta": distancia > UMBRAL_FUERA_RUTA_KM,
+            "distancia_a_ruta_m": round(distancia * 1000, 1),
+            "posicion_en_ruta": {"lat": lat_ajustada, "lng": lng_ajustada},
+            "siguiente_maniobra": siguiente
+        }
+
+
+def desde_ruta_guardada(ruta_id, ruta_data, tiempo_min=0):
+    """Construye el seguimiento a partir de su cuerpo guardado (cuerpos_ruta)"""
+    geometria, maniobras = geo.desempaquetar_ruta(ruta_data)
+    return SeguimientoRuta(ruta_id, geometria, maniobras, tiempo_min)
+
+
+# ==========================================================
+# CACHÉ DE SEGUIMIENTO POR REPARTIDOR
+# ==========================================================
+
+_lock = threading.Lock()
+_rutas = {}            # ruta_id -> SeguimientoRuta
+_repartidores = {}     # id_repartidor -> [ruta_id, vence, ultimo_km]
+_generacion = 0        # sube en cada invalidación
+
+
+def seguimiento_vigente(id_repartidor):
+    """Devuelve el seguimiento en caché si aún está vigente (sin tocar la BD)"""
+    entrada = _repartidores.get(id_repartidor)
+    if entrada and entrada[1] > time.monotonic():
+        return _rutas.get(entrada[0])
+    return None
+
+
+def registrar_seguimiento(id_repartidor, ruta_id, constructor):
+    """
+    Asocia la ruta activa al repartidor. constructor() solo se invoca si la
+    ruta aún no está preprocesada, y fuera del candado (consulta la BD y arma
+    la rejilla): si dos requests la construyen a la vez se queda la primera,
+    y si hubo una invalidación mientras tanto no se guarda.
+    """
+    generacion = _generacion
+    seguimiento = _rutas.get(ruta_id)
+    if seguimiento is None:
+        nuevo = constructor()
+        with _lock:
+            if generacion != _generacion:
+                return nuevo
+            seguimiento = _rutas.setdefault(ruta_id, nuevo)
+
+    with _lock:
+        if generacion != _generacion:
+            return seguimiento
+        entrada = _repartidores.get(id_repartidor)
+        ultimo_km = entrada[2] if entrada and entrada[0] == ruta_id else None
+        _repartidores[id_repartidor] = [ruta_id, time.monotonic() + VIGENCIA_CACHE_SEG, ultimo_km]
+    return seguimiento
+
+
+def procesar_ping(id_repartidor, seguimiento, lat, lng):
+    """Ubica la posición y recuerda el avance para el siguiente ping"""
+    entrada = _repartidores.get(id_repartidor)
+    km_previo = entrada[2] if entrada else None
+    resultado = seguimiento.ubicar(lat, lng, km_previo)
+    if entrada and not resultado["fuera_de_ruta"]:
+        entrada[2] = resultado["avance_km"]
+    return resultado
+
+
+def invalidar_seguimientos():
+    """Descarta rutas preprocesadas (llamar cuando se calculan o eliminan rutas)"""
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _rutas.clear()
+        _repartidores.clear()
@@ -0,0 +1,84 @@
+# NOMBRE DEL ARCHIVO: sesiones.py
+"""
+Caché en memoria de los perfiles de usuario y de los tokens revocados.
+
+- Perfiles: id_usuario -> PerfilUsuario durante TTL_PERFIL_SEG segundos.
+  Los endpoints que escriben un usuario lo descartan con invalidar_usuario;
+  los cambios hechos directo en la BD se ven al vencer el TTL.
+- Revocados: jti -> expiración del token. Un token revocado se rechaza
+  hasta que expira por sí solo; después se olvida.
+
+Las dos viven en el proceso (la API corre con un solo worker de uvicorn);
+con varios workers cada uno tendría su propia caché y su propia lista.
+"""
+import os
+import threading
+import time
+
+TTL_PERFIL_SEG = float(os.getenv("AUTH_CACHE_TTL_SEG", "60"))
+MAX_PERFILES = 10_000
+
+
+class PerfilUsuario:
+    """Datos del usuario que necesitan /me y las revisiones de rol (sin password_hash)"""
+
+    __slots__ = ("id", "nombre_completo", "email", "username", "telefono", "rol", "activo", "fecha_registro")
+
+    def __init__(self, fila):
+        self.id = fila.id
+        self.nombre_completo = fila.nombre_completo
+        self.email = fila.email
+        self.username = fila.username
+        self.telefono = fila.telefono
+        self.rol = fila.rol
+        self.activo = bool(fila.activo)
+        self.fecha_registro = fila.fecha_registro
+
+
+_lock = threading.Lock()
+_perfiles = {}      # id_usuario -> (PerfilUsuario, vence)
+_revocados = {}     # jti -> exp (timestamp UNIX)
+
+
+def perfil_en_cache(id_usuario):
+    """PerfilUsuario vigente en caché, o None"""
+    entrada = _perfiles.get(id_usuario)
+    if entrada is None or entrada[1] < time.monotonic():
+        return None
+    return entrada[0]
+
+
+def guardar_perfil(fila):
+    """Guarda el perfil leído de la BD y lo devuelve"""
+    perfil = PerfilUsuario(fila)
+    with _lock:
+        if len(_perfiles) >= MAX_PERFILES:
+            ahora = time.monotonic()
+            for id_usuario in [i for i, (_, vence) in _perfiles.items() if vence < ahora]:
+                del _perfiles[id_usuario]
+            if len(_perfiles) >= MAX_PERFILES:
+                del _perfiles[next(iter(_perfiles))]   # el más antiguo
+        _perfiles[perfil.id] = (perfil, time.monotonic() + TTL_PERFIL_SEG)
+    return perfil
+
+
+def invalidar_usuario(id_usuario=None):
+    """Descarta el perfil de un usuario (o todos); llamar después de escribir en usuarios"""
+    with _lock:
+        if id_usuario is None:
+            _perfiles.clear()
+        else:
+            _perfiles.pop(id_usuario, None)
+
+
+def revocar_token(jti, exp):
+    """Rechaza el token con ese jti hasta su expiración"""
+    ahora = time.time()
+    with _lock:
+        for vencido in [j for j, e in _revocados.items() if e < ahora]:
+            del _revocados[vencido]
+        _revocados[jti] = exp
+
+
+def token_revocado(jti):
+    return jti is not None and jti in _revocados
@@ -1,6 +1,7 @@
 
 import os 
 import folium
+import numpy as np
 
 from . import dijkstra
 
@@ -278,7 +279,7 @@ def generar_mapa_visual(G, ruta_geometria, incidentes, paradas_ordenadas, nombre
     """
     # 1. BORRADO INICIAL (Para evitar que el navegador lea basura vieja si la nueva falla)
     
-    if not G or not ruta_geometria:
+    if not G or len(ruta_geometria) == 0:
         print("Datos insuficientes para generar el mapa.")
         return []
     # configuracion de limites (EDOMEX/CDMX)
@@ -331,7 +332,7 @@ def generar_mapa_visual(G, ruta_geometria, incidentes, paradas_ordenadas, nombre
     print(f"\nMapa generado exitosamente: {nombre_archivo}")
     
     #  RETORNAR GEOMETRÍA (formato [(lat, lon), ...])
-    geometria_formato_repartidor = [(punto[0], punto[1]) for punto in ruta_geometria]
+    geometria_formato_repartidor = np.asarray(ruta_geometria).reshape(-1, 2).tolist()
     return geometria_formato_repartidor
 
 
@@ -357,13 +358,13 @@ if __name__ == "__main__":
         print("Se requieren destinos para calcular ruta.")
     else:
         print("\nCalculando ruta optimizada...")
-        maniobras, geom, bbox, orden = dijkstra.obtener_ruta_multiparada(API_KEY, lugares)
+        ruta = dijkstra.obtener_ruta_multiparada(API_KEY, lugares)
         
-        if maniobras:
+        if ruta:
             print("Obteniendo datos de tráfico...")
-            trafico = dijkstra.obtener_incidencias_trafico(API_KEY, bbox)
+            trafico = dijkstra.obtener_incidencias_corredor(API_KEY, ruta.geometria)
             
-            grafo = dijkstra.construir_grafo_logico(maniobras)
-            generar_mapa_visual(grafo, geom, trafico, orden)
+            grafo = dijkstra.construir_grafo_logico(ruta)
+            generar_mapa_visual(grafo, ruta.geometria, trafico, ruta.orden)
         else:
             print("Error al obtener ruta.")
\ No newline at end of file
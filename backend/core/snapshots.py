@@ -0,0 +1,278 @@
+# NOMBRE DEL ARCHIVO: snapshots.py
+"""
+Snapshots columnares (Parquet) de pedidos, asignaciones y rutas_asignadas
+para consultas analíticas locales.
+
+Un exportador copia periódicamente esas tablas a archivos Parquet en disco y
+las consultas de analítica se resuelven sobre ellos con pyarrow.compute, sin
+competir con el tráfico transaccional de la BD de Neon.
+
+pyarrow es opcional: si no está instalado, DISPONIBLE es False y los
+endpoints de analítica responden 503.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+from backend.API.database import engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    DISPONIBLE = True
+except ImportError:
+    pa = pc = pq = None
+    DISPONIBLE = False
+
+DIRECTORIO = Path(os.getenv(
+    "SNAPSHOTS_DIR",
+    Path(__file__).resolve().parent.parent.parent / "data" / "snapshots"
+))
+INTERVALO_MIN = int(os.getenv("SNAPSHOTS_INTERVALO_MIN", "60"))   # 0 = sin exportador periódico
+TAMANO_LOTE = 5000                                                # filas por lote del cursor
+
+# Tabla -> (consulta, columnas y tipo). Las rutas se guardan ya unidas con su
+# asignación y sin la geometría (cuerpos_ruta) para que los escaneos sean ligeros.
+_CONSULTAS = {
+    "pedidos": ("""
+        SELECT id, numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes, estado,
+               fecha_creacion, fecha_entrega_real
+        FROM pedidos
+    """, (
+        ("id", "int64"), ("numero_pedido", "string"), ("id_vehiculo", "int64"), ("id_repartidor", "int64"),
+        ("capacidad_paquetes", "int64"), ("estado", "string"),
+        ("fecha_creacion", "timestamp"), ("fecha_entrega_real", "timestamp")
+    )),
+    "asignaciones": ("""
+        SELECT id, id_repartidor, id_vehiculo, numero_paquetes, ruta_municipio, estado,
+               fecha_asignacion, fecha_inicio, fecha_fin
+        FROM asignaciones
+    """, (
+        ("id", "int64"), ("id_repartidor", "int64"), ("id_vehiculo", "int64"),
+        ("numero_paquetes", "int64"), ("ruta_municipio", "string"), ("estado", "string"),
+        ("fecha_asignacion", "timestamp"), ("fecha_inicio", "timestamp"), ("fecha_fin", "timestamp")
+    )),
+    "rutas_asignadas": ("""
+        SELECT r.id, r.id_asignacion, r.id_pedido, a.id_vehiculo, a.id_repartidor,
+               r.vehiculo_tipo,
+               r.distancia_km::float8 AS distancia_km,
+               r.tiempo_min::float8 AS tiempo_min,
+               r.costo_total::float8 AS costo_total,
+               r.emisiones_co2_kg::float8 AS emisiones_co2_kg,
+               r.fecha_calculo, r.activa
+        FROM rutas_asignadas r
+        JOIN asignaciones a ON r.id_asignacion = a.id
+    """, (
+        ("id", "int64"), ("id_asignacion", "int64"), ("id_pedido", "int64"),
+        ("id_vehiculo", "int64"), ("id_repartidor", "int64"), ("vehiculo_tipo", "string"),
+        ("distancia_km", "float64"), ("tiempo_min", "float64"),
+        ("costo_total", "float64"), ("emisiones_co2_kg", "float64"),
+        ("fecha_calculo", "timestamp"), ("activa", "bool")
+    )),
+}
+
+TABLAS = tuple(_CONSULTAS)
+
+
+def _tipo_arrow(nombre):
+    if nombre == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    return pa.type_for_alias(nombre)
+
+
+def _esquema(tabla):
+    return pa.schema([(columna, _tipo_arrow(tipo)) for columna, tipo in _CONSULTAS[tabla][1]])
+
+
+def ruta_snapshot(tabla):
+    return DIRECTORIO / f"{tabla}.parquet"
+
+
+# ==========================================================
+# EXPORTACIÓN
+# ==========================================================
+
+_lock_exportacion = threading.Lock()
+
+
+def exportar_tabla(tabla):
+    """
+    Copia una tabla a Parquet leyendo por lotes (cursor del lado del servidor).
+    Escribe en un archivo temporal y lo reemplaza al final, así los lectores
+    nunca ven un snapshot a medias. Devuelve el número de filas.
+    """
+    consulta, _ = _CONSULTAS[tabla]
+    esquema = _esquema(tabla)
+    DIRECTORIO.mkdir(parents=True, exist_ok=True)
+    destino = ruta_snapshot(tabla)
+    temporal = destino.with_suffix(".parquet.tmp")
+
+    filas = 0
+    with engine.connect() as conn, pq.ParquetWriter(temporal, esquema, compression="zstd") as escritor:
+        resultado = conn.execution_options(stream_results=True, yield_per=TAMANO_LOTE).execute(text(consulta))
+        for lote in resultado.partitions():
+            columnas = [
+                pa.array([fila[i] for fila in lote], type=campo.type)
+                for i, campo in enumerate(esquema)
+            ]
+            escritor.write_batch(pa.RecordBatch.from_arrays(columnas, schema=esquema))
+            filas += len(lote)
+
+    os.replace(temporal, destino)
+    return filas
+
+
+def exportar_snapshots():
+    """Exporta todas las tablas; devuelve {tabla: filas}"""
+    if not DISPONIBLE:
+        raise RuntimeError("pyarrow no está instalado")
+
+    with _lock_exportacion:
+        inicio = time.perf_counter()
+        filas = {tabla: exportar_tabla(tabla) for tabla in TABLAS}
+        print(f"🗂️  Snapshots Parquet exportados en {time.perf_counter() - inicio:.1f}s: {filas}")
+    return filas
+
+
+_hilo = None
+
+
+def iniciar_exportador_periodico():
+    """Hilo en segundo plano que exporta cada INTERVALO_MIN minutos (una sola vez por proceso)"""
+    global _hilo
+    if not DISPONIBLE or INTERVALO_MIN <= 0 or _hilo is not None:
+        return
+
+    def ciclo():
+        while True:
+            try:
+                exportar_snapshots()
+            except Exception as e:
+                print(f"⚠️  Error exportando snapshots: {e}")
+            time.sleep(INTERVALO_MIN * 60)
+
+    _hilo = threading.Thread(target=ciclo, name="exportador-snapshots", daemon=True)
+    _hilo.start()
+
+
+# ==========================================================
+# LECTURA (caché por fecha de modificación del archivo)
+# ==========================================================
+
+_lock_lectura = threading.Lock()
+_tablas = {}    # tabla -> (mtime, pa.Table)
+
+
+def cargar_tabla(tabla):
+    """pa.Table del último snapshot (None si todavía no se ha exportado)"""
+    archivo = ruta_snapshot(tabla)
+    try:
+        mtime = archivo.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+    entrada = _tablas.get(tabla)
+    if entrada and entrada[0] == mtime:
+        return entrada[1]
+
+    with _lock_lectura:
+        entrada = _tablas.get(tabla)
+        if not entrada or entrada[0] != mtime:
+            entrada = (mtime, pq.read_table(archivo, memory_map=True))
+            _tablas[tabla] = entrada
+    return entrada[1]
+
+
+def estado_snapshots():
+    """Fecha y número de filas de cada snapshot en disco"""
+    estado = {}
+    for tabla in TABLAS:
+        archivo = ruta_snapshot(tabla)
+        if not archivo.exists():
+            estado[tabla] = None
+            continue
+        estado[tabla] = {
+            "filas": pq.ParquetFile(archivo).metadata.num_rows,
+            "fecha": datetime.fromtimestamp(archivo.stat().st_mtime, tz=timezone.utc).isoformat(),
+            "bytes": archivo.stat().st_size
+        }
+    return estado
+
+
+# ==========================================================
+# CONSULTAS ANALÍTICAS
+# ==========================================================
+
+def _filtrar_fechas(tabla, columna, desde=None, hasta=None):
+    """Filas con desde <= columna < hasta (datetimes con zona horaria)"""
+    mascara = None
+    tipo = tabla.schema.field(columna).type
+    for limite, comparar in ((desde, pc.greater_equal), (hasta, pc.less)):
+        if limite is None:
+            continue
+        condicion = comparar(tabla[columna], pa.scalar(limite, type=tipo))
+        mascara = condicion if mascara is None else pc.and_(mascara, condicion)
+    return tabla if mascara is None else tabla.filter(mascara)
+
+
+def _renombrar(tabla, nombres):
+    """Selecciona y renombra columnas (el orden de salida de group_by varía entre versiones)"""
+    return pa.table({nuevo: tabla[viejo] for viejo, nuevo in nombres.items()})
+
+
+def _a_registros(tabla, decimales=2):
+    """Convierte el resultado agregado en lista de dicts con floats redondeados"""
+    registros = tabla.to_pylist()
+    for registro in registros:
+        for campo, valor in registro.items():
+            if isinstance(valor, float):
+                registro[campo] = round(valor, decimales)
+    return registros
+
+
+def resumen_rutas(agrupar_por="vehiculo_tipo", desde=None, hasta=None):
+    """
+    Totales de rutas activas agrupados por vehiculo_tipo, id_vehiculo o
+    id_repartidor, opcionalmente limitados por fecha_calculo.
+    """
+    rutas = cargar_tabla("rutas_asignadas")
+    if rutas is None:
+        return None
+
+    rutas = _filtrar_fechas(rutas.filter(pc.equal(rutas["activa"], True)), "fecha_calculo", desde, hasta)
+    resumen = _renombrar(rutas.group_by(agrupar_por).aggregate([
+        ("id", "count"),
+        ("distancia_km", "sum"),
+        ("tiempo_min", "sum"),
+        ("costo_total", "sum"),
+        ("emisiones_co2_kg", "sum"),
+        ("distancia_km", "mean"),
+    ]), {
+        agrupar_por: agrupar_por,
+        "id_count": "rutas",
+        "distancia_km_sum": "distancia_km",
+        "tiempo_min_sum": "tiempo_min",
+        "costo_total_sum": "costo_total",
+        "emisiones_co2_kg_sum": "emisiones_co2_kg",
+        "distancia_km_mean": "distancia_promedio_km",
+    })
+    return _a_registros(resumen.sort_by(agrupar_por))
+
+
+def resumen_pedidos(desde=None, hasta=None):
+    """Pedidos y paquetes por estado, opcionalmente limitados por fecha_creacion"""
+    pedidos = cargar_tabla("pedidos")
+    if pedidos is None:
+        return None
+
+    pedidos = _filtrar_fechas(pedidos, "fecha_creacion", desde, hasta)
+    resumen = _renombrar(pedidos.group_by("estado").aggregate([
+        ("id", "count"),
+        ("capacidad_paquetes", "sum"),
+    ]), {"estado": "estado", "id_count": "pedidos", "capacidad_paquetes_sum": "paquetes"})
+    return _a_registros(resumen.sort_by("estado"))
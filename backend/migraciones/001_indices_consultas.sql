@@ -0,0 +1,33 @@
+-- sin-transaccion
+-- Índices para los filtros que usan los listados, los dashboards y el
+-- seguimiento. CONCURRENTLY no bloquea escrituras mientras se construyen
+-- (por eso esta migración corre fuera de una transacción).
+
+-- Listado de pedidos por estado, del más reciente al más antiguo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pedidos_estado_fecha
+    ON pedidos (estado, fecha_creacion DESC);
+
+-- JOIN pedidos -> vehículo (listados, reporte masivo)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pedidos_vehiculo
+    ON pedidos (id_vehiculo);
+
+-- Asignación activa de un repartidor / de un vehículo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_asignaciones_repartidor_estado
+    ON asignaciones (id_repartidor, estado);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_asignaciones_vehiculo_estado
+    ON asignaciones (id_vehiculo, estado);
+
+-- Ruta activa más reciente de una asignación (solo filas activas)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rutas_asignadas_asignacion_activa
+    ON rutas_asignadas (id_asignacion, fecha_calculo DESC)
+    WHERE activa;
+
+-- Rutas de un pedido (reporte masivo)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rutas_asignadas_pedido
+    ON rutas_asignadas (id_pedido)
+    WHERE id_pedido IS NOT NULL;
+
+-- Repartidores / administradores activos
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usuarios_rol_activo
+    ON usuarios (rol, activo);
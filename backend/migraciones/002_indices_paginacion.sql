@@ -0,0 +1,18 @@
+-- sin-transaccion
+-- Índices para la paginación por cursor (keyset): cada página es un
+-- recorrido del índice a partir de (fecha, id) del cursor.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pedidos_fecha_id
+    ON pedidos (fecha_creacion DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_asignaciones_fecha_id
+    ON asignaciones (fecha_asignacion DESC, id DESC);
+
+-- Listados de asignaciones activas y pendientes de ruta
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_asignaciones_activas_fecha_id
+    ON asignaciones (fecha_asignacion DESC, id DESC)
+    WHERE estado = 'activa';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rutas_asignadas_activas_fecha_id
+    ON rutas_asignadas (fecha_calculo DESC, id DESC)
+    WHERE activa;
@@ -0,0 +1,23 @@
+-- Repartidor del pedido guardado directamente en pedidos.
+-- Antes se deducía uniendo pedidos -> vehiculos -> asignaciones, lo que
+-- multiplicaba cada pedido por las asignaciones (históricas o activas)
+-- de su vehículo.
+
+ALTER TABLE pedidos
+    ADD COLUMN IF NOT EXISTS id_repartidor INTEGER
+    REFERENCES usuarios(id) ON DELETE SET NULL;
+
+-- Relleno: la asignación del vehículo vigente al crearse el pedido (la más
+-- reciente que empezó antes); si no hay, la primera posterior.
+UPDATE pedidos p
+SET id_repartidor = (
+    SELECT a.id_repartidor
+    FROM asignaciones a
+    WHERE a.id_vehiculo = p.id_vehiculo
+    ORDER BY
+        (a.fecha_asignacion <= p.fecha_creacion) DESC,
+        CASE WHEN a.fecha_asignacion <= p.fecha_creacion THEN a.fecha_asignacion END DESC NULLS LAST,
+        a.fecha_asignacion ASC
+    LIMIT 1
+)
+WHERE p.id_repartidor IS NULL;
@@ -0,0 +1,5 @@
+-- sin-transaccion
+-- Pedidos de un repartidor, del más reciente al más antiguo
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pedidos_repartidor_fecha
+    ON pedidos (id_repartidor, fecha_creacion DESC);
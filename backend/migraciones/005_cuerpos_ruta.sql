@@ -0,0 +1,42 @@
+-- Geometría y maniobras de las rutas fuera de rutas_asignadas, en una tabla
+-- direccionada por contenido (SHA-256 del jsonb). rutas_asignadas guarda
+-- solo el hash.
+
+CREATE TABLE IF NOT EXISTS cuerpos_ruta (
+    hash CHAR(64) PRIMARY KEY,
+    cuerpo JSONB NOT NULL,
+    bytes INTEGER NOT NULL,
+    fecha_creacion TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE rutas_asignadas
+    ADD COLUMN IF NOT EXISTS hash_cuerpo CHAR(64) REFERENCES cuerpos_ruta(hash);
+
+-- Mover los cuerpos existentes y eliminar la columna (solo en BDs creadas
+-- antes de esta migración)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'rutas_asignadas'
+          AND column_name = 'ruta_mapquest'
+    ) THEN
+        INSERT INTO cuerpos_ruta (hash, cuerpo, bytes)
+        SELECT encode(sha256(convert_to(ruta_mapquest::text, 'UTF8')), 'hex'),
+               ruta_mapquest,
+               octet_length(ruta_mapquest::text)
+        FROM rutas_asignadas
+        WHERE hash_cuerpo IS NULL
+        ON CONFLICT (hash) DO NOTHING;
+
+        UPDATE rutas_asignadas
+        SET hash_cuerpo = encode(sha256(convert_to(ruta_mapquest::text, 'UTF8')), 'hex')
+        WHERE hash_cuerpo IS NULL;
+
+        ALTER TABLE rutas_asignadas DROP COLUMN ruta_mapquest;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_hash_cuerpo
+    ON rutas_asignadas (hash_cuerpo);
@@ -0,0 +1,28 @@
+-- Rutas calculadas compartidas entre asignaciones, por
+-- (origen, destino, opciones, época de tráfico). rutas_asignadas apunta a
+-- la ruta compartida de la que salió.
+
+CREATE TABLE IF NOT EXISTS rutas_compartidas (
+    id SERIAL PRIMARY KEY,
+    clave CHAR(64) NOT NULL UNIQUE,
+    origen TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    opciones JSONB NOT NULL,
+    epoca INTEGER NOT NULL,
+    distancia_km NUMERIC(8, 2) NOT NULL,
+    tiempo_min NUMERIC(8, 2) NOT NULL,
+    hash_cuerpo CHAR(64) NOT NULL REFERENCES cuerpos_ruta(hash),
+    usos INTEGER NOT NULL DEFAULT 0,
+    fecha_calculo TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_rutas_compartidas_epoca ON rutas_compartidas (epoca);
+CREATE INDEX IF NOT EXISTS ix_rutas_compartidas_hash_cuerpo ON rutas_compartidas (hash_cuerpo);
+
+ALTER TABLE rutas_asignadas
+    ADD COLUMN IF NOT EXISTS id_ruta_compartida INTEGER
+    REFERENCES rutas_compartidas(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_ruta_compartida
+    ON rutas_asignadas (id_ruta_compartida)
+    WHERE id_ruta_compartida IS NOT NULL;
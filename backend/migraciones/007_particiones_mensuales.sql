@@ -0,0 +1,183 @@
+-- Particiones mensuales (meses en UTC) de pedidos por fecha_creacion y de
+-- rutas_asignadas por fecha_calculo, con una partición DEFAULT de respaldo.
+-- backend/core/particiones.py crea las de los meses siguientes y pasa las
+-- viejas al esquema 'archivo'.
+--
+-- En una tabla particionada la llave primaria y los UNIQUE deben incluir la
+-- columna de partición, así que:
+-- - la llave primaria pasa a ser (id, fecha)
+-- - la unicidad de numero_pedido se lleva en la tabla numeros_pedido
+-- - rutas_asignadas.id_pedido deja de ser FOREIGN KEY (ya no hay un UNIQUE
+--   sobre pedidos.id sola); al eliminar un pedido se pone en NULL a mano
+--
+-- Si las tablas existen sin particionar se copian a las nuevas; la copia
+-- corre dentro de esta transacción y las bloquea mientras dura.
+
+CREATE SCHEMA IF NOT EXISTS archivo;
+
+CREATE OR REPLACE FUNCTION crear_particion_mensual(tabla TEXT, mes DATE)
+RETURNS BOOLEAN
+LANGUAGE plpgsql AS $$
+DECLARE
+    inicio DATE := CAST(date_trunc('month', mes) AS date);
+    particion TEXT := tabla || '_' || to_char(inicio, 'YYYY_MM');
+BEGIN
+    IF to_regclass(quote_ident(particion)) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    EXECUTE 'CREATE TABLE ' || quote_ident(particion)
+        || ' PARTITION OF ' || quote_ident(tabla)
+        || ' FOR VALUES FROM (' || quote_literal(to_char(inicio, 'YYYY-MM-DD') || ' 00:00:00+00')
+        || ') TO (' || quote_literal(to_char(inicio + INTERVAL '1 month', 'YYYY-MM-DD') || ' 00:00:00+00') || ')';
+    RETURN TRUE;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS numeros_pedido (
+    numero_pedido VARCHAR(50) PRIMARY KEY
+);
+
+ALTER TABLE rutas_asignadas DROP CONSTRAINT IF EXISTS rutas_asignadas_id_pedido_fkey;
+
+-- Tablas sin particionar: se renombran (con sus índices) para liberar los nombres
+DO $$
+DECLARE
+    tabla TEXT;
+    indice TEXT;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['pedidos', 'rutas_asignadas'] LOOP
+        IF (SELECT relkind FROM pg_class WHERE oid = to_regclass(tabla)) = 'r' THEN
+            EXECUTE 'ALTER SEQUENCE ' || quote_ident(tabla || '_id_seq') || ' OWNED BY NONE';
+            EXECUTE 'ALTER TABLE ' || quote_ident(tabla) || ' RENAME TO ' || quote_ident(tabla || '_sin_particionar');
+            FOR indice IN
+                SELECT c.relname
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = to_regclass(tabla || '_sin_particionar')
+            LOOP
+                EXECUTE 'ALTER INDEX ' || quote_ident(indice)
+                    || ' RENAME TO ' || quote_ident(left(indice, 40) || '_sin_particionar');
+            END LOOP;
+        END IF;
+    END LOOP;
+END $$;
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER NOT NULL DEFAULT nextval('pedidos_id_seq'),
+    numero_pedido VARCHAR(50) NOT NULL,
+    id_vehiculo INTEGER NOT NULL REFERENCES vehiculos(id) ON DELETE CASCADE,
+    id_repartidor INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    capacidad_paquetes INTEGER,
+    destino_entrega TEXT NOT NULL,
+    estado VARCHAR(20),
+    fecha_creacion TIMESTAMPTZ NOT NULL DEFAULT now(),
+    fecha_asignacion TIMESTAMPTZ,
+    fecha_entrega_estimada TIMESTAMPTZ,
+    fecha_entrega_real TIMESTAMPTZ,
+    CONSTRAINT pedidos_pkey PRIMARY KEY (id, fecha_creacion),
+    CONSTRAINT estado_pedido_check CHECK (estado IN ('pendiente', 'procesando', 'en_ruta', 'entregado', 'cancelado'))
+) PARTITION BY RANGE (fecha_creacion);
+
+CREATE TABLE IF NOT EXISTS rutas_asignadas (
+    id INTEGER NOT NULL DEFAULT nextval('rutas_asignadas_id_seq'),
+    id_asignacion INTEGER NOT NULL REFERENCES asignaciones(id) ON DELETE CASCADE,
+    id_pedido INTEGER,
+    origen_direccion TEXT NOT NULL,
+    destino_direccion TEXT NOT NULL,
+    distancia_km NUMERIC(8, 2) NOT NULL,
+    tiempo_min NUMERIC(8, 2) NOT NULL,
+    hash_cuerpo CHAR(64) REFERENCES cuerpos_ruta(hash),
+    id_ruta_compartida INTEGER REFERENCES rutas_compartidas(id) ON DELETE SET NULL,
+    vehiculo_tipo VARCHAR(20) NOT NULL,
+    consumo_data JSONB,
+    costo_total NUMERIC(10, 2),
+    emisiones_co2_kg NUMERIC(8, 2),
+    fecha_calculo TIMESTAMPTZ NOT NULL DEFAULT now(),
+    activa BOOLEAN,
+    CONSTRAINT rutas_asignadas_pkey PRIMARY KEY (id, fecha_calculo),
+    CONSTRAINT tipo_ruta_check CHECK (vehiculo_tipo IN ('gasolina', 'hibrido', 'electrico'))
+) PARTITION BY RANGE (fecha_calculo);
+
+-- Mes actual y los tres siguientes, y la partición de respaldo
+SELECT crear_particion_mensual(t.tabla, CAST(m.mes AS date))
+FROM (VALUES ('pedidos'), ('rutas_asignadas')) AS t(tabla)
+CROSS JOIN generate_series(
+    date_trunc('month', now() AT TIME ZONE 'UTC'),
+    date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+    INTERVAL '1 month'
+) AS m(mes);
+
+CREATE TABLE IF NOT EXISTS pedidos_default PARTITION OF pedidos DEFAULT;
+CREATE TABLE IF NOT EXISTS rutas_asignadas_default PARTITION OF rutas_asignadas DEFAULT;
+
+-- Copia de los datos sin particionar (antes, las particiones de sus meses)
+DO $$
+BEGIN
+    IF to_regclass('pedidos_sin_particionar') IS NOT NULL THEN
+        PERFORM crear_particion_mensual('pedidos', CAST(m.mes AS date))
+        FROM generate_series(
+            (SELECT date_trunc('month', MIN(fecha_creacion) AT TIME ZONE 'UTC') FROM pedidos_sin_particionar),
+            date_trunc('month', now() AT TIME ZONE 'UTC'),
+            INTERVAL '1 month'
+        ) AS m(mes);
+
+        INSERT INTO pedidos (
+            id, numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes, destino_entrega,
+            estado, fecha_creacion, fecha_asignacion, fecha_entrega_estimada, fecha_entrega_real
+        )
+        SELECT
+            id, numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes, destino_entrega,
+            estado, COALESCE(fecha_creacion, CURRENT_TIMESTAMP), fecha_asignacion, fecha_entrega_estimada, fecha_entrega_real
+        FROM pedidos_sin_particionar;
+
+        DROP TABLE pedidos_sin_particionar;
+        ALTER SEQUENCE pedidos_id_seq OWNED BY pedidos.id;
+    END IF;
+
+    IF to_regclass('rutas_asignadas_sin_particionar') IS NOT NULL THEN
+        PERFORM crear_particion_mensual('rutas_asignadas', CAST(m.mes AS date))
+        FROM generate_series(
+            (SELECT date_trunc('month', MIN(fecha_calculo) AT TIME ZONE 'UTC') FROM rutas_asignadas_sin_particionar),
+            date_trunc('month', now() AT TIME ZONE 'UTC'),
+            INTERVAL '1 month'
+        ) AS m(mes);
+
+        INSERT INTO rutas_asignadas (
+            id, id_asignacion, id_pedido, origen_direccion, destino_direccion, distancia_km, tiempo_min,
+            hash_cuerpo, id_ruta_compartida, vehiculo_tipo, consumo_data, costo_total, emisiones_co2_kg,
+            fecha_calculo, activa
+        )
+        SELECT
+            id, id_asignacion, id_pedido, origen_direccion, destino_direccion, distancia_km, tiempo_min,
+            hash_cuerpo, id_ruta_compartida, vehiculo_tipo, consumo_data, costo_total, emisiones_co2_kg,
+            COALESCE(fecha_calculo, CURRENT_TIMESTAMP), activa
+        FROM rutas_asignadas_sin_particionar;
+
+        DROP TABLE rutas_asignadas_sin_particionar;
+        ALTER SEQUENCE rutas_asignadas_id_seq OWNED BY rutas_asignadas.id;
+    END IF;
+END $$;
+
+-- Índices de las migraciones 001, 002, 004, 005 y 006 (se crean en cada partición)
+CREATE INDEX IF NOT EXISTS ix_pedidos_estado_fecha ON pedidos (estado, fecha_creacion DESC);
+CREATE INDEX IF NOT EXISTS ix_pedidos_vehiculo ON pedidos (id_vehiculo);
+CREATE INDEX IF NOT EXISTS ix_pedidos_fecha_id ON pedidos (fecha_creacion DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_pedidos_repartidor_fecha ON pedidos (id_repartidor, fecha_creacion DESC);
+
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_asignacion_activa
+    ON rutas_asignadas (id_asignacion, fecha_calculo DESC) WHERE activa;
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_pedido
+    ON rutas_asignadas (id_pedido) WHERE id_pedido IS NOT NULL;
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_activas_fecha_id
+    ON rutas_asignadas (fecha_calculo DESC, id DESC) WHERE activa;
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_hash_cuerpo ON rutas_asignadas (hash_cuerpo);
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_ruta_compartida
+    ON rutas_asignadas (id_ruta_compartida) WHERE id_ruta_compartida IS NOT NULL;
+
+INSERT INTO numeros_pedido (numero_pedido)
+SELECT numero_pedido FROM pedidos
+ON CONFLICT (numero_pedido) DO NOTHING;
+
+-- Destino de las particiones archivadas (cada una conserva sus índices)
+CREATE TABLE IF NOT EXISTS archivo.pedidos (LIKE pedidos) PARTITION BY RANGE (fecha_creacion);
+CREATE TABLE IF NOT EXISTS archivo.rutas_asignadas (LIKE rutas_asignadas) PARTITION BY RANGE (fecha_calculo);
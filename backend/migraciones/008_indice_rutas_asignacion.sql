@@ -0,0 +1,8 @@
+-- Rutas de una asignación, activas o no, de la más reciente a la más antigua
+-- (ruta de respaldo del reporte masivo para pedidos sin ruta propia).
+-- ix_rutas_asignadas_asignacion_activa solo cubre las activas.
+-- rutas_asignadas está particionada: el índice se crea en cada partición y
+-- Postgres no admite CONCURRENTLY en la tabla padre.
+
+CREATE INDEX IF NOT EXISTS ix_rutas_asignadas_asignacion
+    ON rutas_asignadas (id_asignacion, fecha_calculo DESC);
@@ -0,0 +1,6 @@
+-- rutas_compartidas.usos se incrementaba en cada reutilización: cada lectura
+-- era una escritura que bloqueaba la fila hasta el commit del request.
+-- Nadie lo leía; cuántas asignaciones usan una ruta compartida se obtiene
+-- de rutas_asignadas.id_ruta_compartida.
+
+ALTER TABLE rutas_compartidas DROP COLUMN IF EXISTS usos;
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia por petición creando un engine nuevo en cada request
+(lo que hacía el get_db de ruta_router) contra la sesión compartida de
+backend/API/database.py.
+
+Uso: python scripts/benchmark_sesiones.py [iteraciones]
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.API.database import DATABASE_URL, SessionLocal, calentar_pool
+
+ITERACIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+CONSULTA = text("SELECT id, numero_pedido FROM pedidos ORDER BY id LIMIT 1")
+
+
+def peticion_engine_nuevo():
+    """Patrón anterior: engine + sessionmaker + conexión TCP/TLS nuevos por request"""
+    engine = create_engine(DATABASE_URL)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    try:
+        db.execute(CONSULTA).fetchall()
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def peticion_sesion_compartida():
+    """Patrón actual: sesión del pool compartido (get_db)"""
+    db = SessionLocal()
+    try:
+        db.execute(CONSULTA).fetchall()
+    finally:
+        db.close()
+
+
+def medir(funcion):
+    tiempos = []
+    for _ in range(ITERACIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "promedio": statistics.mean(tiempos),
+        "p50": tiempos[len(tiempos) // 2],
+        "p95": tiempos[min(int(len(tiempos) * 0.95), len(tiempos) - 1)],
+        "max": tiempos[-1],
+    }
+
+
+def imprimir(nombre, resultado):
+    print(f"   {nombre:<22} " + "  ".join(f"{k}={v:8.1f}ms" for k, v in resultado.items()))
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print(f"⏱️  BENCHMARK DE SESIONES ({ITERACIONES} peticiones por patrón)")
+    print("=" * 60)
+
+    # Despierta a Neon y llena el pool para no medir el arranque en frío
+    calentar_pool()
+    peticion_engine_nuevo()
+
+    nuevo = medir(peticion_engine_nuevo)
+    compartido = medir(peticion_sesion_compartida)
+
+    imprimir("engine por petición", nuevo)
+    imprimir("sesión compartida", compartido)
+    print()
+    print(f"🚀 Mejora en p50: {nuevo['p50'] / compartido['p50']:.1f}x "
+          f"({nuevo['p50'] - compartido['p50']:.1f} ms menos por petición)")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Verifica con EXPLAIN que las consultas de listados y dashboards usan los
+índices de las migraciones cuando las tablas tienen ~1M de filas.
+
+Crea un esquema desechable (bench_indices) en la misma BD, aplica
+create_all + migraciones, lo llena con generate_series, ejecuta
+EXPLAIN (ANALYZE, FORMAT JSON) de cada consulta y revisa el plan.
+El esquema se elimina al terminar (salvo --conservar).
+
+pedidos y rutas_asignadas están particionadas por mes: el plan nombra los
+índices de cada partición, que se traducen al índice de la tabla padre.
+
+La distribución de datos imita una BD con historial: la mayoría de los
+pedidos entregados, las asignaciones completadas y las cuentas inactivas;
+uno de cada diez pedidos no tiene ruta propia (usa la de su asignación).
+
+Uso: python scripts/verificar_indices.py --confirmar [--filas 1000000] [--conservar]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine, text
+
+from backend.API.database import DATABASE_URL, engine
+from backend.API.models import Base
+from backend.API.migraciones import aplicar_migraciones
+
+ESQUEMA = "bench_indices"
+
+# (nombre, consulta, parámetros, índices que el plan debe usar)
+CONSULTAS = (
+    ("Listado de pedidos por estado", """
+        SELECT p.id, p.numero_pedido, p.estado, p.fecha_creacion, v.modelo
+        FROM pedidos p
+        LEFT JOIN vehiculos v ON p.id_vehiculo = v.id
+        WHERE p.estado = :estado
+        ORDER BY p.fecha_creacion DESC
+        LIMIT 50
+    """, {"estado": "en_ruta"}, ("ix_pedidos_estado_fecha",)),
+
+    ("Pedidos del repartidor", """
+        SELECT p.id, p.numero_pedido, p.estado, p.fecha_creacion, u.nombre_completo
+        FROM pedidos p
+        LEFT JOIN usuarios u ON p.id_repartidor = u.id
+        WHERE p.id_repartidor = :repartidor
+        ORDER BY p.fecha_creacion DESC
+        LIMIT 50
+    """, {"repartidor": 17}, ("ix_pedidos_repartidor_fecha",)),
+
+    ("Asignación activa del repartidor", """
+        SELECT id FROM asignaciones
+        WHERE id_repartidor = :repartidor AND estado = 'activa'
+    """, {"repartidor": 17}, ("ix_asignaciones_repartidor_estado",)),
+
+    ("Asignación activa del vehículo", """
+        SELECT id FROM asignaciones
+        WHERE id_vehiculo = :vehiculo AND estado = 'activa'
+    """, {"vehiculo": 17}, ("ix_asignaciones_vehiculo_estado",)),
+
+    ("Ruta activa del repartidor (seguimiento)", """
+        SELECT r.id AS ruta_id, r.tiempo_min
+        FROM asignaciones a
+        INNER JOIN rutas_asignadas r ON a.id = r.id_asignacion AND r.activa = TRUE
+            AND r.fecha_calculo >= a.fecha_asignacion
+        WHERE a.id_repartidor = :repartidor AND a.estado = 'activa'
+        ORDER BY a.fecha_asignacion DESC, r.fecha_calculo DESC
+        LIMIT 1
+    """, {"repartidor": 17}, ("ix_asignaciones_repartidor_estado", "ix_rutas_asignadas_asignacion_activa")),
+
+    ("Dashboard: repartidores activos", """
+        SELECT COUNT(*) FROM usuarios
+        WHERE rol = 'repartidor' AND activo = TRUE
+    """, {}, ("ix_usuarios_rol_activo",)),
+
+    ("Dashboard: asignaciones activas con su ruta", """
+        SELECT a.id, a.numero_paquetes, r.distancia_km
+        FROM asignaciones a
+        LEFT JOIN rutas_asignadas r ON a.id = r.id_asignacion AND r.activa = TRUE
+            AND r.fecha_calculo >= a.fecha_asignacion
+        WHERE a.id_repartidor = ANY(:repartidores) AND a.estado = 'activa'
+    """, {"repartidores": list(range(1, 51))}, ("ix_asignaciones_repartidor_estado", "ix_rutas_asignadas_asignacion_activa")),
+
+    ("Reporte masivo: ruta del pedido o de su asignación", """
+        SELECT p.id, COALESCE(ruta_pedido.distancia_km, ruta_asig.distancia_km, 0) AS distancia_km
+        FROM pedidos p
+        LEFT JOIN LATERAL (
+            SELECT a.id
+            FROM asignaciones a
+            WHERE a.id_vehiculo = p.id_vehiculo AND a.id_repartidor = p.id_repartidor
+            ORDER BY (a.estado = 'activa') DESC, a.fecha_asignacion DESC
+            LIMIT 1
+        ) asig ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT r.distancia_km
+            FROM rutas_asignadas r
+            WHERE r.id_pedido = p.id
+            ORDER BY r.fecha_calculo DESC
+            LIMIT 1
+        ) ruta_pedido ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT r.distancia_km
+            FROM rutas_asignadas r
+            WHERE r.id_asignacion = asig.id AND ruta_pedido.distancia_km IS NULL
+            ORDER BY r.fecha_calculo DESC
+            LIMIT 1
+        ) ruta_asig ON TRUE
+        WHERE p.id_repartidor = :repartidor
+        ORDER BY p.fecha_creacion, p.id
+    """, {"repartidor": 17}, ("ix_pedidos_repartidor_fecha", "ix_rutas_asignadas_pedido", "ix_rutas_asignadas_asignacion")),
+)
+
+
+def poblar(conn, filas):
+    """Llena el esquema con `filas` pedidos y rutas (y proporcionales del resto)"""
+    usuarios = max(filas // 50, 100)
+    vehiculos = max(filas // 1000, 50)
+    asignaciones = max(filas // 10, 100)
+
+    # Particiones de los meses que cubren los datos (las asignaciones llegan más atrás)
+    conn.execute(text("""
+        SELECT crear_particion_mensual(t.tabla, CAST(m.mes AS date))
+        FROM (VALUES ('pedidos'), ('rutas_asignadas')) AS t(tabla)
+        CROSS JOIN generate_series(
+            date_trunc('month', (now() - (:minutos || ' minutes')::interval) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC'),
+            INTERVAL '1 month'
+        ) AS m(mes)
+    """), {"minutos": max(asignaciones, filas // 60 + 1)})
+
+    conn.execute(text("""
+        INSERT INTO usuarios (nombre_completo, email, username, password_hash, rol, activo)
+        SELECT 'Usuario ' || i, 'u' || i || '@bench.local', 'u' || i, 'x',
+               CASE WHEN i % 10 = 0 THEN 'admin' ELSE 'repartidor' END,
+               i <= :activos
+        FROM generate_series(1, :n) AS i
+    """), {"n": usuarios, "activos": max(usuarios // 20, 10)})
+
+    conn.execute(text("""
+        INSERT INTO vehiculos (modelo, tipo, capacidad_maxima_paquetes, velocidad_promedio_kmh)
+        SELECT 'Vehículo ' || i, (ARRAY['gasolina', 'hibrido', 'electrico'])[1 + i % 3], 100, 40
+        FROM generate_series(1, :n) AS i
+    """), {"n": vehiculos})
+
+    conn.execute(text("""
+        INSERT INTO asignaciones (id_repartidor, id_vehiculo, numero_paquetes, estado, fecha_asignacion)
+        SELECT 1 + i % :usuarios, 1 + i % :vehiculos, 10,
+               CASE WHEN i % 100 = 0 THEN 'activa' WHEN i % 7 = 0 THEN 'cancelada' ELSE 'completada' END,
+               now() - (i || ' minutes')::interval
+        FROM generate_series(1, :n) AS i
+    """), {"n": asignaciones, "usuarios": usuarios, "vehiculos": vehiculos})
+
+    conn.execute(text("""
+        INSERT INTO pedidos (numero_pedido, id_vehiculo, id_repartidor, capacidad_paquetes, destino_entrega,
+                             estado, fecha_creacion)
+        SELECT 'PED-' || i, 1 + i % :vehiculos, 1 + i % :usuarios, 1 + i % 20, 'Destino ' || i,
+               CASE WHEN i % 200 = 0 THEN 'en_ruta' WHEN i % 150 = 0 THEN 'pendiente'
+                    WHEN i % 40 = 0 THEN 'cancelado' ELSE 'entregado' END,
+               now() - (i || ' seconds')::interval
+        FROM generate_series(1, :n) AS i
+    """), {"n": filas, "vehiculos": vehiculos, "usuarios": usuarios})
+
+    conn.execute(text("""
+        INSERT INTO rutas_asignadas (
+            id_asignacion, id_pedido, origen_direccion, destino_direccion,
+            distancia_km, tiempo_min, vehiculo_tipo, fecha_calculo, activa
+        )
+        SELECT 1 + i % :asignaciones, CASE WHEN i % 10 <> 0 THEN i END, 'Origen', 'Destino ' || i,
+               5 + i % 30, 10 + i % 60,
+               (ARRAY['gasolina', 'hibrido', 'electrico'])[1 + i % 3],
+               now() - ((1 + i % :asignaciones) || ' minutes')::interval + (i % 60 || ' seconds')::interval,
+               i % 20 = 0
+        FROM generate_series(1, :n) AS i
+    """), {"n": filas, "asignaciones": asignaciones})
+
+    print(f"   usuarios={usuarios:,} vehiculos={vehiculos:,} asignaciones={asignaciones:,} "
+          f"pedidos={filas:,} rutas={filas:,}")
+
+
+def indices_del_plan(nodo, encontrados=None):
+    """Nombres de índice usados en cualquier nodo del plan"""
+    encontrados = set() if encontrados is None else encontrados
+    if "Index Name" in nodo:
+        encontrados.add(nodo["Index Name"])
+    for hijo in nodo.get("Plans", ()):
+        indices_del_plan(hijo, encontrados)
+    return encontrados
+
+
+def indices_padre(conn):
+    """índice de una partición -> índice de la tabla particionada del que sale"""
+    filas = conn.execute(text("""
+        SELECT hija.relname AS hija, padre.relname AS padre
+        FROM pg_inherits h
+        JOIN pg_class hija ON hija.oid = h.inhrelid
+        JOIN pg_class padre ON padre.oid = h.inhparent
+        WHERE hija.relkind = 'i'
+    """)).fetchall()
+    return {fila.hija: fila.padre for fila in filas}
+
+
+def verificar(conn):
+    fallos = 0
+    padres = indices_padre(conn)
+    for nombre, consulta, params, esperados in CONSULTAS:
+        plan = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {consulta}"), params).scalar()[0]
+        usados = {padres.get(indice, indice) for indice in indices_del_plan(plan["Plan"])}
+        faltantes = [i for i in esperados if i not in usados]
+
+        marca = "✅" if not faltantes else "❌"
+        print(f"{marca} {nombre}: {plan['Execution Time']:.2f} ms")
+        print(f"   índices usados: {', '.join(sorted(usados)) or 'ninguno (escaneo secuencial)'}")
+        if faltantes:
+            fallos += 1
+            print(f"   faltan: {', '.join(faltantes)}")
+    return fallos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1_000_000, help="pedidos y rutas a generar")
+    parser.add_argument("--confirmar", action="store_true", help="necesario: escribe datos en la BD configurada")
+    parser.add_argument("--conservar", action="store_true", help="no eliminar el esquema al terminar")
+    args = parser.parse_args()
+
+    if not args.confirmar:
+        parser.error(f"este script crea el esquema '{ESQUEMA}' en la BD de DATABASE_URL; agregue --confirmar")
+
+    print("=" * 60)
+    print(f"🔍 VERIFICACIÓN DE ÍNDICES ({args.filas:,} filas)")
+    print("=" * 60)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {ESQUEMA}"))
+
+    bench = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={ESQUEMA}"})
+    fallos = 0
+    try:
+        Base.metadata.create_all(bind=bench)
+        aplicar_migraciones(bind=bench)
+
+        inicio = time.perf_counter()
+        with bench.begin() as conn:
+            poblar(conn, args.filas)
+        print(f"📦 Datos generados en {time.perf_counter() - inicio:.1f}s")
+
+        with bench.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("VACUUM ANALYZE usuarios, vehiculos, asignaciones, pedidos, rutas_asignadas")
+            )
+        with bench.connect() as conn:
+            print()
+            fallos = verificar(conn)
+    finally:
+        bench.dispose()
+        if not args.conservar:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+
+    print()
+    print("✅ Todas las consultas usan sus índices" if not fallos else f"❌ {fallos} consulta(s) sin el índice esperado")
+    sys.exit(1 if fallos else 0)